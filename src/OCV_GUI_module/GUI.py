@@ -1,11 +1,17 @@
+import os
 import tkinter as tk
 from tkinter import Label, Entry, filedialog, IntVar, Scale, Button, DoubleVar
 from PIL import Image, ImageTk
 from optimization_functions import perform_full_optimization_parallel_to_json_GUI  # noqa: E501
 from optimization_functions import perform_full_optimization_parallel  # noqa: E501
+from optimization_functions import calculate_alignment_indices, evaluate_alignment  # noqa: E501
+from optimization_functions import calculate_RMSD_landscape
+from optimization_functions import list_result_files, load_result
 from add_curves import add_half_cell_data
 from add_battery import load_soc_ocv_data
-import matplotlib.pyplot as plt
+from plotting import create_result_figure, update_result_lines
+from plotting import plot_RMSD_landscape
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 class OCVBatteryDecompositionGUI:
@@ -32,6 +38,19 @@ class OCVBatteryDecompositionGUI:
         self.interpolated_anodes = None
         self.SOC_battery = None
         self.OCV_battery = None
+        self.result = None
+
+        # Manual alignment widgets, created after an optimization
+        self.manual_frame = None
+        self.manual_vars = {}
+        self.manual_update_pending = False
+
+        # RMSD landscape window, created on request
+        self.landscape_window = None
+
+        # Saved result files of the opened directory, and the one shown
+        self.result_files = []
+        self.result_index = None
         
         # Create left and right frames for the GUI
         self.left_frame = tk.Frame(master, width=screen_width, bg="#2C2F33")
@@ -50,12 +69,45 @@ class OCVBatteryDecompositionGUI:
             width=int(font_size),
             font=("Arial", int(font_size*0.8)))
         self.run_button.pack(pady=10)
+
+        # Open result button and browser of the saved results
+        self.open_button = Button(
+            self.left_frame, text="Open Result",
+            command=lambda: self.open_result(font_size),
+            width=int(font_size),
+            font=("Arial", int(font_size*0.8)))
+        self.open_button.pack(pady=10)
+        self.result_browser = tk.Frame(self.left_frame, bg="#2C2F33")
+        Button(self.result_browser, text="<",
+               command=lambda: self.step_result(-1, font_size),
+               font=("Arial", int(font_size*0.6))).pack(side=tk.LEFT)
+        self.result_file_label = Label(
+            self.result_browser, font=("Arial", int(font_size*0.6)),
+            bg="#2C2F33", fg="white")
+        self.result_file_label.pack(side=tk.LEFT, padx=5)
+        Button(self.result_browser, text=">",
+               command=lambda: self.step_result(1, font_size),
+               font=("Arial", int(font_size*0.6))).pack(side=tk.LEFT)
         
         # Download result button
         self.download_button = Button(
             self.left_frame, text="Download Result",
             command=self.download_result, width=int(font_size),
             font=("Arial", int(font_size*0.8)))
+
+        # Manual alignment button
+        self.manual_button = Button(
+            self.left_frame, text="Manual Alignment",
+            command=lambda: self.open_manual_alignment(font_size),
+            width=int(font_size),
+            font=("Arial", int(font_size*0.8)))
+
+        # RMSD landscape button
+        self.landscape_button = Button(
+            self.left_frame, text="RMSD Landscape",
+            command=self.open_landscape_window,
+            width=int(font_size),
+            font=("Arial", int(font_size*0.8)))
         
         # Result label and plot
         self.result_label = None
@@ -126,6 +178,13 @@ class OCVBatteryDecompositionGUI:
             variable=self.iterations_var, length=font_size*15)
         self.scale_iterations.set(1)
         self.scale_iterations.pack()
+        self.adaptive_var = tk.BooleanVar(value=False)
+        self.check_adaptive = tk.Checkbutton(
+            self.iterations_frame, text="Adaptive restarts",
+            variable=self.adaptive_var,
+            font=("Arial", int(font_size*0.6)), bg="#2C2F33", fg="white",
+            selectcolor="#2C2F33", activebackground="#2C2F33")
+        self.check_adaptive.pack()
 
         # Battery Weight Slider
         self.battery_frame = tk.Frame(self.left_frame, bg="#2C2F33")
@@ -202,30 +261,186 @@ class OCVBatteryDecompositionGUI:
             self.SOC_battery, self.OCV_battery,
             self.interpolated_cathodes, self.interpolated_anodes,
             iterations=iterations, battery=battery,
-            derivative_inverse=derivative_inverse
+            derivative_inverse=derivative_inverse,
+            adaptive=self.adaptive_var.get()
         )
 
         # Plot results and display optimization results
         if result['calculated_battery_OCV_opt'] is not None:
-            self.plot_results(result)
-            data_label_text = (
-                f"Best Cathode Data ID: {result['Best Cathode Data ID']}\n"
-                f"Best Anode Data ID: {result['Best Anode Data ID']}\n"
-                f"Best Parameters: {result['Best Parameters']}\n"
-                f"Lowest RMSD: {result['Lowest RMSD']}"
-            )
-            if self.result_label:
-                self.result_label.destroy()
-            self.result_label = Label(self.left_frame, text=data_label_text,
-                                     font=("Arial", font_size), fg="white", bg="#2C2F33")
-            self.result_label.pack(pady=10)
-
-            # Destroy the initial logo canvas/label on the right frame
-            if hasattr(self, 'logo_label'):
-                self.logo_label.destroy()
-            
-            # Show download button
-            self.download_button.pack(pady=10)
+            self.result_browser.pack_forget()
+            self.show_result(result, font_size)
+
+    def show_result(self, result, font_size, saved=False):
+        # Plot a result and display its summary. A saved result has no
+        # half-cell data loaded, so it can only be viewed
+        self.result = result
+        self.plot_results(result)
+        data_label_text = self.format_result_text(result)
+        if self.result_label:
+            self.result_label.destroy()
+        self.result_label = Label(self.left_frame, text=data_label_text,
+                                 font=("Arial", font_size), fg="white", bg="#2C2F33")
+        self.result_label.pack(pady=10)
+
+        # Destroy the initial logo canvas/label on the right frame
+        if hasattr(self, 'logo_label'):
+            self.logo_label.destroy()
+
+        if self.manual_frame is not None:
+            self.manual_frame.destroy()
+            self.manual_frame = None
+        if saved:
+            self.download_button.pack_forget()
+            self.manual_button.pack_forget()
+            self.landscape_button.pack_forget()
+            if self.landscape_window is not None:
+                self.close_landscape_window()
+            return
+
+        # Show download and manual alignment buttons
+        self.download_button.pack(pady=10)
+        self.manual_button.pack(pady=10)
+        self.landscape_button.pack(pady=10)
+
+    def open_result(self, font_size):
+        # Show a saved result; the other results of its directory are only
+        # listed, and loaded when stepped to
+        filename = filedialog.askopenfilename(
+            filetypes=[("Result files", "*.json *.npz")])
+        if not filename:
+            return
+        self.result_files = list_result_files(os.path.dirname(filename))
+        names = [os.path.basename(path) for path in self.result_files]
+        self.result_index = names.index(os.path.basename(filename))
+        self.show_saved_result(font_size)
+
+    def step_result(self, step, font_size):
+        # Show the previous or next result of the opened directory
+        self.result_index = (self.result_index + step) % len(self.result_files)
+        self.show_saved_result(font_size)
+
+    def show_saved_result(self, font_size):
+        filename = self.result_files[self.result_index]
+        self.result_file_label.config(
+            text=f"{self.result_index + 1} / {len(self.result_files)}: "
+                 f"{os.path.basename(filename)}")
+        self.result_browser.pack(after=self.open_button, pady=(0, 10))
+        try:
+            result = load_result(filename)
+        except (OSError, ValueError) as error:
+            print(f"Cannot open {filename}: {error}")
+            return
+        self.show_result(result, font_size, saved=True)
+
+    def format_result_text(self, result):
+        # Text shown in the result label
+        return (
+            f"Best Cathode Data ID: {result['Best Cathode Data ID']}\n"
+            f"Best Anode Data ID: {result['Best Anode Data ID']}\n"
+            f"Best Parameters: {result['Best Parameters']}\n"
+            f"Lowest RMSD: {result['Lowest RMSD']}"
+        ) + (
+            f"\nRestarts: {sum(result['Restarts per pair'].values())}"
+            if 'Restarts per pair' in result else ""
+        )
+
+    def open_manual_alignment(self, font_size):
+        # Show e, f, g, h sliders seeded from the best parameters
+        self.manual_button.pack_forget()
+        self.manual_frame = tk.Frame(self.left_frame, bg="#2C2F33")
+        self.manual_frame.pack(pady=(0, 0), padx=0, fill=tk.X)
+
+        anode_length = len(self.interpolated_anodes[
+            self.result['Best Anode Data ID']]['x_values'])
+        cathode_length = len(self.interpolated_cathodes[
+            self.result['Best Cathode Data ID']]['x_values'])
+        # Slider limits match the bounds searched by the optimization
+        lower = calculate_alignment_indices(
+            (0, 1, 0, 1), anode_length, cathode_length)
+        upper = calculate_alignment_indices(
+            (1, 0, 1, 0), anode_length, cathode_length)
+
+        self.manual_vars = {}
+        for name, value, low, high in zip(
+                'efgh', self.result['Best Parameters'], lower, upper):
+            variable = IntVar(value=value)
+            Scale(self.manual_frame, label=f"{name}:", from_=low, to=high,
+                  orient=tk.HORIZONTAL, variable=variable,
+                  length=font_size*15,
+                  command=self.schedule_manual_update).pack()
+            self.manual_vars[name] = variable
+
+    def current_parameters(self):
+        # Manually set parameters if manual alignment is open, else the best
+        if self.manual_frame is not None:
+            return tuple(self.manual_vars[name].get() for name in 'efgh')
+        return self.result['Best Parameters']
+
+    def open_landscape_window(self):
+        # Window with a heatmap of the RMSD over a slice of e, f, g, h
+        if self.landscape_window is not None:
+            self.landscape_window.lift()
+            return
+        self.landscape_window = tk.Toplevel(self.master)
+        self.landscape_window.title("RMSD Landscape")
+        self.landscape_window.protocol(
+            "WM_DELETE_WINDOW", self.close_landscape_window)
+
+        controls = tk.Frame(self.landscape_window)
+        controls.pack(side=tk.TOP, fill=tk.X)
+        slices = ["e x f", "g x h", "e x g", "e x h", "f x g", "f x h"]
+        self.landscape_slice_var = tk.StringVar(value=slices[0])
+        tk.OptionMenu(
+            controls, self.landscape_slice_var, *slices).pack(side=tk.LEFT)
+        Button(controls, text="Compute",
+               command=self.update_landscape).pack(side=tk.LEFT)
+
+        self.landscape_figure = Figure(figsize=(6, 5))
+        self.landscape_canvas = FigureCanvasTkAgg(
+            self.landscape_figure, master=self.landscape_window)
+        self.landscape_canvas.get_tk_widget().pack(
+            side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.update_landscape()
+
+    def close_landscape_window(self):
+        self.landscape_window.destroy()
+        self.landscape_window = None
+
+    def update_landscape(self):
+        # Compute and draw the selected slice around the current parameters
+        parameters = self.current_parameters()
+        axes = tuple(self.landscape_slice_var.get().split(" x "))
+        landscape = calculate_RMSD_landscape(
+            parameters,
+            self.interpolated_cathodes[self.result['Best Cathode Data ID']],
+            self.interpolated_anodes[self.result['Best Anode Data ID']],
+            self.SOC_battery, self.OCV_battery, axes=axes,
+            battery=self.battery_var.get(),
+            derivative_inverse=self.derivative_var.get()
+        )
+        plot_RMSD_landscape(self.landscape_figure, landscape, parameters)
+        self.landscape_canvas.draw_idle()
+
+    def schedule_manual_update(self, val):
+        # Coalesce slider events into at most one update per idle cycle
+        if not self.manual_update_pending:
+            self.manual_update_pending = True
+            self.master.after_idle(self.update_manual_alignment)
+
+    def update_manual_alignment(self):
+        # Recompute the curves and RMSD for the manually set parameters
+        self.manual_update_pending = False
+        parameters = self.current_parameters()
+        manual_result = evaluate_alignment(
+            parameters,
+            self.interpolated_cathodes[self.result['Best Cathode Data ID']],
+            self.interpolated_anodes[self.result['Best Anode Data ID']],
+            self.SOC_battery, self.OCV_battery,
+            battery=self.battery_var.get(),
+            derivative_inverse=self.derivative_var.get()
+        )
+        self.plot_results(manual_result)
+        self.result_label.config(text=self.format_result_text(manual_result))
 
     def download_result(self):
         # Download the optimization result as a JSON file
@@ -247,45 +462,15 @@ class OCVBatteryDecompositionGUI:
         self.download_button.pack_forget()
 
     def plot_results(self, result):
-        # Plot the optimization results
-        if self.plot is None:
-            self.plot = FigureCanvasTkAgg(
-                plt.figure(figsize=(8, 6)), master=self.right_frame)
-            self.plot.get_tk_widget().pack(
-                side=tk.TOP, fill=tk.BOTH, expand=True)
-        else:
-            self.plot.get_tk_widget().destroy()
-            self.plot = FigureCanvasTkAgg(
-                plt.figure(figsize=(8, 6)), master=self.right_frame)
-            self.plot.get_tk_widget().pack(
-                side=tk.TOP, fill=tk.BOTH, expand=True)
-
-        # Plot the measured and optimized battery OCV, cathode OCP, and anode OCP
-        plt.plot(
-            self.SOC_battery, self.OCV_battery,
-            'r-', label='Measured battery OCV')
-        plt.plot(
-            self.SOC_battery, result['calculated_battery_OCV_opt'],
-            'b-', label='Optimized Battery OCV')
-        plt.plot(
-            result['c_SOC_full'], result['r1_ns_x_c1_ns'], 'r--')
-        plt.plot(
-            result['c_SOC'], result['r1_x_c1'],
-            'g-', label='Optimized Cathode OCP')
-        plt.plot(result['a_SOC_full'], result['w1_ns_x_a1_ns'], 'r--')
-        plt.plot(
-            result['a_SOC'], result['w1_x_a1'],
-            'k-', label='Optimized Anode OCP')
-        plt.title("Optimization")
-        plt.xlabel('SOC (% / 100)')
-        plt.ylabel('OCV (V)')
-        plt.grid(True)
-        plt.legend()
+        # Update the persistent line artists with the measured and optimized
+        # battery OCV, cathode OCP, and anode OCP, then schedule a redraw
+        update_result_lines(self.plot_lines, result)
+        self.plot.draw_idle()
 
     def create_empty_plot(self):
-        # Create an empty plot for initial display
-        empty_fig = plt.figure(figsize=(8, 6))
-        empty_plot = FigureCanvasTkAgg(empty_fig, master=self.right_frame)
+        # Create the figure and line artists reused by every plotted result
+        self.figure, self.plot_lines = create_result_figure(figsize=(8, 6))
+        empty_plot = FigureCanvasTkAgg(self.figure, master=self.right_frame)
         return empty_plot
 
     def add_logo(self, font_size):
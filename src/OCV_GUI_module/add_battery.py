@@ -1,3 +1,5 @@
+import mmap
+
 import numpy as np
 
 
@@ -24,3 +26,240 @@ def load_soc_ocv_data(txt_file):
     OCV_battery = np.array(OCV_battery)
 
     return SOC_battery, OCV_battery
+
+
+def save_soc_ocv_data(txt_file, SOC_battery, OCV_battery):
+    """
+    Save SOC and OCV data to a txt file readable by load_soc_ocv_data.
+
+    Parameters:
+    - txt_file (str): Path to the txt file to write.
+    - SOC_battery, OCV_battery (array-like): SOC and OCV values.
+
+    Returns:
+    None
+    """
+    np.savetxt(txt_file, np.column_stack((SOC_battery, OCV_battery)))
+
+
+def _split_line(line, delimiter):
+    return [field.strip() for field in line.split(delimiter)]
+
+
+def _column_index(column, header):
+    # Index of a column given by its index or by its name in the header
+    if isinstance(column, int) or column is None:
+        return column
+    if header is None or column not in header:
+        raise ValueError(f"Column '{column}' not found in the header.")
+    return header.index(column)
+
+
+def _bin_voltage(voltage_sum, counts, charge, voltage, charge_resolution):
+    # Add voltages to the sums and counts of their charge bins
+    bins = (charge / charge_resolution).astype(int)
+    n_bins = max(len(counts), bins.max() + 1)
+    voltage_sum = np.pad(voltage_sum, (0, n_bins - len(voltage_sum)))
+    counts = np.pad(counts, (0, n_bins - len(counts)))
+    voltage_sum += np.bincount(bins, weights=voltage, minlength=n_bins)
+    counts += np.bincount(bins, minlength=n_bins)
+    return voltage_sum, counts
+
+
+def _choose_segment(chosen, segment, index, charge, voltage_sum, counts):
+    # The finished segment of the given index replaces the chosen segment
+    # if it is the requested one
+    if segment is None or segment == index or (
+            segment == 'longest' and (chosen is None or charge > chosen[0])):
+        return charge, voltage_sum, counts
+    return chosen
+
+
+def extract_pseudo_ocv(log_file, time_column=0, current_column=1,
+                       voltage_column=2, step_column=None, steps=None,
+                       direction='discharge', max_current=None,
+                       min_current=1e-6, time_scale=1.0,
+                       charge_resolution=1e-4, n_points=1001,
+                       segment='longest', chunk_size=2**24):
+    """
+    Extract a pseudo-OCV curve from a raw cycler export.
+
+    The file is memory-mapped and parsed in chunks, so memory use depends on
+    chunk_size and on the number of charge bins, not on the size of the
+    file. Consecutive rows of the low-rate charge or discharge selection
+    form a segment; a segment also ends where the step number changes.
+    The charge throughput of every segment is integrated from zero
+    (coulomb counting), so the cycles of a log are not chained into one
+    charge axis. The voltage of the chosen segment is averaged in bins of
+    charge_resolution, and the result is normalized to SOC and resampled to
+    n_points equally spaced SOC values.
+
+    Parameters:
+    - log_file (str): Path to a CSV or whitespace separated text export.
+      An optional header line with column names is detected automatically.
+    - time_column, current_column, voltage_column (int or str): Index or
+      header name of the time, current and voltage columns.
+    - step_column (int or str, optional): Index or header name of the step
+      number column, used together with steps.
+    - steps (iterable of int, optional): Step numbers to keep.
+    - direction (str, optional): 'discharge' (negative current) or
+      'charge' (positive current).
+    - max_current (float, optional): Largest absolute current, in A, of a
+      low-rate row. By default, all rows of the chosen direction are used.
+    - min_current (float, optional): Smallest absolute current, in A, of a
+      low-rate row; smaller currents are treated as rest.
+    - time_scale (float, optional): Seconds per unit of the time column.
+    - charge_resolution (float, optional): Width, in Ah, of the charge bins
+      over which the voltage is averaged.
+    - n_points (int, optional): Number of points of the returned curve.
+    - segment (str, int or None, optional): 'longest' uses the segment with
+      the largest charge throughput, an int the segment of that index (in
+      the order of the file), and None requires the selection to form a
+      single segment.
+    - chunk_size (int, optional): Number of bytes parsed at once.
+
+    Raises:
+    - ValueError: If direction or segment is invalid, steps is given
+      without step_column, a column is not found, no row matches the
+      selection, or segment is None and the selection forms more than one
+      segment.
+
+    Returns:
+    - numpy.ndarray, numpy.ndarray: SOC_battery (0 to 1, increasing) and
+      OCV_battery arrays, as returned by load_soc_ocv_data.
+    """
+    if direction not in ('discharge', 'charge'):
+        raise ValueError(
+            f"direction must be 'discharge' or 'charge', got '{direction}'.")
+    if not (segment in ('longest', None) or isinstance(segment, int)):
+        raise ValueError(
+            f"segment must be 'longest', an int or None, got {segment!r}.")
+    if steps is not None and step_column is None:
+        raise ValueError("steps needs a step_column.")
+    sign = -1 if direction == 'discharge' else 1
+    steps = None if steps is None else np.asarray(list(steps))
+
+    # Charge and bins of the segment being read and of the chosen segment
+    voltage_sum = np.zeros(0)
+    counts = np.zeros(0)
+    segment_charge = 0.0
+    chosen = None
+    n_segments = 0
+    previous_time = None
+    previous_selected = False
+    previous_step = np.nan
+
+    with open(log_file, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # Delimiter and optional header from the first line
+        line_end = data.find(b'\n')
+        if line_end < 0:
+            line_end = len(data)
+        first_line = data[:line_end].decode().strip()
+        delimiter = next(
+            (d for d in (',', ';', '\t') if d in first_line), None)
+        fields = _split_line(first_line, delimiter)
+        try:
+            [float(field) for field in fields]
+            header, position = None, 0
+        except ValueError:
+            header, position = fields, line_end + 1
+
+        columns = [_column_index(column, header) for column in
+                   (time_column, current_column, voltage_column, step_column)]
+        used = [column for column in columns if column is not None]
+
+        while position < len(data):
+            end = min(position + chunk_size, len(data))
+            if end < len(data):
+                end = data.rfind(b'\n', position, end) + 1 or end
+            text = data[position:end].decode()
+            position = end
+            if not text.strip():
+                continue
+
+            table = np.loadtxt(text.splitlines(), delimiter=delimiter,
+                               usecols=used, ndmin=2)
+            values = {column: table[:, used.index(column)]
+                      for column in used}
+            time = values[columns[0]] * time_scale
+            current = values[columns[1]]
+            voltage = values[columns[2]]
+
+            selected = (sign * current >= min_current)
+            if max_current is not None:
+                selected &= np.abs(current) <= max_current
+            if steps is not None:
+                selected &= np.isin(values[columns[3]], steps)
+
+            # A segment starts at a selected row after an unselected row or
+            # at a change of the step number
+            starts = selected & ~np.concatenate(([previous_selected],
+                                                 selected[:-1]))
+            if columns[3] is not None:
+                step = values[columns[3]]
+                starts |= selected & (step != np.concatenate(
+                    ([previous_step], step[:-1])))
+                previous_step = step[-1]
+
+            # Coulomb counting within segments; starts add no charge
+            dt = np.diff(time, prepend=time[0] if previous_time is None
+                         else previous_time)
+            cumulative_charge = np.cumsum(np.where(
+                selected & ~starts, np.abs(current) * dt / 3600, 0))
+            previous_time = time[-1]
+            previous_selected = selected[-1]
+
+            rows = np.flatnonzero(selected)
+            row_segments = np.cumsum(starts)[rows]
+            for row_segment in np.unique(row_segments):
+                segment_rows = rows[row_segments == row_segment]
+                if row_segment == 0:
+                    # Continuation of the segment of the previous chunk
+                    charge = segment_charge + cumulative_charge[segment_rows]
+                else:
+                    if n_segments > 0:
+                        chosen = _choose_segment(
+                            chosen, segment, n_segments - 1, segment_charge,
+                            voltage_sum, counts)
+                    n_segments += 1
+                    if segment is None and n_segments > 1:
+                        raise ValueError(
+                            f"The {direction} selection of '{log_file}' "
+                            f"forms more than one segment; select one with "
+                            f"steps or segment.")
+                    voltage_sum, counts = np.zeros(0), np.zeros(0)
+                    charge = (cumulative_charge[segment_rows]
+                              - cumulative_charge[segment_rows[0]])
+                segment_charge = charge[-1]
+                voltage_sum, counts = _bin_voltage(
+                    voltage_sum, counts, charge, voltage[segment_rows],
+                    charge_resolution)
+
+    if n_segments == 0:
+        raise ValueError(f"No {direction} segment found in '{log_file}'.")
+    chosen = _choose_segment(chosen, segment, n_segments - 1,
+                             segment_charge, voltage_sum, counts)
+    if chosen is None:
+        raise ValueError(
+            f"Segment {segment} not found in '{log_file}', which has "
+            f"{n_segments} {direction} segments.")
+    _, voltage_sum, counts = chosen
+
+    filled = counts > 0
+    if np.count_nonzero(filled) < 2:
+        raise ValueError(f"No {direction} segment found in '{log_file}'.")
+
+    bin_charge = (np.flatnonzero(filled) + 0.5) * charge_resolution
+    bin_voltage = voltage_sum[filled] / counts[filled]
+
+    # SOC is 1 at the start of a discharge and 0 at the start of a charge
+    SOC = (bin_charge - bin_charge[0]) / (bin_charge[-1] - bin_charge[0])
+    if direction == 'discharge':
+        SOC = 1 - SOC[::-1]
+        bin_voltage = bin_voltage[::-1]
+
+    SOC_battery = np.linspace(0, 1, n_points)
+    OCV_battery = np.interp(SOC_battery, SOC, bin_voltage)
+
+    return SOC_battery, OCV_battery
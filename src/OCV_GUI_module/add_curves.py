@@ -2,11 +2,18 @@ import os
 from scipy.interpolate import interp1d
 import numpy as np
 
+# Suffix of the coefficient files of analytic OCP models (see ocp_models)
+OCP_MODEL_SUFFIX = '.ocp.json'
+
 
 def add_half_cell_data(directory_name):
     """
     Add half-cell data from text files in the specified path to a dictionary.
 
+    Coefficient files of analytic OCP models (<ID>.ocp.json) are added too.
+    Their 'interpolated_function' is the model itself, and their
+    'x_values' sample its x_range at 1001 points.
+
     Parameters:
     - directory_name (str): The directory name containing text files with data.
 
@@ -61,4 +68,21 @@ def add_half_cell_data(directory_name):
         # Add the new dataset to the dictionary
         half_cell_dictionary[new_dataset['ID_number']] = new_dataset
 
+    model_files = [f for f in os.listdir(directory_path)
+                   if f.endswith(OCP_MODEL_SUFFIX)]
+    if model_files:
+        try:
+            from .ocp_models import load_ocp_model
+        except ImportError:
+            # Imported as a top-level module, as GUI.py does
+            from ocp_models import load_ocp_model
+    for model_file in model_files:
+        model = load_ocp_model(os.path.join(directory_path, model_file))
+        ID_number = model_file[:-len(OCP_MODEL_SUFFIX)]
+        half_cell_dictionary[ID_number] = {
+            'ID_number': ID_number,
+            'x_values': np.linspace(*model.x_range, 1001),
+            'interpolated_function': model
+        }
+
     return half_cell_dictionary
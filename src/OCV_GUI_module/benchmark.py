@@ -0,0 +1,348 @@
+"""
+Benchmarks for battery OCV decomposition.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must never be imported by a headless run
+HEAVY_MODULES = ('tkinter', 'PIL', 'matplotlib')
+
+# Module sets imported by the command line interface, from the bare
+# interface to everything a decomposition run needs
+STARTUP_TARGETS = {
+    'cli': ('cli',),
+    'run': ('cli', 'add_battery', 'add_curves', 'optimization_functions')
+}
+
+_IMPORT_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in sys.argv[2:]:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in json.loads(sys.argv[1])
+               if any(k == m or k.startswith(m + '.') for k in sys.modules))
+print(json.dumps({'seconds': elapsed, 'heavy_modules': heavy}))
+"""
+
+
+def _package_root():
+    # Directory from which this package can be imported by name
+    root = os.path.dirname(os.path.abspath(__file__))
+    for _ in __package__.split('.'):
+        root = os.path.dirname(root)
+    return root
+
+
+def measure_startup_time(targets=None, repeat=5):
+    """
+    Measure the import time of the modules used by a headless run.
+
+    Every measurement is made in a fresh interpreter, so module caches
+    of the calling process do not affect the result.
+
+    Parameters:
+    - targets: dict, optional
+        Mapping from a target name to the module names (relative to this
+        package) it imports. Defaults to STARTUP_TARGETS.
+    - repeat: int, optional
+        Number of fresh interpreters per target.
+
+    Returns:
+    - list of dict: One entry per target with the minimum and median
+      import time in seconds and the heavy modules that were imported.
+    """
+    targets = targets or STARTUP_TARGETS
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [_package_root(), env.get('PYTHONPATH')]))
+
+    report = []
+    for target, modules in targets.items():
+        names = [f"{__package__}.{module}" for module in modules]
+        timings = []
+        heavy_modules = set()
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, '-c', _IMPORT_SCRIPT,
+                 json.dumps(HEAVY_MODULES)] + names,
+                env=env, check=True, capture_output=True, text=True).stdout
+            measurement = json.loads(output)
+            timings.append(measurement['seconds'])
+            heavy_modules.update(measurement['heavy_modules'])
+
+        report.append({
+            'target': target,
+            'modules': list(modules),
+            'min_seconds': min(timings),
+            'median_seconds': statistics.median(timings),
+            'heavy_modules': sorted(heavy_modules)
+        })
+
+    return report
+
+
+def format_startup_report(report):
+    """
+    Format the result of measure_startup_time as a text table.
+
+    Parameters:
+    - report: list of dict
+        Result of measure_startup_time.
+
+    Returns:
+    - str: The formatted table.
+    """
+    lines = [f"{'target':<10}{'min (ms)':>10}{'median (ms)':>13}  heavy"]
+    for entry in report:
+        lines.append(
+            f"{entry['target']:<10}"
+            f"{entry['min_seconds'] * 1000:>10.1f}"
+            f"{entry['median_seconds'] * 1000:>13.1f}  "
+            f"{', '.join(entry['heavy_modules']) or '-'}")
+    return '\n'.join(lines)
+
+
+# Settings of perform_full_optimization_parallel compared by default in the
+# accuracy benchmark, keyed by a short name
+ACCURACY_CONFIGURATIONS = {
+    'iterations=5': {'iterations': 5},
+    'iterations=1': {'iterations': 1},
+    'adaptive': {'iterations': 5, 'adaptive': True},
+    'feature-init': {'iterations': 1, 'initializer': 'features'},
+    'single-precision': {'iterations': 1, 'dtype': 'float32'}
+}
+
+
+def make_synthetic_cases(interpolated_cathodes, interpolated_anodes,
+                         n_cases=5, noise=0.0, seed=0):
+    """
+    Build synthetic battery curves with a known pair and alignment.
+
+    Every case combines a random cathode and anode of the library at random
+    alignment percentages between 0.1 and 0.9, and adds normally distributed
+    noise to the calculated battery OCV.
+
+    Parameters:
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - n_cases: int, optional
+        Number of synthetic curves.
+    - noise: float, optional
+        Standard deviation of the noise, in V.
+    - seed: int, optional
+        Seed of the random pairs, alignments and noise.
+
+    Returns:
+    - list of dict: 'SOC_battery', 'OCV_battery', the true
+      'cathode_data_ID' and 'anode_data_ID', and the true alignment
+      'indices' (e, f, g, h) of every case.
+    """
+    import numpy as np
+    from .optimization_functions import (
+        calculate_aligned_curves, calculate_alignment_indices)
+
+    rng = np.random.default_rng(seed)
+    cathode_IDs = sorted(interpolated_cathodes)
+    anode_IDs = sorted(interpolated_anodes)
+
+    cases = []
+    for _ in range(n_cases):
+        cathode_ID = cathode_IDs[rng.integers(len(cathode_IDs))]
+        anode_ID = anode_IDs[rng.integers(len(anode_IDs))]
+        cathode_info = interpolated_cathodes[cathode_ID]
+        anode_info = interpolated_anodes[anode_ID]
+
+        indices = calculate_alignment_indices(
+            rng.uniform(0.1, 0.9, 4), len(anode_info['x_values']),
+            len(cathode_info['x_values']))
+        OCV_battery = calculate_aligned_curves(
+            cathode_info, anode_info, indices)['calculated_battery_OCV_opt']
+
+        cases.append({
+            'SOC_battery': np.linspace(0, 1, len(OCV_battery)),
+            'OCV_battery': OCV_battery + rng.normal(
+                0, noise, len(OCV_battery)),
+            'cathode_data_ID': cathode_ID,
+            'anode_data_ID': anode_ID,
+            'indices': indices
+        })
+
+    return cases
+
+
+def run_accuracy_benchmark(cases, interpolated_cathodes, interpolated_anodes,
+                           configurations=None):
+    """
+    Run the decomposition of synthetic cases under several settings.
+
+    Parameters:
+    - cases: list of dict
+        Cases returned by make_synthetic_cases.
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - configurations: dict, optional
+        Mapping from a configuration name to keyword arguments of
+        perform_full_optimization_parallel. Defaults to
+        ACCURACY_CONFIGURATIONS.
+
+    Returns:
+    - list of dict: One entry per configuration with the fraction of cases
+      whose pair was identified ('pair_rate'), the mean alignment error of
+      the identified cases in units of the curve length
+      ('parameter_error', None if no pair was identified), the mean
+      'RMSD', the mean wall time per case in 'seconds', and the overall
+      'error', the mean alignment error with a wrong pair counted as 1.
+    """
+    import time
+    from .optimization_functions import perform_full_optimization_parallel
+
+    configurations = configurations or ACCURACY_CONFIGURATIONS
+
+    report = []
+    for name, settings in configurations.items():
+        identified = []
+        case_errors = []
+        parameter_errors = []
+        RMSDs = []
+        seconds = []
+        for case in cases:
+            start = time.perf_counter()
+            result = perform_full_optimization_parallel(
+                case['SOC_battery'], case['OCV_battery'],
+                interpolated_cathodes, interpolated_anodes, **settings)
+            seconds.append(time.perf_counter() - start)
+            RMSDs.append(float(result['Lowest RMSD']))
+
+            found = (result['Best Cathode Data ID'] == case['cathode_data_ID']
+                     and result['Best Anode Data ID'] == case['anode_data_ID'])
+            identified.append(found)
+            if found:
+                lengths = 2 * [len(interpolated_anodes[
+                    case['anode_data_ID']]['x_values'])] + 2 * [len(
+                        interpolated_cathodes[case['cathode_data_ID']][
+                            'x_values'])]
+                parameter_errors.append(statistics.mean(
+                    abs(found_index - true_index) / length
+                    for found_index, true_index, length in zip(
+                        result['Best Parameters'], case['indices'], lengths)))
+            case_errors.append(parameter_errors[-1] if found else 1.0)
+
+        report.append({
+            'configuration': name,
+            'settings': {key: str(value) for key, value in settings.items()},
+            'pair_rate': sum(identified) / len(cases),
+            'parameter_error': statistics.mean(parameter_errors)
+            if parameter_errors else None,
+            'RMSD': statistics.mean(RMSDs),
+            'seconds': statistics.mean(seconds),
+            'error': statistics.mean(case_errors)
+        })
+
+    return report
+
+
+def pareto_front(report):
+    """
+    Configurations on the speed/accuracy Pareto front.
+
+    A configuration is on the front if no other configuration is both
+    faster (or as fast) and has a lower (or equal) overall error, with at
+    least one of the two strictly.
+
+    Parameters:
+    - report: list of dict
+        Result of run_accuracy_benchmark.
+
+    Returns:
+    - list of str: Names of the configurations on the front, fastest first.
+    """
+    front = []
+    for entry in report:
+        dominated = any(
+            other['seconds'] <= entry['seconds']
+            and other['error'] <= entry['error']
+            and (other['seconds'] < entry['seconds']
+                 or other['error'] < entry['error'])
+            for other in report)
+        if not dominated:
+            front.append(entry)
+    return [entry['configuration']
+            for entry in sorted(front, key=lambda entry: entry['seconds'])]
+
+
+def format_accuracy_report(report):
+    """
+    Format the result of run_accuracy_benchmark as a text table.
+
+    Parameters:
+    - report: list of dict
+        Result of run_accuracy_benchmark.
+
+    Returns:
+    - str: The formatted table; configurations on the Pareto front are
+      marked with '*'.
+    """
+    front = pareto_front(report)
+    lines = [f"{'configuration':<20}{'pairs':>8}{'param err':>11}"
+             f"{'error':>9}{'RMSD':>11}{'time (s)':>10}"]
+    for entry in report:
+        error = entry['parameter_error']
+        lines.append(
+            f"{entry['configuration']:<20}"
+            f"{entry['pair_rate']:>8.0%}"
+            f"{'-' if error is None else f'{error:.4f}':>11}"
+            f"{entry['error']:>9.4f}"
+            f"{entry['RMSD']:>11.6f}"
+            f"{entry['seconds']:>10.2f}"
+            f"{' *' if entry['configuration'] in front else ''}")
+    return '\n'.join(lines)
+
+
+def plot_accuracy_benchmark(report, filename):
+    """
+    Save a speed/accuracy chart of the result of run_accuracy_benchmark.
+
+    Matplotlib is only imported here, so the rest of the benchmark runs
+    without it.
+
+    Parameters:
+    - report: list of dict
+        Result of run_accuracy_benchmark.
+    - filename: str
+        Path of the image file to write.
+
+    Returns:
+    None
+    """
+    from matplotlib.figure import Figure
+
+    front = pareto_front(report)
+    figure = Figure(figsize=(7, 5))
+    axes = figure.add_subplot()
+
+    for entry in report:
+        on_front = entry['configuration'] in front
+        axes.plot(entry['seconds'], entry['error'],
+                  'o' if on_front else 'x', color='b' if on_front else 'gray')
+        axes.annotate(f"{entry['configuration']} "
+                      f"({entry['pair_rate']:.0%} pairs)",
+                      (entry['seconds'], entry['error']),
+                      textcoords='offset points', xytext=(5, 5))
+
+    front_entries = [entry for name in front for entry in report
+                     if entry['configuration'] == name]
+    axes.step([entry['seconds'] for entry in front_entries],
+              [entry['error'] for entry in front_entries],
+              'b--', where='post', label='Pareto front')
+
+    axes.set_title("Speed/accuracy")
+    axes.set_xlabel('Wall time per curve (s)')
+    axes.set_ylabel('Error (alignment error, wrong pair = 1)')
+    axes.grid(True)
+    axes.legend()
+    figure.savefig(filename)
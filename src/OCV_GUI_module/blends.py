@@ -0,0 +1,416 @@
+"""
+Decomposition with blended electrodes.
+
+A blended electrode (e.g. NMC+LFP or Si-graphite) is modelled as a
+capacity-weighted mixture of two half-cell curves from the library. Both
+components are at the same potential, so the lithiation of the blend at a
+potential U is the weighted sum of the lithiations of its components:
+
+    z(U) = fraction * z_1(U) + (1 - fraction) * z_2(U)
+
+The inverse curves z_i(U) are tabulated once per library curve on a common
+potential grid, so building a blend for a new fraction is a weighted sum
+and one interpolation. During a search, the OCP of a blend is interpolated
+linearly in these tables; only the best blend is turned into a cubic
+spline, as the library curves are.
+
+The blend combinations are spread over the cores with the layouts of
+optimization_functions.select_parallel_layout, except that the solvers
+cannot spread a population over processes, so 'workers' runs one process
+per combination instead.
+"""
+import logging
+from functools import partial
+from itertools import combinations, product
+
+import numpy as np
+from scipy.interpolate import interp1d
+from joblib import Parallel, delayed
+
+from .optimization_functions import (
+    calculate_aligned_curves, calculate_alignment_indices, optimization,
+    parallel_settings, perform_pair_search, select_parallel_layout)
+from .solvers import get_solver
+
+logger = logging.getLogger(__name__)
+
+BLENDED_ELECTRODES = ('cathode', 'anode', 'both')
+
+# Number of points of a blended curve, which sets its alignment indices
+N_BLEND_POINTS = 1001
+BLEND_X_VALUES = np.linspace(0, 1, N_BLEND_POINTS)
+
+
+def precompute_blend_tables(half_cells, n_potential=4001):
+    """
+    Tabulate the inverse OCP curve of every half-cell on a common grid.
+
+    Parameters:
+    - half_cells: dict
+        Half-cell data returned by add_half_cell_data.
+    - n_potential: int, optional
+        Number of points of the common potential grid.
+
+    Returns:
+    - dict: 'potential', the common potential grid, and 'lithiation',
+      a dict mapping every half-cell ID to its normalized lithiation
+      (0 to 1) at the grid potentials.
+    """
+    ocp = {ID: info['interpolated_function'](info['x_values'])
+           for ID, info in half_cells.items()}
+    # Lithiation normalized from the x values, which need not be evenly
+    # spaced
+    x_normalized = {
+        ID: (info['x_values'] - info['x_values'][0])
+        / (info['x_values'][-1] - info['x_values'][0])
+        for ID, info in half_cells.items()}
+    potential = np.linspace(min(np.min(y) for y in ocp.values()),
+                            max(np.max(y) for y in ocp.values()),
+                            n_potential)
+
+    lithiation = {}
+    for ID, y in ocp.items():
+        x = x_normalized[ID]
+        # Make the curve monotonic, so it can be inverted, and increasing
+        # for np.interp. Outside of its potential range a component stays
+        # fully lithiated or delithiated, which np.interp does by clamping.
+        sign = 1 if y[-1] >= y[0] else -1
+        y_monotonic = np.maximum.accumulate(sign * y)
+        lithiation[ID] = np.interp(sign * potential, y_monotonic, x)
+
+    return {'potential': potential, 'lithiation': lithiation}
+
+
+def blend_curve(blend_tables, first_ID, second_ID, fraction):
+    """
+    Lithiation and potential of a blend of two library curves.
+
+    Parameters:
+    - blend_tables: dict
+        Tables returned by precompute_blend_tables.
+    - first_ID, second_ID: str
+        IDs of the two components.
+    - fraction: float
+        Capacity fraction of the first component, between 0 and 1.
+
+    Returns:
+    - tuple: Increasing lithiation of the blend and its potential, without
+      the saturated ends.
+    """
+    potential = blend_tables['potential']
+    lithiation = fraction * blend_tables['lithiation'][first_ID] \
+        + (1 - fraction) * blend_tables['lithiation'][second_ID]
+
+    # np.interp needs increasing sample points
+    if lithiation[-1] < lithiation[0]:
+        lithiation = lithiation[::-1]
+        potential = potential[::-1]
+
+    # Drop the saturated ends, where the blend is fully (de)lithiated and
+    # the potential is no longer defined by the lithiation
+    first = np.flatnonzero(lithiation == lithiation[0])[-1]
+    last = np.flatnonzero(lithiation == lithiation[-1])[0]
+    return lithiation[first:last + 1], potential[first:last + 1]
+
+
+def blend_half_cells(blend_tables, first_ID, second_ID, fraction,
+                     n_points=N_BLEND_POINTS):
+    """
+    Build the half-cell data of a blend of two library curves.
+
+    Parameters:
+    - blend_tables: dict
+        Tables returned by precompute_blend_tables.
+    - first_ID, second_ID: str
+        IDs of the two components.
+    - fraction: float
+        Capacity fraction of the first component, between 0 and 1.
+    - n_points: int, optional
+        Number of points of the blended curve.
+
+    Returns:
+    - dict: Half-cell data of the blend, in the format of
+      add_half_cell_data, with the IDs and fraction of its components.
+    """
+    lithiation, potential = blend_curve(blend_tables, first_ID, second_ID,
+                                        fraction)
+    x_values = np.linspace(0, 1, n_points)
+    y_values = np.interp(x_values, lithiation, potential)
+
+    return {
+        'ID_number': f"{first_ID}+{second_ID}@{fraction:.3f}",
+        'x_values': x_values,
+        'interpolated_function': interp1d(
+            x_values, y_values, kind='cubic', fill_value='extrapolate'),
+        'components': (first_ID, second_ID),
+        'fraction': fraction
+    }
+
+
+def _electrode_info(half_cells, blend_tables, candidate, fraction):
+    # Half-cell data of a single library curve or of a blend of two
+    if isinstance(candidate, tuple):
+        return blend_half_cells(blend_tables, *candidate, fraction)
+    return half_cells[candidate]
+
+
+def _electrode_function(half_cells, blend_tables, candidate, fraction):
+    # OCP function and x values of a single library curve, or of a blend
+    # interpolated linearly in its tables instead of with a new spline
+    if isinstance(candidate, tuple):
+        lithiation, potential = blend_curve(blend_tables, *candidate,
+                                            fraction)
+        return (partial(np.interp, xp=lithiation, fp=potential),
+                BLEND_X_VALUES)
+    info = half_cells[candidate]
+    return info['interpolated_function'], info['x_values']
+
+
+def blend_optimization(params, cathode, anode, interpolated_cathodes,
+                       interpolated_anodes, cathode_tables, anode_tables,
+                       OCV_battery, SOC_battery, battery=1,
+                       derivative_inverse=0):
+    """
+    Objective function for a combination with one or two blended electrodes.
+
+    The OCP of a blended electrode is interpolated linearly in the blend
+    tables, which are computed once per search.
+
+    Parameters:
+    - params: tuple
+        e, f, g, h percentages as in optimization(), followed by the blend
+        fraction of every blended electrode (cathode first).
+    - cathode, anode: str or tuple
+        Library ID of a single curve, or a tuple of two IDs for a blend.
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - cathode_tables, anode_tables: dict or None
+        Tables returned by precompute_blend_tables.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+
+    Returns:
+    - RMSD: float
+        Root Mean Square Deviation, the objective value for optimization.
+    """
+    fractions = list(params[4:])
+    cathode_function, cathode_x_values = _electrode_function(
+        interpolated_cathodes, cathode_tables, cathode,
+        fractions.pop(0) if isinstance(cathode, tuple) else None)
+    anode_function, anode_x_values = _electrode_function(
+        interpolated_anodes, anode_tables, anode,
+        fractions.pop(0) if isinstance(anode, tuple) else None)
+
+    return optimization(
+        params[:4], anode_function, anode_x_values, cathode_function,
+        cathode_x_values, OCV_battery, SOC_battery, battery=battery,
+        derivative_inverse=derivative_inverse)
+
+
+def perform_blend_optimization(cathode, anode, interpolated_cathodes,
+                               interpolated_anodes, cathode_tables,
+                               anode_tables, OCV_battery, SOC_battery,
+                               battery, derivative_inverse, seed=None,
+                               solver='differential_evolution',
+                               solver_options=None):
+    """
+    Perform optimization for one combination of (blended) electrodes.
+
+    Parameters are the same as in blend_optimization, plus the seed of the
+    solver, the name of a solver registered in solvers.SOLVERS and its
+    solver_options (popsize, tol and maxiter).
+
+    Returns:
+    - optimization_results: dict
+        Cathode and anode candidates, optimized parameters (alignment
+        percentages followed by blend fractions) and RMSD.
+    """
+    n_fractions = isinstance(cathode, tuple) + isinstance(anode, tuple)
+    bounds = [(0, 1)] * (4 + n_fractions)
+
+    opt_result = get_solver(solver)(
+        lambda params: blend_optimization(
+            params, cathode, anode, interpolated_cathodes,
+            interpolated_anodes, cathode_tables, anode_tables, OCV_battery,
+            SOC_battery, battery=battery,
+            derivative_inverse=derivative_inverse),
+        bounds, seed=seed, **(solver_options or {})
+    )
+
+    return {
+        'cathode_data_ID': cathode,
+        'anode_data_ID': anode,
+        'optimized_params': opt_result.x,
+        'RMSD': opt_result.fun
+    }
+
+
+def rank_candidates(optimization_results, electrode):
+    """
+    Rank the library curves of an electrode by their best single-curve fit.
+
+    Parameters:
+    - optimization_results: list of dict
+        Results of perform_pair_search.
+    - electrode: str
+        'cathode' or 'anode'.
+
+    Returns:
+    - list: IDs ordered from the lowest to the highest RMSD.
+    """
+    best_RMSD = {}
+    for optimization_result in optimization_results:
+        ID = optimization_result[f'{electrode}_data_ID']
+        best_RMSD[ID] = min(best_RMSD.get(ID, np.inf),
+                            optimization_result['RMSD'])
+    return sorted(best_RMSD, key=best_RMSD.get)
+
+
+def perform_full_blend_optimization(SOC_battery, OCV_battery,
+                                    interpolated_cathodes,
+                                    interpolated_anodes, blend='cathode',
+                                    top_k=3, iterations=1, battery=1,
+                                    derivative_inverse=0, seed=None,
+                                    solver='differential_evolution',
+                                    solver_options=None, parallel='auto'):
+    """
+    Decompose a battery OCV with one or both electrodes blended.
+
+    The search is pruned in two steps. A single-curve pair search first
+    ranks the library curves of both electrodes. Blends are then formed
+    only between the top_k curves of a blended electrode and combined
+    with the top_k curves (or blends) of the other electrode, instead of
+    searching every triple or quadruple of the library.
+
+    Parameters:
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - interpolated_cathodes: dict
+        Dictionary containing information about interpolated cathode functions.
+    - interpolated_anodes: dict
+        Dictionary containing information about interpolated anode functions.
+    - blend: str, optional
+        Blended electrode: 'cathode', 'anode' or 'both'.
+    - top_k: int, optional
+        Number of best single curves per electrode kept after pruning.
+    - iterations: int, optional
+        Number of iterations for the blend optimization.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - seed: int, optional
+        Seed of the pair search and of every blend optimization.
+    - solver, solver_options: optional
+        Solver of the blend optimization and its options
+        (see perform_blend_optimization).
+    - parallel: str, optional
+        Parallel layout, 'auto' or one of PARALLEL_LAYOUTS (see
+        optimization_functions.select_parallel_layout), of the pair search
+        and of the blend combinations; 'workers' runs one process per
+        blend combination.
+
+    Raises:
+    - ValueError: If blend is not one of BLENDED_ELECTRODES, a blended
+      electrode has fewer than two library curves, or parallel is
+      unknown.
+
+    Returns:
+    - result: dict
+        Same keys as the result of perform_full_optimization_parallel, plus
+        'Cathode Blend' and 'Anode Blend' with the component IDs and
+        capacity fraction of the first component (None if not blended).
+    """
+    if blend not in BLENDED_ELECTRODES:
+        raise ValueError(
+            f"blend must be one of {BLENDED_ELECTRODES}, got '{blend}'.")
+
+    blend_cathode = blend in ('cathode', 'both')
+    blend_anode = blend in ('anode', 'both')
+    for blended, half_cells in ((blend_cathode, interpolated_cathodes),
+                                (blend_anode, interpolated_anodes)):
+        if blended and len(half_cells) < 2:
+            raise ValueError("A blended electrode needs at least two curves.")
+
+    # Pruning: rank single curves with one pair search
+    pair_results = perform_pair_search(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        battery=battery, derivative_inverse=derivative_inverse, seed=seed,
+        parallel=parallel)
+    top_cathodes = rank_candidates(pair_results, 'cathode')[:top_k]
+    top_anodes = rank_candidates(pair_results, 'anode')[:top_k]
+
+    # Inverse tables are computed once and reused by every blend
+    cathode_tables = precompute_blend_tables(interpolated_cathodes) \
+        if blend_cathode else None
+    anode_tables = precompute_blend_tables(interpolated_anodes) \
+        if blend_anode else None
+
+    cathode_candidates = list(combinations(top_cathodes, 2)) \
+        if blend_cathode else top_cathodes
+    anode_candidates = list(combinations(top_anodes, 2)) \
+        if blend_anode else top_anodes
+
+    parallel = select_parallel_layout(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        len(cathode_candidates) * len(anode_candidates), battery=battery,
+        derivative_inverse=derivative_inverse, parallel=parallel)
+    if parallel == 'workers':
+        logger.info("Blend searches run one process per combination "
+                    "instead of 'workers'")
+        parallel = 'processes'
+    settings = parallel_settings(parallel)
+
+    best_optimization_results = []
+    for iteration in range(iterations):
+        optimization_results = Parallel(n_jobs=settings['n_jobs'],
+                                        prefer=settings['prefer'])(
+            delayed(perform_blend_optimization)(
+                cathode, anode, interpolated_cathodes, interpolated_anodes,
+                cathode_tables, anode_tables, OCV_battery, SOC_battery,
+                battery, derivative_inverse, seed=seed, solver=solver,
+                solver_options=solver_options)
+            for cathode, anode in product(cathode_candidates,
+                                          anode_candidates)
+        )
+        best_optimization_results.append(
+            min(optimization_results, key=lambda x: x['RMSD']))
+
+    best_optimization_result = min(
+        best_optimization_results, key=lambda x: x['RMSD'])
+
+    fractions = list(best_optimization_result['optimized_params'][4:])
+    cathode = best_optimization_result['cathode_data_ID']
+    anode = best_optimization_result['anode_data_ID']
+    Best_Cathode = _electrode_info(
+        interpolated_cathodes, cathode_tables, cathode,
+        fractions.pop(0) if isinstance(cathode, tuple) else None)
+    Best_Anode = _electrode_info(
+        interpolated_anodes, anode_tables, anode,
+        fractions.pop(0) if isinstance(anode, tuple) else None)
+
+    best_parameters = calculate_alignment_indices(
+        best_optimization_result['optimized_params'][:4],
+        len(Best_Anode['x_values']), len(Best_Cathode['x_values']))
+
+    result = {
+        'Best Cathode Data ID': Best_Cathode['ID_number'],
+        'Best Anode Data ID': Best_Anode['ID_number'],
+        'Best Parameters': best_parameters,
+        'Lowest RMSD': best_optimization_result['RMSD'],
+        'Cathode Blend': (Best_Cathode['components'],
+                          Best_Cathode['fraction'])
+        if 'components' in Best_Cathode else None,
+        'Anode Blend': (Best_Anode['components'], Best_Anode['fraction'])
+        if 'components' in Best_Anode else None,
+        'SOC_battery': SOC_battery,
+        'OCV_battery': OCV_battery
+    }
+    result.update(
+        calculate_aligned_curves(Best_Cathode, Best_Anode, best_parameters))
+
+    return result
@@ -0,0 +1,328 @@
+"""
+Evaluation of one electrode against every candidate of the other at once.
+
+In a pair search, every (cathode, anode) pair is an isolated task, so the
+crop of a cathode is resampled again for every anode it is paired with.
+Here the half-cells of an electrode are tabulated once on a uniform grid
+and stacked into one 2-D array. One evaluation crops the fixed electrode
+once and crops every candidate of the other electrode with a single
+broadcast interpolation, giving the RMSD of all pairs in one NumPy
+expression.
+
+A search per fixed half-cell minimizes the lowest RMSD over its candidates,
+so it optimizes the alignment of the best candidate only, and only that
+pair is reported. Its alignment is confirmed with optimization(), so the
+reported RMSD is that of the usual objective. The tables are interpolated
+linearly instead of with the cubic splines of optimization(), which
+changes the RMSD during the search by about a microvolt at the default
+resolution.
+
+perform_pair_search(..., broadcast='anode') searches all anodes at once per
+cathode, broadcast='cathode' all cathodes at once per anode.
+"""
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.optimize import differential_evolution
+
+try:
+    from .optimization_functions import (
+        calculate_battery_OCV, calculate_battery_OCV_derivative,
+        calculate_RMSD, calculate_RMSD_terms, stop_callback)
+except ImportError:
+    # Imported as a top-level module, as GUI.py does
+    from optimization_functions import (
+        calculate_battery_OCV, calculate_battery_OCV_derivative,
+        calculate_RMSD, calculate_RMSD_terms, stop_callback)
+
+BROADCAST_ELECTRODES = ('anode', 'cathode')
+
+# Largest fraction of the electrode array trimmed at each end, as in
+# calculate_alignment_indices
+TRIM_FRACTIONS = {'anode': 0.3, 'cathode': 0.15}
+
+
+def stack_half_cells(half_cells, n_table=4001, dtype=np.float64):
+    """
+    Tabulate half-cell curves on uniform grids and stack them.
+
+    Parameters:
+    - half_cells: dict
+        Half-cell data returned by add_half_cell_data (or a subset).
+    - n_table: int, optional
+        Number of points of the table of every curve.
+    - dtype: numpy.dtype, optional
+        Floating point type of the tables.
+
+    Returns:
+    - dict: 'IDs', the 'lengths' of the x value arrays, the 'x_values'
+      padded with their last value to a common length, the 'x_first' and
+      'x_last' values, and the 'OCP' tables with shape
+      (len(half_cells), n_table).
+    """
+    IDs = list(half_cells)
+    lengths = np.array([len(half_cells[ID]['x_values']) for ID in IDs])
+    x_values = np.array([
+        np.pad(half_cells[ID]['x_values'], (0, lengths.max() - length),
+               mode='edge')
+        for ID, length in zip(IDs, lengths)])
+    x_first = x_values[:, 0]
+    x_last = x_values[np.arange(len(IDs)), lengths - 1]
+
+    grid = np.linspace(0, 1, n_table)
+    OCP = np.array([
+        half_cells[ID]['interpolated_function'](
+            first + grid * (last - first))
+        for ID, first, last in zip(IDs, x_first, x_last)], dtype=dtype)
+
+    return {'IDs': IDs, 'lengths': lengths, 'x_values': x_values,
+            'x_first': x_first, 'x_last': x_last, 'OCP': OCP}
+
+
+def resample_stacked_windows(stack, start_percentage, stop_percentage,
+                             trim_fraction, n_points=1001):
+    """
+    Crop every stacked curve and resample the windows at once.
+
+    The window of every curve is found as in calculate_alignment_indices
+    and resampled to n_points equally spaced x values, as in
+    optimization(), by linear interpolation in the tables.
+
+    Parameters:
+    - stack: dict
+        Stacked half-cells returned by stack_half_cells.
+    - start_percentage, stop_percentage: float
+        Alignment percentages trimming the start and end (e and f for the
+        anode, g and h for the cathode).
+    - trim_fraction: float
+        Largest trimmed fraction of the array, from TRIM_FRACTIONS.
+    - n_points: int, optional
+        Number of resampled points per window.
+
+    Returns:
+    - numpy.ndarray: Resampled OCP values with shape (len(IDs), n_points).
+    """
+    lengths = stack['lengths']
+    starts = (start_percentage * lengths * trim_fraction).astype(int)
+    stops = np.minimum(
+        lengths - (stop_percentage * lengths * trim_fraction).astype(int),
+        lengths)
+
+    rows = np.arange(len(lengths))
+    x_start = stack['x_values'][rows, starts]
+    x_stop = stack['x_values'][rows, stops - 1]
+    t = np.linspace(0, 1, n_points)
+    x = x_start[:, None] + (x_stop - x_start)[:, None] * t
+
+    # Position in the tables, split into an index and a weight
+    OCP = stack['OCP']
+    n_table = OCP.shape[1]
+    position = (x - stack['x_first'][:, None]) \
+        / (stack['x_last'] - stack['x_first'])[:, None] * (n_table - 1)
+    index = np.clip(position.astype(int), 0, n_table - 2)
+    weight = (position - index).astype(OCP.dtype, copy=False)
+    rows = rows[:, None]
+    return OCP[rows, index] * (1 - weight) + OCP[rows, index + 1] * weight
+
+
+class BroadcastObjective:
+    """
+    Lowest RMSD of an alignment over stacked cathode and anode candidates.
+
+    One of the stacks holds the fixed half-cell, the other its candidates.
+
+    Parameters:
+    - cathode_stack, anode_stack (dict): Stacks from stack_half_cells.
+    - SOC_battery, OCV_battery (array-like): SOC and OCV of the battery.
+    - battery, derivative_inverse (float, optional): Weighting factors for
+      different components of the objective function.
+    """
+
+    def __init__(self, cathode_stack, anode_stack, SOC_battery, OCV_battery,
+                 battery=1, derivative_inverse=0):
+        self.cathode_stack = cathode_stack
+        self.anode_stack = anode_stack
+        dtype = cathode_stack['OCP'].dtype
+        self.SOC_battery = np.asarray(SOC_battery, dtype=dtype)
+        self.OCV_battery = np.asarray(OCV_battery, dtype=dtype)
+        self.battery = battery
+        self.derivative_inverse = derivative_inverse
+
+    def evaluate(self, params):
+        """
+        RMSD of an alignment for every pair.
+
+        Parameters:
+        - params (array-like): Alignment percentages e, f, g and h.
+
+        Returns:
+        - numpy.ndarray: RMSD per candidate.
+        """
+        e, f, g, h = params
+        n_points = len(self.SOC_battery)
+        anode_OCP = resample_stacked_windows(
+            self.anode_stack, e, f, TRIM_FRACTIONS['anode'], n_points)
+        cathode_OCP = resample_stacked_windows(
+            self.cathode_stack, g, h, TRIM_FRACTIONS['cathode'], n_points)
+        # One of the two stacks has a single row, which is broadcast
+        return calculate_RMSD(cathode_OCP - anode_OCP, self.OCV_battery,
+                              self.SOC_battery, self.battery,
+                              self.derivative_inverse)
+
+    def __call__(self, params):
+        return self.evaluate(params).min()
+
+
+def perform_broadcast_optimization(fixed_ID, interpolated_cathodes,
+                                   interpolated_anodes, candidate_IDs,
+                                   OCV_battery, SOC_battery, battery,
+                                   derivative_inverse, broadcast='anode',
+                                   dtype=np.float64, seed=None,
+                                   deadline=None, time_limit=None,
+                                   n_table=4001):
+    """
+    Find the best candidate of one half-cell in one search.
+
+    The search minimizes the lowest RMSD over the candidates, so only the
+    alignment of the best candidate is optimized, and only that pair is
+    returned.
+
+    Parameters:
+    - fixed_ID: str
+        ID of the fixed half-cell: a cathode for broadcast='anode', an
+        anode for broadcast='cathode'.
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - candidate_IDs: list of str
+        IDs of the half-cells of the broadcast electrode paired with it.
+    - OCV_battery, SOC_battery: array-like
+        OCV and SOC values of the battery.
+    - battery, derivative_inverse: float
+        Weighting factors for different components of the objective function.
+    - broadcast: str, optional
+        Electrode whose candidates are evaluated at once, 'anode' or
+        'cathode'.
+    - dtype: numpy.dtype, optional
+        Floating point type of the tables during the search.
+    - seed: int, optional
+        Seed of the differential evolution.
+    - deadline, time_limit: float, optional
+        As in perform_optimization.
+    - n_table: int, optional
+        Number of points of the table of every curve.
+
+    Returns:
+    - optimization_result: dict
+        Result of the best pair in the form of perform_optimization, with
+        the RMSD of optimization(), or None if the deadline had passed.
+    """
+    start = time.perf_counter()
+    stop_time = None
+    if deadline is not None:
+        if time.time() >= deadline:
+            return None
+        stop_time = deadline if time_limit is None \
+            else min(deadline, time.time() + time_limit)
+
+    if broadcast == 'anode':
+        cathodes = {fixed_ID: interpolated_cathodes[fixed_ID]}
+        anodes = {ID: interpolated_anodes[ID] for ID in candidate_IDs}
+    else:
+        cathodes = {ID: interpolated_cathodes[ID] for ID in candidate_IDs}
+        anodes = {fixed_ID: interpolated_anodes[fixed_ID]}
+
+    objective = BroadcastObjective(
+        stack_half_cells(cathodes, n_table, dtype),
+        stack_half_cells(anodes, n_table, dtype),
+        SOC_battery, OCV_battery, battery, derivative_inverse)
+
+    interrupted = []
+    result = differential_evolution(
+        objective, [(0, 1)] * 4, seed=seed,
+        callback=None if stop_time is None
+        else stop_callback(stop_time, interrupted))
+
+    params = result.x
+    candidate_ID = candidate_IDs[int(np.argmin(objective.evaluate(params)))]
+    cathode_ID, anode_ID = (fixed_ID, candidate_ID) \
+        if broadcast == 'anode' else (candidate_ID, fixed_ID)
+    cathode_info = interpolated_cathodes[cathode_ID]
+    anode_info = interpolated_anodes[anode_ID]
+    functions = (anode_info['interpolated_function'], anode_info['x_values'],
+                 cathode_info['interpolated_function'],
+                 cathode_info['x_values'])
+    RMSD_terms = calculate_RMSD_terms(
+        calculate_battery_OCV(params, *functions),
+        np.asarray(OCV_battery), np.asarray(SOC_battery),
+        calculate_battery_OCV_derivative(params, *functions))
+    return {
+        'cathode_data_ID': cathode_ID,
+        'anode_data_ID': anode_ID,
+        'optimized_params': params,
+        'RMSD': battery * RMSD_terms[0] + derivative_inverse * RMSD_terms[1],
+        'nfev': result.nfev,
+        'RMSD_terms': RMSD_terms,
+        'seconds': time.perf_counter() - start,
+        'interrupted': bool(interrupted)
+    }
+
+
+def perform_broadcast_pair_search(SOC_battery, OCV_battery,
+                                  interpolated_cathodes, interpolated_anodes,
+                                  pairs, battery=1, derivative_inverse=0,
+                                  broadcast='anode', dtype=np.float64,
+                                  seed=None, n_jobs=-1, prefer=None,
+                                  deadline=None, time_limit=None):
+    """
+    Find the best pair of every fixed half-cell with one broadcast search.
+
+    Parameters:
+    - SOC_battery, OCV_battery: array-like
+        SOC and OCV values of the battery.
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - pairs: list of tuple
+        (cathode ID, anode ID) combinations to optimize.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - broadcast: str, optional
+        'anode' or 'cathode' (see perform_broadcast_optimization).
+    - dtype, seed: optional
+        As in perform_broadcast_optimization.
+    - n_jobs, prefer: optional
+        joblib settings of the searches of the fixed half-cells.
+    - deadline, time_limit: float, optional
+        As in perform_optimization, per search of a fixed half-cell.
+
+    Raises:
+    - ValueError: If broadcast is not one of BROADCAST_ELECTRODES.
+
+    Returns:
+    - optimization_results: list of dict
+        Result of the best pair of every fixed half-cell whose search was
+        not skipped, in the form of perform_optimization.
+    """
+    if broadcast not in BROADCAST_ELECTRODES:
+        raise ValueError(
+            f"broadcast must be one of {BROADCAST_ELECTRODES}, "
+            f"got '{broadcast}'.")
+
+    # Candidates of the broadcast electrode per fixed half-cell
+    groups = {}
+    for cathode_ID, anode_ID in pairs:
+        fixed_ID, candidate_ID = (cathode_ID, anode_ID) \
+            if broadcast == 'anode' else (anode_ID, cathode_ID)
+        groups.setdefault(fixed_ID, []).append(candidate_ID)
+
+    optimization_results = Parallel(n_jobs=n_jobs, prefer=prefer)(
+        delayed(perform_broadcast_optimization)(
+            fixed_ID, interpolated_cathodes, interpolated_anodes,
+            candidate_IDs, OCV_battery, SOC_battery, battery,
+            derivative_inverse, broadcast=broadcast, dtype=dtype, seed=seed,
+            deadline=deadline, time_limit=time_limit)
+        for fixed_ID, candidate_IDs in groups.items()
+    )
+    return [optimization_result
+            for optimization_result in optimization_results
+            if optimization_result is not None]
@@ -0,0 +1,1093 @@
+"""
+Command line interface for battery OCV decomposition.
+
+The interface runs without a display. Only argparse and the standard
+library are imported at start-up; NumPy, SciPy and joblib are imported
+when a command actually needs them. The GUI modules (tkinter, PIL) are
+never imported, and matplotlib only by `view --plot`.
+
+Example:
+    pybep run --cathodes data/cathode_data --anodes data/anode_data \\
+        --battery data/NMC811vsGraphite_OCV-LICeM.txt --output result.json
+"""
+import argparse
+import json
+import sys
+
+# Default values of the options of the run command
+RUN_DEFAULTS = {
+    'cathodes': None,
+    'anodes': None,
+    'battery': None,
+    'output': None,
+    'iterations': 5,
+    'battery_weight': 1.0,
+    'derivative_weight': 0.0,
+    'single_precision': False,
+    'adaptive': False,
+    'tolerance': 1e-5,
+    'stable_restarts': 2,
+    'feature_init': False,
+    'parallel': 'auto',
+    'match_chemistry': None,
+    'cathode_chemistry': None,
+    'anode_chemistry': None,
+    'fallback_all_pairs': False,
+    'cluster_threshold': None,
+    'top_clusters': 2,
+    'charge': None,
+    'coupling': 'shared',
+    'tie': 0.05,
+    'search_limits': None,
+    'solver': 'differential_evolution',
+    'popsize': None,
+    'solver_tol': None,
+    'maxiter': None,
+    'time_budget': None,
+    'broadcast': None,
+    'results_table': None,
+    'top': None,
+    'blend': None,
+    'top_k': 3
+}
+
+# Options that every search mode uses
+COMMON_RUN_OPTIONS = (
+    'cathodes', 'anodes', 'battery', 'output', 'iterations', 'battery_weight',
+    'derivative_weight', 'solver', 'popsize', 'solver_tol', 'maxiter')
+
+
+def load_config(config_file):
+    """
+    Load run options from a JSON config file.
+
+    The keys of the file are the long option names of the run command,
+    with either dashes or underscores (e.g. "battery-weight").
+
+    Parameters:
+    - config_file (str): Path to the JSON config file.
+
+    Raises:
+    - ValueError: If the file contains an unknown option.
+
+    Returns:
+    - dict: Options read from the file.
+    """
+    with open(config_file, 'r') as file:
+        config = json.load(file)
+
+    options = {}
+    for key, value in config.items():
+        name = key.replace('-', '_')
+        if name not in RUN_DEFAULTS:
+            raise ValueError(
+                f"Unknown option '{key}' in config file '{config_file}'.")
+        options[name] = value
+
+    return options
+
+
+def resolve_run_options(args):
+    """
+    Merge defaults, config file options and command line arguments.
+
+    Command line arguments take precedence over the config file,
+    which takes precedence over the defaults.
+
+    Parameters:
+    - args (argparse.Namespace): Parsed command line arguments.
+
+    Raises:
+    - ValueError: If a required option is missing.
+
+    Returns:
+    - dict: Resolved run options.
+    """
+    options = dict(RUN_DEFAULTS)
+    if args.config:
+        options.update(load_config(args.config))
+    for name in RUN_DEFAULTS:
+        value = getattr(args, name)
+        if value is not None:
+            options[name] = value
+
+    missing = [name for name in ('cathodes', 'anodes', 'battery')
+               if not options[name]]
+    if missing:
+        raise ValueError(
+            "Missing required option(s): "
+            + ", ".join('--' + name for name in missing))
+
+    return options
+
+
+def check_mode_options(options, mode, supported=()):
+    """
+    Reject options that a search mode does not use.
+
+    Parameters:
+    - options (dict): Options returned by resolve_run_options.
+    - mode (str): Option selecting the mode, for the error message.
+    - supported (iterable of str): Options the mode uses besides
+      COMMON_RUN_OPTIONS.
+
+    Raises:
+    - ValueError: If any other option differs from its default.
+    """
+    unsupported = [
+        name for name, default in RUN_DEFAULTS.items()
+        if name not in COMMON_RUN_OPTIONS and name not in supported
+        and options[name] != default]
+    if unsupported:
+        raise ValueError(
+            f"{mode} cannot be combined with "
+            + ", ".join('--' + name.replace('_', '-')
+                        for name in unsupported))
+
+
+def run_decomposition(options):
+    """
+    Run the decomposition described by the resolved run options.
+
+    Parameters:
+    - options (dict): Options returned by resolve_run_options.
+
+    Returns:
+    - dict: Result returned by perform_full_optimization_parallel, or by
+      perform_full_hysteresis_optimization with a charge branch.
+    """
+    import numpy as np
+    from .add_battery import load_soc_ocv_data
+    from .add_curves import add_half_cell_data
+    from .optimization_functions import perform_full_optimization_parallel
+    from .optimization_functions import (
+        save_result_to_json, save_result_to_npz)
+
+    interpolated_cathodes = add_half_cell_data(options['cathodes'])
+    interpolated_anodes = add_half_cell_data(options['anodes'])
+    SOC_battery, OCV_battery = load_soc_ocv_data(options['battery'])
+
+    pairs = None
+    if options['match_chemistry']:
+        from .library import (
+            filter_pairs, full_cell_metadata, index_half_cell_library)
+        chemistries = {
+            'cathode': options['cathode_chemistry'],
+            'anode': options['anode_chemistry']}
+        if not all(chemistries.values()):
+            metadata = full_cell_metadata(options['battery'])
+            chemistries = {name: chemistry or metadata[name]
+                           for name, chemistry in chemistries.items()}
+        pairs = filter_pairs(
+            index_half_cell_library(options['cathodes']),
+            index_half_cell_library(options['anodes']),
+            chemistries['cathode'], chemistries['anode'],
+            match=options['match_chemistry'],
+            fallback=bool(options['fallback_all_pairs']))
+
+    solver_options = {
+        name: value for name, value in (
+            ('popsize', options['popsize']), ('tol', options['solver_tol']),
+            ('maxiter', options['maxiter']))
+        if value is not None}
+
+    if options['blend']:
+        return run_blend_decomposition(
+            options, SOC_battery, OCV_battery, interpolated_cathodes,
+            interpolated_anodes, solver_options)
+
+    if options['charge']:
+        return run_hysteresis_decomposition(
+            options, SOC_battery, OCV_battery, interpolated_cathodes,
+            interpolated_anodes, pairs, solver_options)
+
+    limits = None
+    if options['search_limits']:
+        from .constraints import load_search_limits
+        limits = load_search_limits(options['search_limits'])
+
+    search = perform_full_optimization_parallel
+    search_settings = {'pairs': pairs}
+    if options['cluster_threshold']:
+        from .library import perform_clustered_optimization
+        search = perform_clustered_optimization
+        search_settings = {
+            'threshold': float(options['cluster_threshold']),
+            'top_clusters': int(options['top_clusters'])}
+        # Cluster only the half-cells left by the chemistry filter
+        if pairs is not None:
+            interpolated_cathodes = {
+                cathode: interpolated_cathodes[cathode]
+                for cathode in dict.fromkeys(pair[0] for pair in pairs)}
+            interpolated_anodes = {
+                anode: interpolated_anodes[anode]
+                for anode in dict.fromkeys(pair[1] for pair in pairs)}
+
+    result = search(
+        SOC_battery, OCV_battery,
+        interpolated_cathodes, interpolated_anodes,
+        iterations=int(options['iterations']),
+        battery=float(options['battery_weight']),
+        derivative_inverse=float(options['derivative_weight']),
+        dtype=np.float32 if options['single_precision'] else np.float64,
+        adaptive=bool(options['adaptive']),
+        tolerance=float(options['tolerance']),
+        stable_restarts=int(options['stable_restarts']),
+        initializer='features' if options['feature_init'] else None,
+        parallel=options['parallel'],
+        limits=limits,
+        solver=options['solver'],
+        solver_options=solver_options or None,
+        broadcast=options['broadcast'],
+        time_budget=None if options['time_budget'] is None
+        else float(options['time_budget']),
+        **search_settings
+    )
+
+    if options['output'] and options['output'].endswith('.npz'):
+        save_result_to_npz(result, options['output'])
+    elif options['output']:
+        save_result_to_json(result, options['output'])
+    if options['results_table']:
+        result['Results Table'].save(options['results_table'])
+
+    return result
+
+
+def run_blend_decomposition(options, SOC_battery, OCV_battery,
+                            interpolated_cathodes, interpolated_anodes,
+                            solver_options=None):
+    """
+    Decompose the battery with a blended electrode (--blend).
+
+    Parameters:
+    - options (dict): Options returned by resolve_run_options.
+    - SOC_battery, OCV_battery (array-like): Battery curve.
+    - interpolated_cathodes, interpolated_anodes (dict): Half-cell data.
+    - solver_options (dict, optional): popsize, tol and maxiter of the
+      solver.
+
+    Raises:
+    - ValueError: If --blend is combined with an option it does not use.
+
+    Returns:
+    - dict: Result returned by perform_full_blend_optimization.
+    """
+    from .blends import perform_full_blend_optimization
+    from .optimization_functions import (
+        save_result_to_json, save_result_to_npz)
+
+    check_mode_options(options, '--blend', ('blend', 'top_k', 'parallel'))
+    result = perform_full_blend_optimization(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        blend=options['blend'], top_k=int(options['top_k']),
+        iterations=int(options['iterations']),
+        battery=float(options['battery_weight']),
+        derivative_inverse=float(options['derivative_weight']),
+        solver=options['solver'], solver_options=solver_options,
+        parallel=options['parallel'])
+
+    if options['output'] and options['output'].endswith('.npz'):
+        save_result_to_npz(result, options['output'])
+    elif options['output']:
+        save_result_to_json(result, options['output'])
+
+    return result
+
+
+def run_hysteresis_decomposition(options, SOC_battery, OCV_battery,
+                                 interpolated_cathodes, interpolated_anodes,
+                                 pairs=None, solver_options=None):
+    """
+    Fit the charge branch (--charge) and discharge branch (--battery) jointly.
+
+    Parameters:
+    - options (dict): Options returned by resolve_run_options.
+    - SOC_battery, OCV_battery (array-like): Discharge branch.
+    - interpolated_cathodes, interpolated_anodes (dict): Half-cell data.
+    - pairs (list of tuple, optional): Combinations to optimize.
+    - solver_options (dict, optional): popsize, tol and maxiter of the
+      solver.
+
+    Raises:
+    - ValueError: If --charge is combined with an option it does not use.
+
+    Returns:
+    - dict: Result returned by perform_full_hysteresis_optimization.
+    """
+    from .add_battery import load_soc_ocv_data
+    from .hysteresis import perform_full_hysteresis_optimization
+    from .optimization_functions import RESULT_SUMMARY_KEYS
+    from .optimization_functions import result_to_json_data
+
+    check_mode_options(options, '--charge', (
+        'charge', 'coupling', 'tie', 'parallel', 'time_budget',
+        'match_chemistry', 'cathode_chemistry', 'anode_chemistry',
+        'fallback_all_pairs'))
+    SOC_charge, OCV_charge = load_soc_ocv_data(options['charge'])
+    result = perform_full_hysteresis_optimization(
+        SOC_charge, OCV_charge, SOC_battery, OCV_battery,
+        interpolated_cathodes, interpolated_anodes,
+        iterations=int(options['iterations']),
+        battery=float(options['battery_weight']),
+        derivative_inverse=float(options['derivative_weight']),
+        coupling=options['coupling'], tie=float(options['tie']),
+        pairs=pairs, solver=options['solver'], solver_options=solver_options,
+        parallel=options['parallel'],
+        time_budget=None if options['time_budget'] is None
+        else float(options['time_budget']))
+
+    if options['output']:
+        data = {key: result[key] for key in RESULT_SUMMARY_KEYS
+                if key in result}
+        data['Coupling'] = result['Coupling']
+        for branch, branch_result in result['Branches'].items():
+            data[branch] = result_to_json_data(branch_result)
+        with open(options['output'], 'w') as file:
+            json.dump(data, file)
+
+    return result
+
+
+def _print_completeness(result):
+    # Completeness of a search with a time budget
+    if 'Search Completeness' not in result:
+        return
+    completeness = result['Search Completeness']
+    state = 'complete' if completeness['Complete'] else 'incomplete'
+    print(f"Search {state} after {completeness['Seconds']:.1f} s: "
+          f"{completeness['Pairs Searched']} of {completeness['Pairs']} "
+          f"pairs searched, {completeness['Iterations']} iterations, "
+          f"{completeness['Interrupted Runs']} runs interrupted, "
+          f"{completeness['Skipped Runs']} skipped")
+
+
+def command_run(args):
+    options = resolve_run_options(args)
+    result = run_decomposition(options)
+
+    if 'Branches' in result:
+        print(f"Best Cathode Data ID: {result['Best Cathode Data ID']}")
+        print(f"Best Anode Data ID: {result['Best Anode Data ID']}")
+        print(f"Joint RMSD ({result['Coupling']}): {result['Lowest RMSD']}")
+        for branch, branch_result in result['Branches'].items():
+            print(f"{branch.capitalize()}: parameters "
+                  f"{branch_result['Best Parameters']}, "
+                  f"RMSD {branch_result['Lowest RMSD']}")
+        print(f"Parallel layout: {result['Parallel Layout']}")
+        _print_completeness(result)
+        if options['output']:
+            print(f"Result saved to {options['output']}")
+        return
+
+    print(f"Best Cathode Data ID: {result['Best Cathode Data ID']}")
+    print(f"Best Anode Data ID: {result['Best Anode Data ID']}")
+    print(f"Best Parameters: {result['Best Parameters']}")
+    print(f"Lowest RMSD: {result['Lowest RMSD']}")
+    for electrode in ('Cathode', 'Anode'):
+        if result.get(f'{electrode} Blend'):
+            (first_ID, second_ID), fraction = result[f'{electrode} Blend']
+            print(f"{electrode} blend: {fraction:.3f} {first_ID} + "
+                  f"{1 - fraction:.3f} {second_ID}")
+    if 'Parallel Layout' in result:
+        print(f"Parallel layout: {result['Parallel Layout']}")
+    if 'Searched Pairs' in result:
+        print(f"Clusters: {len(result['Clusters']['cathode'])} cathode, "
+              f"{len(result['Clusters']['anode'])} anode; "
+              f"{result['Searched Pairs']} pairs searched after the "
+              "representatives")
+    if 'Restarts per pair' in result:
+        restarts = result['Restarts per pair']
+        print(f"Restarts: {sum(restarts.values())} over {len(restarts)} "
+              f"pairs (max {max(restarts.values())} per pair)")
+    if options['top']:
+        table = result['Results Table']
+        records = table.top_k(int(options['top']))
+        print(f"Top {options['top']} pairs:")
+        for record, (cathode_ID, anode_ID) in zip(records,
+                                                  table.pair_IDs(records)):
+            print(f"  {record['RMSD']:.6f}  {cathode_ID} / {anode_ID}  "
+                  f"({record['e']}, {record['f']}, {record['g']}, "
+                  f"{record['h']})")
+    _print_completeness(result)
+    if options['output']:
+        print(f"Result saved to {options['output']}")
+    if options['results_table']:
+        print(f"Results table saved to {options['results_table']}")
+
+
+def _column(value):
+    # Column given by index or by header name
+    return int(value) if value.isdigit() else value
+
+
+def _segment(value):
+    # Segment of extract-ocv: 'longest', 'single' or an index
+    if value == 'single':
+        return None
+    if value == 'longest':
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected 'longest', 'single' or an index, got '{value}'")
+
+
+def command_extract_ocv(args):
+    from .add_battery import extract_pseudo_ocv, save_soc_ocv_data
+
+    SOC_battery, OCV_battery = extract_pseudo_ocv(
+        args.log_file, time_column=args.time_column,
+        current_column=args.current_column,
+        voltage_column=args.voltage_column, step_column=args.step_column,
+        steps=args.steps, direction=args.direction,
+        max_current=args.max_current, time_scale=args.time_scale,
+        charge_resolution=args.charge_resolution, n_points=args.points,
+        segment=args.segment)
+    save_soc_ocv_data(args.output, SOC_battery, OCV_battery)
+    print(f"Pseudo-OCV curve ({len(SOC_battery)} points, "
+          f"{OCV_battery.min():.4f} V to {OCV_battery.max():.4f} V) "
+          f"saved to {args.output}")
+    return 0
+
+
+def _weights(value):
+    # Battery and derivative weights given as "battery,derivative"
+    battery, _, derivative_inverse = value.partition(',')
+    try:
+        return float(battery), float(derivative_inverse or 0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"weights must be 'battery,derivative', got '{value}'")
+
+
+def command_pareto(args):
+    from .add_battery import load_soc_ocv_data
+    from .add_curves import add_half_cell_data
+    from .pareto import (
+        SEARCH_WEIGHTS, fronts_to_json_data, perform_full_pareto_optimization,
+        weight_sweep)
+
+    interpolated_cathodes = add_half_cell_data(args.cathodes)
+    interpolated_anodes = add_half_cell_data(args.anodes)
+    SOC_battery, OCV_battery = load_soc_ocv_data(args.battery)
+
+    solver_options = {
+        name: value for name, value in (
+            ('popsize', args.popsize), ('tol', args.solver_tol),
+            ('maxiter', args.maxiter))
+        if value is not None}
+    search_weights = args.search_weights or SEARCH_WEIGHTS
+
+    fronts = perform_full_pareto_optimization(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        iterations=args.iterations, search_weights=search_weights,
+        solver=args.solver, solver_options=solver_options or None,
+        parallel=args.parallel)
+    sweep = weight_sweep(fronts, interpolated_cathodes, interpolated_anodes,
+                         args.weights or search_weights)
+
+    print(f"{'weights':<14}{'cathode':<40}{'anode':<40}{'RMSD':>10}"
+          f"{'OCV':>10}{'dQ/dV':>10}  parameters")
+    for entry in sweep:
+        weights = f"{entry['Battery Weight']:g},{entry['Derivative Weight']:g}"
+        print(f"{weights:<14}{entry['Best Cathode Data ID']:<40}"
+              f"{entry['Best Anode Data ID']:<40}"
+              f"{entry['Lowest RMSD']:>10.6f}{entry['OCV RMSD']:>10.6f}"
+              f"{entry['dQ/dV RMSD']:>10.6f}  {entry['Best Parameters']}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'fronts': fronts_to_json_data(fronts),
+                       'sweep': sweep}, file, indent=2)
+    return 0
+
+
+def command_view(args):
+    import os
+    from .optimization_functions import list_result_files, load_result
+
+    if os.path.isdir(args.path):
+        files = list_result_files(args.path)
+        if args.index is None:
+            for index, filename in enumerate(files):
+                print(f"{index:>5}  {os.path.basename(filename)}")
+            return 0
+        if not 0 <= args.index < len(files):
+            raise ValueError(f"--index must be between 0 and "
+                             f"{len(files) - 1}, got {args.index}.")
+        filename = files[args.index]
+    else:
+        filename = args.path
+
+    result = load_result(filename)
+    print(f"Result file: {filename}")
+    print(f"Best Cathode Data ID: {result['Best Cathode Data ID']}")
+    print(f"Best Anode Data ID: {result['Best Anode Data ID']}")
+    print(f"Best Parameters: {result['Best Parameters']}")
+    print(f"Lowest RMSD: {result['Lowest RMSD']}")
+    if args.plot:
+        from .plotting import create_result_figure, update_result_lines
+
+        figure, lines = create_result_figure()
+        update_result_lines(lines, result)
+        figure.savefig(args.plot)
+        print(f"Plot saved to {args.plot}")
+    return 0
+
+
+def command_serve(args):
+    import asyncio
+    import logging
+    from .server import DecompositionServer
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    server = DecompositionServer(
+        args.cathodes, args.anodes, queue_size=args.queue_size,
+        concurrency=args.concurrency, workers=args.workers)
+    try:
+        asyncio.run(server.serve(
+            host=args.host, port=args.port, socket_path=args.socket))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def command_startup_benchmark(args):
+    from .benchmark import measure_startup_time, format_startup_report
+
+    report = measure_startup_time(repeat=args.repeat)
+    print(format_startup_report(report))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    # Fail if a run imports any of the GUI or plotting modules
+    if any(entry['heavy_modules'] for entry in report):
+        return 1
+    return 0
+
+
+def command_accuracy_benchmark(args):
+    from .add_curves import add_half_cell_data
+    from .benchmark import (
+        format_accuracy_report, make_synthetic_cases, plot_accuracy_benchmark,
+        run_accuracy_benchmark)
+
+    configurations = None
+    if args.configurations:
+        with open(args.configurations, 'r') as file:
+            configurations = json.load(file)
+
+    interpolated_cathodes = add_half_cell_data(args.cathodes)
+    interpolated_anodes = add_half_cell_data(args.anodes)
+    cases = make_synthetic_cases(
+        interpolated_cathodes, interpolated_anodes, n_cases=args.cases,
+        noise=args.noise, seed=args.seed)
+    report = run_accuracy_benchmark(
+        cases, interpolated_cathodes, interpolated_anodes, configurations)
+
+    print(format_accuracy_report(report))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.plot:
+        plot_accuracy_benchmark(report, args.plot)
+    return 0
+
+
+def command_compare_solvers(args):
+    from .add_battery import load_soc_ocv_data
+    from .add_curves import add_half_cell_data
+    from .solvers import compare_solvers, format_solver_comparison
+
+    cathode = add_half_cell_data(args.cathodes)[args.cathode]
+    anode = add_half_cell_data(args.anodes)[args.anode]
+    SOC_battery, OCV_battery = load_soc_ocv_data(args.battery)
+
+    solver_options = None
+    if args.solver_options:
+        with open(args.solver_options, 'r') as file:
+            solver_options = json.load(file)
+
+    comparison = compare_solvers(
+        cathode, anode, SOC_battery, OCV_battery, solvers=args.solvers,
+        repeats=args.repeats, target_RMSD=args.target,
+        tolerance=args.tolerance, solver_options=solver_options)
+    print(format_solver_comparison(comparison))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(comparison, file, indent=2)
+    return 0
+
+
+def _print_online_state(state):
+    if state['Residual'] is None:
+        print(f"{state['Points']:>6}  waiting for points")
+        return
+    print(f"{state['Points']:>6}  {str(state['Best Parameters']):<24}"
+          f"{state['Residual']:>10.6f}{state['nfev']:>8}"
+          f"{'  re-searched' if state['Re-searched'] else ''}")
+
+
+def command_online(args):
+    from .add_curves import add_half_cell_data
+    from .online import OnlineDecomposition
+    from .optimization_functions import load_result
+
+    interpolated_cathodes = add_half_cell_data(args.cathodes)
+    interpolated_anodes = add_half_cell_data(args.anodes)
+    settings = dict(n_bins=args.bins, drift_threshold=args.drift_threshold,
+                    forgetting=args.forgetting,
+                    local_evaluations=args.local_evaluations)
+    if args.result:
+        online = OnlineDecomposition.from_result(
+            load_result(args.result), interpolated_cathodes,
+            interpolated_anodes, **settings)
+    elif args.cathode in interpolated_cathodes \
+            and args.anode in interpolated_anodes:
+        online = OnlineDecomposition(
+            interpolated_cathodes[args.cathode],
+            interpolated_anodes[args.anode], **settings)
+    else:
+        raise ValueError(
+            "Give a saved --result, or the --cathode and --anode IDs of "
+            "a pair of the half-cell data.")
+
+    print(f"{'points':>6}  {'parameters':<24}{'residual':>10}{'nfev':>8}")
+    file = sys.stdin if args.points == '-' else open(args.points, 'r')
+    with file:
+        batch = []
+        # Lines are read as they arrive, so the points can be piped in
+        for line in file:
+            if line.strip():
+                batch.append([float(value) for value in line.split()[:2]])
+            if len(batch) == args.batch:
+                _print_online_state(online.update(*zip(*batch)))
+                batch = []
+        if batch:
+            _print_online_state(online.update(*zip(*batch)))
+    print(f"{online.updates} updates, {online.searches} full searches, "
+          f"{online.nfev} evaluations")
+    return 0
+
+
+def build_parser():
+    """
+    Build the argument parser of the command line interface.
+
+    Returns:
+    - argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog='pybep',
+        description="Battery OCV decomposition without the GUI.")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser(
+        'run', help="Decompose a battery OCV curve.")
+    run_parser.add_argument(
+        '--config', help="JSON file with options for this command.")
+    run_parser.add_argument(
+        '--cathodes', help="Folder with cathode half-cell data.")
+    run_parser.add_argument(
+        '--anodes', help="Folder with anode half-cell data.")
+    run_parser.add_argument(
+        '--battery', help="TXT file with battery SOC/OCV data.")
+    run_parser.add_argument(
+        '--output', help="JSON or npz file to save the result to.")
+    run_parser.add_argument(
+        '--iterations', type=int,
+        help=f"Number of iterations (default {RUN_DEFAULTS['iterations']}).")
+    run_parser.add_argument(
+        '--battery-weight', type=float,
+        help="Weight of the battery OCV term "
+             f"(default {RUN_DEFAULTS['battery_weight']}).")
+    run_parser.add_argument(
+        '--derivative-weight', type=float,
+        help="Weight of the differential capacity term "
+             f"(default {RUN_DEFAULTS['derivative_weight']}).")
+    run_parser.add_argument(
+        '--single-precision', action='store_true', default=None,
+        help="Evaluate the objective in single precision during the search. "
+             "The reported RMSD and curves stay in double precision.")
+    run_parser.add_argument(
+        '--adaptive', action='store_true', default=None,
+        help="Restart only pairs that have not converged and stop once the "
+             "best result is stable. --iterations is then the maximum "
+             "number of restarts per pair.")
+    run_parser.add_argument(
+        '--tolerance', type=float,
+        help="RMSD change below which adaptive restarts agree "
+             f"(default {RUN_DEFAULTS['tolerance']}).")
+    run_parser.add_argument(
+        '--stable-restarts', type=int,
+        help="Number of agreeing restarts needed for convergence "
+             f"(default {RUN_DEFAULTS['stable_restarts']}).")
+    run_parser.add_argument(
+        '--feature-init', action='store_true', default=None,
+        help="Start every search from an alignment estimated from the "
+             "dQ/dV peaks of the battery and half-cell curves.")
+    run_parser.add_argument(
+        '--parallel',
+        choices=('auto', 'processes', 'threads', 'workers', 'serial'),
+        help="Parallel layout of the search: processes or threads per "
+             "cathode and anode pair, all cores per search (workers) or "
+             "serial. By default it is chosen from the number of pairs, "
+             "the number of cores and the measured cost of one evaluation.")
+    run_parser.add_argument(
+        '--match-chemistry', choices=('exact', 'family'),
+        help="Only pair half-cells whose chemistry matches the battery: "
+             "the same chemistry (exact) or the same family, e.g. any NMC "
+             "for NMC811. The chemistries are read from the battery file "
+             "name <Cathode>vs<Anode>_OCV-<Source> or its JSON sidecar.")
+    run_parser.add_argument(
+        '--cathode-chemistry',
+        help="Cathode chemistry of the battery, instead of the file name.")
+    run_parser.add_argument(
+        '--anode-chemistry',
+        help="Anode chemistry of the battery, instead of the file name.")
+    run_parser.add_argument(
+        '--fallback-all-pairs', action='store_true', default=None,
+        help="With --match-chemistry, use every half-cell of an electrode "
+             "that has no match instead of failing.")
+    run_parser.add_argument(
+        '--cluster-threshold', type=float,
+        help="Cluster half-cells whose curves differ by less than this RMS "
+             "potential (V, e.g. 0.05), search the cluster representatives "
+             "first and then only the members of the best clusters.")
+    run_parser.add_argument(
+        '--top-clusters', type=int,
+        help="Number of best cluster pairs searched member by member "
+             f"(default {RUN_DEFAULTS['top_clusters']}).")
+    run_parser.add_argument(
+        '--search-limits',
+        help="JSON file with per-chemistry bounds of e, f, g, h, minimum "
+             "electrode windows and an N/P ratio range that narrow the "
+             "search (see constraints.py).")
+    run_parser.add_argument(
+        '--charge',
+        help="TXT file with the charge branch of the battery. The charge "
+             "and discharge (--battery) branches are then fitted jointly.")
+    run_parser.add_argument(
+        '--coupling', choices=('shared', 'tied'),
+        help="With --charge: the same e, f, g, h for both branches (shared, "
+             "default) or charge parameters within --tie of the discharge "
+             "ones (tied).")
+    run_parser.add_argument(
+        '--tie', type=float,
+        help="Largest difference of a charge parameter from the discharge "
+             f"one for tied coupling (default {RUN_DEFAULTS['tie']}).")
+    run_parser.add_argument(
+        '--solver',
+        help="Optimizer of every pair: differential_evolution (default), "
+             "dual_annealing, shgo, nelder_mead, cma_es, surrogate (an RBF "
+             "model proposing points, with --maxiter true evaluations) or "
+             "a solver registered in solvers.SOLVERS.")
+    run_parser.add_argument(
+        '--popsize', type=int,
+        help="Population size of the solver (starts for nelder_mead, "
+             "sampling points for shgo).")
+    run_parser.add_argument(
+        '--solver-tol', type=float,
+        help="Convergence tolerance of the solver.")
+    run_parser.add_argument(
+        '--maxiter', type=int,
+        help="Maximum number of iterations of the solver.")
+    run_parser.add_argument(
+        '--time-budget', type=float,
+        help="Seconds within which to return the best result found so far. "
+             "The time is shared by the iterations and pairs; searches "
+             "that use up their share are stopped, and the completeness of "
+             "the search is reported.")
+    run_parser.add_argument(
+        '--blend', choices=('cathode', 'anode', 'both'),
+        help="Model the cathode, the anode or both as a capacity-weighted "
+             "blend of two library curves, whose fraction is fitted with "
+             "e, f, g and h.")
+    run_parser.add_argument(
+        '--top-k', type=int,
+        help="With --blend, number of best single curves per electrode "
+             f"that blends are formed from (default {RUN_DEFAULTS['top_k']}).")
+    run_parser.add_argument(
+        '--broadcast', choices=('anode', 'cathode'),
+        help="Search all anodes at once per cathode (anode) or all "
+             "cathodes at once per anode (cathode): one search per fixed "
+             "half-cell scores a crop against every candidate in one "
+             "vectorized evaluation.")
+    run_parser.add_argument(
+        '--results-table',
+        help="CSV or npz file to save the outcome of every run of every "
+             "pair to (pair IDs, indices, RMSD terms, evaluations, time).")
+    run_parser.add_argument(
+        '--top', type=int,
+        help="Print the given number of best pairs, e.g. to spot near-ties.")
+    run_parser.set_defaults(handler=command_run)
+
+    extract_parser = subparsers.add_parser(
+        'extract-ocv',
+        help="Extract a pseudo-OCV curve from a raw cycler export.")
+    extract_parser.add_argument(
+        'log_file', help="CSV or text export of the cycler.")
+    extract_parser.add_argument(
+        '--output', required=True,
+        help="TXT file to save the SOC/OCV data to, usable as --battery.")
+    extract_parser.add_argument(
+        '--time-column', type=_column, default=0,
+        help="Index or header name of the time column (default 0).")
+    extract_parser.add_argument(
+        '--current-column', type=_column, default=1,
+        help="Index or header name of the current column (default 1).")
+    extract_parser.add_argument(
+        '--voltage-column', type=_column, default=2,
+        help="Index or header name of the voltage column (default 2).")
+    extract_parser.add_argument(
+        '--step-column', type=_column,
+        help="Index or header name of the step number column.")
+    extract_parser.add_argument(
+        '--steps', type=int, nargs='+',
+        help="Step numbers to keep (needs --step-column).")
+    extract_parser.add_argument(
+        '--direction', choices=('discharge', 'charge'), default='discharge',
+        help="Use discharge (negative) or charge (positive) current "
+             "(default discharge).")
+    extract_parser.add_argument(
+        '--max-current', type=float,
+        help="Largest absolute current, in A, of a low-rate row.")
+    extract_parser.add_argument(
+        '--time-scale', type=float, default=1.0,
+        help="Seconds per unit of the time column (default 1).")
+    extract_parser.add_argument(
+        '--charge-resolution', type=float, default=1e-4,
+        help="Width, in Ah, of the charge bins (default 1e-4).")
+    extract_parser.add_argument(
+        '--points', type=int, default=1001,
+        help="Number of points of the curve (default 1001).")
+    extract_parser.add_argument(
+        '--segment', type=_segment, default='longest',
+        help="Segment of the selection to use: 'longest' (default), its "
+             "index in the file, or 'single' to fail unless the selection "
+             "is one segment.")
+    extract_parser.set_defaults(handler=command_extract_ocv)
+
+    pareto_parser = subparsers.add_parser(
+        'pareto',
+        help="Pareto fronts of the OCV and dQ/dV errors, and a weight sweep "
+             "read from them. Every search weight costs one full search per "
+             "pair, so the default three weights cost three times a run.")
+    pareto_parser.add_argument(
+        '--cathodes', required=True,
+        help="Folder with cathode half-cell data.")
+    pareto_parser.add_argument(
+        '--anodes', required=True, help="Folder with anode half-cell data.")
+    pareto_parser.add_argument(
+        '--battery', required=True, help="TXT file with battery SOC/OCV data.")
+    pareto_parser.add_argument(
+        '--iterations', type=int, default=1,
+        help="Number of iterations (default 1).")
+    pareto_parser.add_argument(
+        '--search-weights', type=_weights, nargs='+',
+        help="Battery and derivative weights searched for every pair, as "
+             "'battery,derivative' (default 1,0 1,1 0,1). Each weight is "
+             "one full search per pair and iteration.")
+    pareto_parser.add_argument(
+        '--weights', type=_weights, nargs='+',
+        help="Weights to report the best result for, read from the fronts "
+             "(default the search weights).")
+    pareto_parser.add_argument(
+        '--solver', default='differential_evolution',
+        help="Optimizer of every search, as for run "
+             "(default differential_evolution).")
+    pareto_parser.add_argument(
+        '--popsize', type=int, help="Population size of the solver.")
+    pareto_parser.add_argument(
+        '--solver-tol', type=float,
+        help="Convergence tolerance of the solver.")
+    pareto_parser.add_argument(
+        '--maxiter', type=int,
+        help="Maximum number of iterations of the solver.")
+    pareto_parser.add_argument(
+        '--parallel', default='auto',
+        choices=('auto', 'processes', 'threads', 'workers', 'serial'),
+        help="Parallel layout of the pairs, as for run. workers runs one "
+             "process per pair, because the evaluations are recorded in the "
+             "process of the search.")
+    pareto_parser.add_argument(
+        '--output', help="JSON file to save the fronts and sweep to.")
+    pareto_parser.set_defaults(handler=command_pareto)
+
+    view_parser = subparsers.add_parser(
+        'view',
+        help="Show a saved result without recomputing it.")
+    view_parser.add_argument(
+        'path',
+        help="JSON or npz result file, or a directory of result files.")
+    view_parser.add_argument(
+        '--index', type=int,
+        help="Result of the directory to show. Without it, the result "
+             "files of the directory are listed.")
+    view_parser.add_argument(
+        '--plot',
+        help="Image file to plot the result to (e.g. result.png).")
+    view_parser.set_defaults(handler=command_view)
+
+    online_parser = subparsers.add_parser(
+        'online',
+        help="Update the alignment of a pair as OCV points arrive.")
+    online_parser.add_argument(
+        'points', nargs='?', default='-',
+        help="File with one 'SOC OCV' point per line, read as it grows "
+             "(default standard input).")
+    online_parser.add_argument(
+        '--cathodes', required=True,
+        help="Folder with cathode half-cell data.")
+    online_parser.add_argument(
+        '--anodes', required=True, help="Folder with anode half-cell data.")
+    online_parser.add_argument(
+        '--result',
+        help="Saved result (JSON or npz) giving the pair and the initial "
+             "alignment.")
+    online_parser.add_argument(
+        '--cathode', help="Cathode data ID of the pair, without --result.")
+    online_parser.add_argument(
+        '--anode', help="Anode data ID of the pair, without --result.")
+    online_parser.add_argument(
+        '--batch', type=int, default=5,
+        help="Points per update (default 5).")
+    online_parser.add_argument(
+        '--drift-threshold', type=float, default=0.005,
+        help="Rise of the residual (V) above its baseline that triggers a "
+             "full search (default 0.005).")
+    online_parser.add_argument(
+        '--forgetting', type=float, default=0.9,
+        help="Weight factor of a point per batch of age (default 0.9).")
+    online_parser.add_argument(
+        '--bins', type=int, default=101,
+        help="Number of SOC bins, the most points kept (default 101).")
+    online_parser.add_argument(
+        '--local-evaluations', type=int, default=40,
+        help="Evaluations of a local update (default 40).")
+    online_parser.set_defaults(handler=command_online)
+
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help="Serve decomposition requests over HTTP with a warm library.")
+    serve_parser.add_argument(
+        '--cathodes', required=True,
+        help="Folder with cathode half-cell data.")
+    serve_parser.add_argument(
+        '--anodes', required=True, help="Folder with anode half-cell data.")
+    serve_parser.add_argument(
+        '--host', default='127.0.0.1',
+        help="Address to listen on (default 127.0.0.1).")
+    serve_parser.add_argument(
+        '--port', type=int, default=8765,
+        help="Port to listen on (default 8765).")
+    serve_parser.add_argument(
+        '--socket', help="Unix socket to listen on instead of a TCP port.")
+    serve_parser.add_argument(
+        '--queue-size', type=int, default=8,
+        help="Requests that can wait before new ones are refused with 503 "
+             "(default 8).")
+    serve_parser.add_argument(
+        '--concurrency', type=int, default=1,
+        help="Decompositions run at the same time (default 1).")
+    serve_parser.add_argument(
+        '--workers', type=int,
+        help="Worker processes kept for the lifetime of the server "
+             "(default: one per core).")
+    serve_parser.set_defaults(handler=command_serve)
+
+    accuracy_parser = subparsers.add_parser(
+        'accuracy-benchmark',
+        help="Compare settings on synthetic curves with a known answer.")
+    accuracy_parser.add_argument(
+        '--cathodes', required=True,
+        help="Folder with cathode half-cell data.")
+    accuracy_parser.add_argument(
+        '--anodes', required=True, help="Folder with anode half-cell data.")
+    accuracy_parser.add_argument(
+        '--cases', type=int, default=5,
+        help="Number of synthetic curves (default 5).")
+    accuracy_parser.add_argument(
+        '--noise', type=float, default=0.0,
+        help="Standard deviation of the noise added to the curves, in V "
+             "(default 0).")
+    accuracy_parser.add_argument(
+        '--seed', type=int, default=0,
+        help="Seed of the synthetic curves (default 0).")
+    accuracy_parser.add_argument(
+        '--configurations',
+        help="JSON file mapping configuration names to keyword arguments "
+             "of perform_full_optimization_parallel. By default, "
+             "iterations, adaptive restarts, feature initialization and "
+             "single precision are compared.")
+    accuracy_parser.add_argument(
+        '--output', help="JSON file to save the report to.")
+    accuracy_parser.add_argument(
+        '--plot', help="Image file to save the speed/accuracy chart to.")
+    accuracy_parser.set_defaults(handler=command_accuracy_benchmark)
+
+    compare_parser = subparsers.add_parser(
+        'compare-solvers',
+        help="Compare optimizers on the evaluations to reach a target RMSD.")
+    compare_parser.add_argument(
+        '--cathodes', required=True,
+        help="Folder with cathode half-cell data.")
+    compare_parser.add_argument(
+        '--anodes', required=True, help="Folder with anode half-cell data.")
+    compare_parser.add_argument(
+        '--battery', required=True, help="TXT file with battery SOC/OCV data.")
+    compare_parser.add_argument(
+        '--cathode', required=True, help="Cathode data ID of the pair.")
+    compare_parser.add_argument(
+        '--anode', required=True, help="Anode data ID of the pair.")
+    compare_parser.add_argument(
+        '--solvers', nargs='+',
+        help="Solvers to compare (default all registered solvers).")
+    compare_parser.add_argument(
+        '--repeats', type=int, default=5,
+        help="Runs per solver, with different seeds (default 5).")
+    compare_parser.add_argument(
+        '--target', type=float,
+        help="Target RMSD. By default, the best RMSD of all runs plus "
+             "--tolerance.")
+    compare_parser.add_argument(
+        '--tolerance', type=float, default=1e-5,
+        help="Margin above the best RMSD of the default target "
+             "(default 1e-5).")
+    compare_parser.add_argument(
+        '--solver-options',
+        help="JSON file mapping solver names to their popsize, tol and "
+             "maxiter.")
+    compare_parser.add_argument(
+        '--output', help="JSON file to save the comparison to.")
+    compare_parser.set_defaults(handler=command_compare_solvers)
+
+    startup_parser = subparsers.add_parser(
+        'startup-benchmark',
+        help="Measure the import time of the modules a run needs.")
+    startup_parser.add_argument(
+        '--repeat', type=int, default=5,
+        help="Number of fresh interpreters per measurement (default 5).")
+    startup_parser.add_argument(
+        '--output', help="JSON file to save the measurements to.")
+    startup_parser.set_defaults(handler=command_startup_benchmark)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        return args.handler(args)
+    except (OSError, ValueError) as error:
+        print(f"pybep: error: {error}", file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Physical limits of the alignment search space.
+
+By default, e and f may trim up to 30 % of the anode array and g and h up
+to 15 % of the cathode array, independently of each other. Search limits
+narrow this box per chemistry and exclude implausible electrode balances.
+They are read from a JSON file keyed by chemistry or family, with a
+"default" entry for every pair, e.g.
+
+    {
+        "default": {"np_ratio": [1.0, 1.3]},
+        "Graphite": {"e": [0, 0.1], "min_anode_window": 0.7},
+        "NMC": {"h": [0, 0.1], "min_cathode_window": 0.85}
+    }
+
+For a pair, the entries are merged in the order default, anode family,
+anode chemistry, cathode family, cathode chemistry, later ones winning.
+The keys are:
+
+- "e", "f": range of the fraction of the anode array trimmed at its start
+  and end, within [0, 0.3].
+- "g", "h": the same for the cathode, within [0, 0.15].
+- "min_anode_window", "min_cathode_window": smallest fraction of the
+  electrode array used by the battery.
+- "np_ratio": range of the N/P capacity ratio, i.e. the lithiation span of
+  the cathode window over the one of the anode window.
+
+Bounds and window limits tighten the search box before the search. The
+window limits and the N/P ratio, which couples the anode and cathode
+parameters, are also passed to the differential evolution as linear
+constraints, so infeasible parameters are never evaluated. The SOC
+mapping is always monotonic, since e < f and g < h for every parameter in
+the box.
+"""
+import json
+
+import numpy as np
+from scipy.optimize import LinearConstraint
+
+try:
+    from .library import chemistry_family, parse_half_cell_name
+except ImportError:
+    # Imported as a top-level module, as GUI.py does
+    from library import chemistry_family, parse_half_cell_name
+
+# Largest fraction of the electrode array trimmed by e, f (anode) and g, h
+# (cathode), as in calculate_alignment_indices
+TRIM_LIMITS = {'e': 0.3, 'f': 0.3, 'g': 0.15, 'h': 0.15}
+
+LIMIT_KEYS = tuple(TRIM_LIMITS) + (
+    'min_anode_window', 'min_cathode_window', 'np_ratio')
+
+
+def load_search_limits(config_file):
+    """
+    Load per-chemistry search limits from a JSON file.
+
+    Parameters:
+    - config_file (str): Path to the JSON file.
+
+    Raises:
+    - ValueError: If an entry has an unknown key or a trim range outside
+      of TRIM_LIMITS.
+
+    Returns:
+    - dict: Search limits keyed by chemistry, family or "default".
+    """
+    with open(config_file, 'r') as file:
+        limits = json.load(file)
+
+    for name, entry in limits.items():
+        unknown = set(entry) - set(LIMIT_KEYS)
+        if unknown:
+            raise ValueError(
+                f"Unknown search limit(s) {sorted(unknown)} for '{name}'.")
+        for key, largest in TRIM_LIMITS.items():
+            if key in entry and not 0 <= entry[key][0] <= entry[key][1] \
+                    <= largest:
+                raise ValueError(
+                    f"Trim range '{key}' of '{name}' must lie within "
+                    f"[0, {largest}].")
+    return limits
+
+
+def resolve_search_limits(limits, cathode_ID, anode_ID):
+    """
+    Merge the search limits that apply to a cathode and anode pair.
+
+    Parameters:
+    - limits (dict): Search limits returned by load_search_limits.
+    - cathode_ID, anode_ID (str): Half-cell IDs, named <Chemistry>-<Source>.
+
+    Returns:
+    - dict: Merged limits of the pair.
+    """
+    merged = dict(limits.get('default', {}))
+    for ID_number in (anode_ID, cathode_ID):
+        chemistry = parse_half_cell_name(ID_number)['chemistry']
+        for name in (chemistry_family(chemistry), chemistry):
+            merged.update(limits.get(name, {}))
+    return merged
+
+
+def search_space(limits, cathode_ID, cathode_info, anode_ID, anode_info):
+    """
+    Bounds and constraints of the differential evolution for a pair.
+
+    Parameters:
+    - limits (dict): Search limits returned by load_search_limits.
+    - cathode_ID, anode_ID (str): Half-cell IDs.
+    - cathode_info, anode_info (dict): Half-cell data, including x values.
+
+    Raises:
+    - ValueError: If the limits leave no feasible parameters.
+
+    Returns:
+    - list of tuple, list: Bounds of e, f, g, h percentages and a list
+      with the linear window and N/P ratio constraint (empty without
+      either).
+    """
+    pair_limits = resolve_search_limits(limits, cathode_ID, anode_ID)
+
+    # Trim ranges as percentages of the default trim limits
+    bounds = {key: np.array(pair_limits.get(key, (0, largest))) / largest
+              for key, largest in TRIM_LIMITS.items()}
+
+    # Linear constraints A @ params within [lower, upper]
+    A, lower, upper = [], [], []
+
+    # A minimum window caps the trim at one end, given the smallest trim at
+    # the other end, and the sum of both trims
+    for columns, (start, stop), window in (
+            ((1, 1, 0, 0), ('e', 'f'), 'min_anode_window'),
+            ((0, 0, 1, 1), ('g', 'h'), 'min_cathode_window')):
+        if window not in pair_limits:
+            continue
+        largest_trim = (1 - pair_limits[window]) / TRIM_LIMITS[start]
+        bounds[start][1] = min(bounds[start][1],
+                               largest_trim - bounds[stop][0])
+        bounds[stop][1] = min(bounds[stop][1],
+                              largest_trim - bounds[start][0])
+        if bounds[start][1] < bounds[start][0] \
+                or bounds[stop][1] < bounds[stop][0]:
+            raise ValueError(
+                f"No alignment of '{cathode_ID}' and '{anode_ID}' "
+                f"satisfies {window} = {pair_limits[window]}.")
+        A.append(columns)
+        lower.append(-np.inf)
+        upper.append(largest_trim)
+
+    if 'np_ratio' in pair_limits:
+        # Lithiation spans of the windows, linear in the percentages:
+        # span = x_range * (1 - trim_limit * (start + stop))
+        anode_x_values = anode_info['x_values']
+        cathode_x_values = cathode_info['x_values']
+        anode_range = anode_x_values[-1] - anode_x_values[0]
+        cathode_range = cathode_x_values[-1] - cathode_x_values[0]
+        anode_span = np.array((-anode_range * TRIM_LIMITS['e'],
+                               -anode_range * TRIM_LIMITS['f'], 0, 0))
+        cathode_span = np.array((0, 0, -cathode_range * TRIM_LIMITS['g'],
+                                 -cathode_range * TRIM_LIMITS['h']))
+
+        # low * anode span <= cathode span <= high * anode span
+        low, high = pair_limits['np_ratio']
+        A.append(cathode_span - low * anode_span)
+        lower.append(low * anode_range - cathode_range)
+        upper.append(np.inf)
+        A.append(cathode_span - high * anode_span)
+        lower.append(-np.inf)
+        upper.append(high * anode_range - cathode_range)
+
+    constraints = [LinearConstraint(np.array(A), lower, upper)] if A else []
+    return [tuple(bounds[key]) for key in TRIM_LIMITS], constraints
@@ -0,0 +1,252 @@
+"""
+Alignment estimate from differential capacity (dQ/dV) features.
+
+Plateaus of an electrode OCP curve, such as graphite staging or NMC phase
+transitions, appear as peaks of its differential capacity. The same peaks
+appear in the differential capacity of the battery, at the battery SOC
+that the alignment maps them to. Battery SOC s maps linearly to the
+electrode data as
+
+    x(s) = x_start + s * (x_stop - x_start),
+
+so two matched peaks determine the window [x_start, x_stop] of an
+electrode. Candidate windows are solved for every matching of two
+electrode peaks to two battery peaks (or one peak and a span from the
+search bounds), ranked by how well all peaks line up, and the best
+cathode and anode windows are combined and scored with the objective.
+"""
+from itertools import combinations
+
+import numpy as np
+from scipy.signal import find_peaks
+
+try:
+    from .optimization_functions import (
+        calculate_alignment_indices, calculate_alignment_params, optimization)
+except ImportError:
+    # Imported as a top-level module, as GUI.py does
+    from optimization_functions import (
+        calculate_alignment_indices, calculate_alignment_params, optimization)
+
+
+def find_differential_capacity_peaks(x, y, prominence=0.05, smoothing=11):
+    """
+    Locate the peaks of the differential capacity dx/dy of a curve.
+
+    Parameters:
+    - x: array-like
+        SOC or lithiation values.
+    - y: array-like
+        OCV or OCP values.
+    - prominence: float, optional
+        Minimum prominence of a peak, relative to the highest value of the
+        smoothed differential capacity.
+    - smoothing: int, optional
+        Width of the moving average applied before peak detection.
+
+    Returns:
+    - numpy.ndarray, numpy.ndarray: Positions (in x) and relative
+      prominences of the peaks, ordered by position.
+    """
+    x = np.asarray(x, dtype=float)
+    differential_capacity = 1 / np.maximum(
+        np.abs(np.gradient(np.asarray(y, dtype=float), x)), 1e-12)
+
+    # The steep ends of a curve are not features; limit their influence
+    differential_capacity = np.minimum(
+        differential_capacity, np.percentile(differential_capacity, 99))
+    kernel = np.ones(smoothing) / smoothing
+    smoothed = np.convolve(differential_capacity, kernel, mode='same')
+    scale = np.max(smoothed)
+
+    peaks, properties = find_peaks(smoothed, prominence=prominence * scale)
+    return x[peaks], properties['prominences'] / scale
+
+
+def _feature_score(window, electrode_peaks, battery_peaks):
+    # Mean distance (in battery SOC) between the electrode peaks inside the
+    # window and their nearest battery peak
+    start, stop = window
+    soc = (electrode_peaks - start) / (stop - start)
+    soc = soc[(soc >= 0) & (soc <= 1)]
+    if len(soc) == 0 or len(battery_peaks) == 0:
+        return np.inf
+    distances = np.abs(soc[:, None] - battery_peaks[None, :]).min(axis=1)
+    # Electrode peaks without a battery counterpart count as a full miss
+    unmatched = len(electrode_peaks) - len(soc)
+    return (distances.sum() + 0.1 * unmatched) / len(electrode_peaks)
+
+
+def window_candidates(electrode_peaks, battery_peaks, start_range,
+                      stop_range, n_best=3, n_spans=5):
+    """
+    Solve candidate windows of an electrode from matched peaks.
+
+    Parameters:
+    - electrode_peaks: array-like
+        Peak positions of the electrode, in x.
+    - battery_peaks: array-like
+        Peak positions of the battery, in SOC.
+    - start_range, stop_range: tuple
+        Allowed (lowest, highest) window start and stop, in x.
+    - n_best: int, optional
+        Number of candidate windows returned.
+    - n_spans: int, optional
+        Number of window widths tried for single-peak matches.
+
+    Returns:
+    - list of tuple: Up to n_best (x_start, x_stop) windows, best first.
+      Empty if no peak can be matched.
+    """
+    windows = []
+
+    # Two matched peaks determine the window exactly
+    for (p_1, p_2), (s_1, s_2) in (
+            (electrode_pair, battery_pair)
+            for electrode_pair in combinations(electrode_peaks, 2)
+            for battery_pair in combinations(battery_peaks, 2)):
+        span = (p_2 - p_1) / (s_2 - s_1)
+        start = p_1 - s_1 * span
+        windows.append((start, start + span))
+
+    # One matched peak and a window width within the search bounds
+    spans = np.linspace(stop_range[0] - start_range[1],
+                        stop_range[1] - start_range[0], n_spans)
+    for peak in electrode_peaks:
+        for soc in battery_peaks:
+            for span in spans:
+                start = peak - soc * span
+                windows.append((start, start + span))
+
+    feasible = [
+        (start, stop) for start, stop in windows
+        if start_range[0] <= start <= start_range[1]
+        and stop_range[0] <= stop <= stop_range[1]]
+    feasible.sort(
+        key=lambda window: _feature_score(
+            window, np.asarray(electrode_peaks), np.asarray(battery_peaks)))
+    return feasible[:n_best]
+
+
+def _window_indices(x_values, window):
+    # Alignment indices (start, stop) of a window given in x
+    start = int(np.searchsorted(x_values, window[0]))
+    stop = int(np.searchsorted(x_values, window[1])) + 1
+    return min(start, len(x_values) - 2), min(stop, len(x_values))
+
+
+def estimate_alignment(cathode_info, anode_info, SOC_battery, OCV_battery,
+                       battery=1, derivative_inverse=0, n_best=10):
+    """
+    Estimate the alignment of a cathode and anode pair from dQ/dV peaks.
+
+    Parameters:
+    - cathode_info: dict
+        Information about the cathode,
+        including interpolated function and x values.
+    - anode_info: dict
+        Information about the anode,
+        including interpolated function and x values.
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - n_best: int, optional
+        Number of candidate windows per electrode combined and scored.
+
+    Returns:
+    - estimate: dict
+        'params' (e, f, g, h percentages), 'indices' (e, f, g, h) and
+        'RMSD' of the best estimate, and 'evaluations', the number of
+        objective evaluations used. 'params' is the centre of the search
+        space if no peak could be matched.
+    """
+    battery_peaks, _ = find_differential_capacity_peaks(
+        SOC_battery, OCV_battery)
+
+    anode_x_values = anode_info['x_values']
+    cathode_x_values = cathode_info['x_values']
+    anode_length = len(anode_x_values)
+    cathode_length = len(cathode_x_values)
+    lower = calculate_alignment_indices(
+        (0, 1, 0, 1), anode_length, cathode_length)
+    upper = calculate_alignment_indices(
+        (1, 0, 1, 0), anode_length, cathode_length)
+
+    candidates = {}
+    for name, info, (start, stop) in (
+            ('anode', anode_info, (0, 1)), ('cathode', cathode_info, (2, 3))):
+        x_values = info['x_values']
+        peaks, _ = find_differential_capacity_peaks(
+            x_values, info['interpolated_function'](x_values))
+        windows = window_candidates(
+            peaks, battery_peaks,
+            (x_values[lower[start]], x_values[upper[start]]),
+            (x_values[lower[stop] - 1], x_values[upper[stop] - 1]),
+            n_best=n_best)
+        # Without a match, keep the centre of the bounds for this electrode
+        candidates[name] = [_window_indices(x_values, window)
+                            for window in windows] \
+            or [((lower[start] + upper[start]) // 2,
+                 (lower[stop] + upper[stop]) // 2)]
+
+    best = None
+    evaluations = 0
+    for e, f in candidates['anode']:
+        for g, h in candidates['cathode']:
+            params = calculate_alignment_params(
+                (e, f, g, h), anode_length, cathode_length)
+            RMSD = optimization(
+                params, anode_info['interpolated_function'], anode_x_values,
+                cathode_info['interpolated_function'], cathode_x_values,
+                OCV_battery, SOC_battery, battery=battery,
+                derivative_inverse=derivative_inverse)
+            evaluations += 1
+            if best is None or RMSD < best['RMSD']:
+                best = {'params': params, 'RMSD': RMSD}
+
+    best['indices'] = calculate_alignment_indices(
+        best['params'], anode_length, cathode_length)
+    best['evaluations'] = evaluations
+    return best
+
+
+def feature_initial_population(cathode_info, anode_info, SOC_battery,
+                               OCV_battery, battery=1, derivative_inverse=0,
+                               popsize=20, spread=0.05, seed=None):
+    """
+    Initial differential evolution population around the feature estimate.
+
+    Most members are drawn from a normal distribution around the estimate,
+    a few uniformly from the whole search space to keep some diversity.
+
+    Parameters:
+    - cathode_info, anode_info, SOC_battery, OCV_battery,
+      battery, derivative_inverse:
+        As in estimate_alignment.
+    - popsize: int, optional
+        Number of members of the population.
+    - spread: float, optional
+        Standard deviation of the members around the estimate,
+        in units of the search range.
+    - seed: int, optional
+        Seed of the random members.
+
+    Returns:
+    - numpy.ndarray: Population with shape (popsize, 4), the estimate first.
+    """
+    estimate = estimate_alignment(
+        cathode_info, anode_info, SOC_battery, OCV_battery,
+        battery=battery, derivative_inverse=derivative_inverse)
+
+    rng = np.random.default_rng(seed)
+    n_uniform = max(popsize // 4, 1)
+    population = np.vstack((
+        estimate['params'],
+        estimate['params'] + spread * rng.standard_normal(
+            (popsize - n_uniform - 1, 4)),
+        rng.uniform(size=(n_uniform, 4))
+    ))
+    return np.clip(population, 0, 1)
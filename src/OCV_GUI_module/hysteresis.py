@@ -0,0 +1,325 @@
+"""
+Joint decomposition of the charge and discharge OCV of a cell.
+
+Cells with OCV hysteresis have different charge and discharge curves, but
+they are made of the same electrodes. Both branches are fitted together,
+with one search per cathode and anode pair, and the objective is the RMS
+of the RMSDs of both branches. The alignment of the two branches is
+coupled in one of two ways:
+
+- 'shared': both branches use the same e, f, g and h. The calculated
+  battery OCV is computed once per evaluation and compared with both
+  branches, so an evaluation costs about as much as in a single-branch run.
+- 'tied': the charge branch may differ from the discharge branch by at
+  most tie (in alignment percentages) per parameter.
+
+The pairs are scheduled with the parallel layouts of the single-branch
+search (see optimization_functions.select_parallel_layout) and share a
+time budget in the same way.
+"""
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.optimize import differential_evolution
+
+from .optimization_functions import (
+    TimeBudgetExceeded, calculate_aligned_curves,
+    calculate_alignment_indices, calculate_battery_OCV, calculate_RMSD,
+    parallel_settings, run_search_iterations, search_completeness,
+    search_time_limit, select_parallel_layout, stop_callback)
+from .solvers import get_solver
+
+# Order of the branches in every argument and result
+BRANCHES = ('charge', 'discharge')
+COUPLINGS = ('shared', 'tied')
+
+
+def branch_parameters(params, coupling='shared'):
+    """
+    Alignment percentages of the charge and discharge branches.
+
+    Parameters:
+    - params: array-like
+        e, f, g, h percentages of the discharge branch, followed for
+        'tied' coupling by the differences of the charge branch.
+    - coupling: str, optional
+        'shared' or 'tied'.
+
+    Returns:
+    - numpy.ndarray, numpy.ndarray: Charge and discharge percentages.
+    """
+    discharge_params = np.asarray(params[:4])
+    if coupling == 'shared':
+        return discharge_params, discharge_params
+    return np.clip(discharge_params + params[4:], 0, 1), discharge_params
+
+
+def hysteresis_optimization(params, anode_interp, anode_x_values,
+                            cathode_interp, cathode_x_values, branches,
+                            battery=1, derivative_inverse=0,
+                            coupling='shared'):
+    """
+    Objective function of the joint charge and discharge fit.
+
+    Parameters:
+    - params: array-like
+        Parameters of branch_parameters.
+    - anode_interp, cathode_interp: callable
+        Interpolated functions for the anode and cathode.
+    - anode_x_values, cathode_x_values: array-like
+        X-axis values for the anode and cathode.
+    - branches: tuple
+        (SOC_battery, OCV_battery) of the charge and discharge branches.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - coupling: str, optional
+        'shared' or 'tied'.
+
+    Returns:
+    - float: RMS of the RMSDs of both branches.
+    """
+    charge_params, discharge_params = branch_parameters(params, coupling)
+    discharge_curve = calculate_battery_OCV(
+        discharge_params, anode_interp, anode_x_values, cathode_interp,
+        cathode_x_values)
+    # With shared parameters, one curve serves both branches
+    charge_curve = discharge_curve if coupling == 'shared' \
+        else calculate_battery_OCV(charge_params, anode_interp,
+                                   anode_x_values, cathode_interp,
+                                   cathode_x_values)
+
+    residuals = [
+        calculate_RMSD(curve, OCV_battery, SOC_battery, battery,
+                       derivative_inverse)
+        for curve, (SOC_battery, OCV_battery) in zip(
+            (charge_curve, discharge_curve), branches)]
+    return np.sqrt(np.mean(np.square(residuals)))
+
+
+def perform_hysteresis_optimization(cathode_number, cathode_info,
+                                    anode_number, anode_info, branches,
+                                    battery, derivative_inverse,
+                                    coupling='shared', tie=0.05, seed=None,
+                                    solver='differential_evolution',
+                                    solver_options=None, workers=1,
+                                    deadline=None, time_limit=None):
+    """
+    Perform the joint optimization for a cathode and anode combination.
+
+    Parameters:
+    - cathode_number, anode_number: str
+        Identifiers for the cathode and anode data.
+    - cathode_info, anode_info: dict
+        Information about the cathode and anode,
+        including interpolated function and x values.
+    - branches, battery, derivative_inverse, coupling:
+        As in hysteresis_optimization.
+    - tie: float, optional
+        Largest difference of a charge parameter from the discharge one,
+        for 'tied' coupling.
+    - seed: int, optional
+        Seed of the solver.
+    - solver: str, optional
+        Name of a solver registered in solvers.SOLVERS.
+    - solver_options: dict, optional
+        popsize, tol and maxiter of the solver.
+    - workers: int, optional
+        Number of processes evaluating the population of the differential
+        evolution (-1 for all cores). Other solvers ignore it.
+    - deadline, time_limit: float, optional
+        As in optimization_functions.perform_optimization.
+
+    Returns:
+    - optimization_results: dict or None
+        Cathode and anode data IDs, optimized parameters, joint RMSD and
+        whether the search was interrupted by the deadline. None if the
+        deadline had passed.
+    """
+    stop_time = None
+    if deadline is not None:
+        if time.time() >= deadline:
+            return None
+        stop_time = deadline if time_limit is None \
+            else min(deadline, time.time() + time_limit)
+
+    bounds = [(0, 1)] * 4
+    if coupling == 'tied':
+        bounds += [(-tie, tie)] * 4
+
+    args = (anode_info['interpolated_function'], anode_info['x_values'],
+            cathode_info['interpolated_function'], cathode_info['x_values'],
+            branches, battery, derivative_inverse, coupling)
+    interrupted = []
+    if solver == 'differential_evolution':
+        opt_result = differential_evolution(
+            hysteresis_optimization, bounds, args=args, seed=seed,
+            workers=workers,
+            updating='immediate' if workers == 1 else 'deferred',
+            callback=None if stop_time is None
+            else stop_callback(stop_time, interrupted),
+            **(solver_options or {}))
+    else:
+        opt_result = get_solver(solver)(
+            hysteresis_optimization, bounds, args=args, seed=seed,
+            **(solver_options or {}))
+
+    return {
+        'cathode_data_ID': cathode_number,
+        'anode_data_ID': anode_number,
+        'optimized_params': opt_result.x,
+        'RMSD': opt_result.fun,
+        'interrupted': bool(interrupted)
+    }
+
+
+def perform_full_hysteresis_optimization(SOC_charge, OCV_charge,
+                                         SOC_discharge, OCV_discharge,
+                                         interpolated_cathodes,
+                                         interpolated_anodes, iterations=5,
+                                         battery=1, derivative_inverse=0,
+                                         coupling='shared', tie=0.05,
+                                         pairs=None,
+                                         solver='differential_evolution',
+                                         solver_options=None, seed=None,
+                                         parallel='auto', time_budget=None):
+    """
+    Decompose the charge and discharge OCV of a cell jointly.
+
+    The library is prepared once and every cathode and anode pair is
+    optimized once per iteration for both branches, in a single parallel
+    schedule.
+
+    Parameters:
+    - SOC_charge, OCV_charge: array-like
+        SOC and OCV values of the charge branch.
+    - SOC_discharge, OCV_discharge: array-like
+        SOC and OCV values of the discharge branch.
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - iterations: int, optional
+        Number of iterations for optimization.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - coupling: str, optional
+        'shared' or 'tied' (see the module documentation).
+    - tie: float, optional
+        Largest difference of a charge parameter from the discharge one,
+        for 'tied' coupling.
+    - pairs: list of tuple, optional
+        (cathode ID, anode ID) combinations to optimize.
+        By default, every cathode is combined with every anode.
+    - solver, solver_options, seed: optional
+        Solver of every pair, its options and seed
+        (see perform_hysteresis_optimization).
+    - parallel: str, optional
+        Parallel layout, 'auto' or one of PARALLEL_LAYOUTS. With 'auto', the
+        layout is chosen from the cost of one single-branch evaluation.
+    - time_budget: float, optional
+        Seconds within which the search must return, shared by the
+        iterations and pairs as in perform_full_optimization_parallel.
+
+    Raises:
+    - ValueError: If coupling is not one of COUPLINGS, the time budget is
+      not positive, or it ran out before any combination was searched.
+
+    Returns:
+    - result: dict
+        'Best Cathode Data ID', 'Best Anode Data ID', the joint
+        'Lowest RMSD', 'Coupling', and 'Branches', mapping 'charge' and
+        'discharge' to a result of the same form as
+        perform_full_optimization_parallel, with the 'Best Parameters' and
+        'Lowest RMSD' (residual) of that branch. 'Parallel Layout' is the
+        layout used, and with a time budget 'Search Completeness' is
+        reported as in perform_full_optimization_parallel.
+    """
+    if coupling not in COUPLINGS:
+        raise ValueError(
+            f"coupling must be one of {COUPLINGS}, got '{coupling}'.")
+    start = time.time()
+    deadline = None
+    if time_budget is not None:
+        if time_budget <= 0:
+            raise ValueError("time_budget must be positive.")
+        deadline = start + time_budget
+
+    branches = ((np.asarray(SOC_charge), np.asarray(OCV_charge)),
+                (np.asarray(SOC_discharge), np.asarray(OCV_discharge)))
+    if pairs is None:
+        pairs = [(cathode_number, anode_number)
+                 for cathode_number in interpolated_cathodes
+                 for anode_number in interpolated_anodes]
+
+    parallel = select_parallel_layout(
+        SOC_discharge, OCV_discharge, interpolated_cathodes,
+        interpolated_anodes, len(pairs), battery=battery,
+        derivative_inverse=derivative_inverse, parallel=parallel)
+    settings = parallel_settings(parallel)
+
+    def search(iteration):
+        time_limit = search_time_limit(
+            deadline, len(pairs), settings['n_jobs'], iterations - iteration)
+        optimization_results = Parallel(
+            n_jobs=settings['n_jobs'], prefer=settings['prefer'])(
+            delayed(perform_hysteresis_optimization)(
+                cathode_number, interpolated_cathodes[cathode_number],
+                anode_number, interpolated_anodes[anode_number], branches,
+                battery, derivative_inverse, coupling=coupling, tie=tie,
+                seed=seed, solver=solver, solver_options=solver_options,
+                workers=settings['workers'], deadline=deadline,
+                time_limit=time_limit)
+            for cathode_number, anode_number in pairs
+        )
+        return [optimization_result
+                for optimization_result in optimization_results
+                if optimization_result is not None]
+
+    best_optimization_results, completeness = run_search_iterations(
+        search, iterations, len(pairs), deadline=deadline)
+
+    if not best_optimization_results:
+        raise TimeBudgetExceeded(
+            "The time budget ran out before any combination was searched.")
+
+    best_optimization_result = min(
+        best_optimization_results, key=lambda x: x['RMSD'])
+
+    best_cathode_data_ID = best_optimization_result['cathode_data_ID']
+    best_anode_data_ID = best_optimization_result['anode_data_ID']
+    Best_Cathode = interpolated_cathodes[best_cathode_data_ID]
+    Best_Anode = interpolated_anodes[best_anode_data_ID]
+
+    result = {
+        'Best Cathode Data ID': best_cathode_data_ID,
+        'Best Anode Data ID': best_anode_data_ID,
+        'Lowest RMSD': best_optimization_result['RMSD'],
+        'Coupling': coupling,
+        'Parallel Layout': parallel,
+        'Branches': {}
+    }
+    if deadline is not None:
+        result['Search Completeness'] = search_completeness(
+            completeness, len(pairs), start)
+    for branch, params, (SOC_battery, OCV_battery) in zip(
+            BRANCHES,
+            branch_parameters(best_optimization_result['optimized_params'],
+                              coupling),
+            branches):
+        best_parameters = calculate_alignment_indices(
+            params, len(Best_Anode['x_values']),
+            len(Best_Cathode['x_values']))
+        curves = calculate_aligned_curves(
+            Best_Cathode, Best_Anode, best_parameters)
+        result['Branches'][branch] = {
+            'Best Cathode Data ID': best_cathode_data_ID,
+            'Best Anode Data ID': best_anode_data_ID,
+            'Best Parameters': best_parameters,
+            'Lowest RMSD': calculate_RMSD(
+                curves['calculated_battery_OCV_opt'], OCV_battery,
+                SOC_battery, battery, derivative_inverse),
+            'SOC_battery': SOC_battery,
+            'OCV_battery': OCV_battery,
+            **curves
+        }
+
+    return result
@@ -0,0 +1,404 @@
+"""
+Chemistry index of the half-cell library.
+
+Half-cell files are named <Chemistry>-<Source> (e.g. NMC811-LICeM.txt) and
+full-cell files <Cathode>vs<Anode>_OCV-<Source> (e.g.
+NMC811vsGraphite_OCV-LICeM.txt), where the source is usually a DOI with
+'/' replaced by '_'. A JSON file with the same name next to a data file
+(e.g. NMC811-LICeM.json) can add or override metadata:
+
+    {"chemistry": "NMC811", "family": "NMC", "source": "LICeM"}
+
+Coefficient files of analytic OCP models (e.g. NMC811-LICeM.ocp.json) are
+indexed like the tables, with the same sidecar file.
+
+The family of a chemistry is its name without the trailing composition
+digits (NMC811 and NMC622 are both NMC), unless a sidecar file sets it.
+The index is used to restrict the search to the cathodes and anodes whose
+chemistry matches the one of the battery.
+
+Independently of the names, half-cells can be clustered by the shape of
+their curves, so that near-duplicates (e.g. several NMC811 datasets from
+different papers) are searched once, through a representative, and only
+the members of the best clusters are searched individually.
+"""
+import json
+import os
+import re
+import time
+from itertools import product
+
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import pdist, squareform
+
+try:
+    from .add_curves import OCP_MODEL_SUFFIX
+    from .optimization_functions import (
+        TimeBudgetExceeded, perform_full_optimization_parallel,
+        perform_pair_search)
+except ImportError:
+    # Imported as a top-level module, as GUI.py does
+    from add_curves import OCP_MODEL_SUFFIX
+    from optimization_functions import (
+        TimeBudgetExceeded, perform_full_optimization_parallel,
+        perform_pair_search)
+
+# Ways of matching the library to the chemistry of the battery
+CHEMISTRY_MATCHES = ('exact', 'family')
+
+FULL_CELL_NAME = re.compile(
+    r'^(?P<cathode>.+?)vs(?P<anode>.+?)_OCV-(?P<source>.+)$')
+
+
+def chemistry_family(chemistry):
+    """
+    Family of a chemistry: its name without trailing composition digits.
+
+    Parameters:
+    - chemistry (str): Chemistry name, e.g. 'NMC811'.
+
+    Returns:
+    - str: Family name, e.g. 'NMC'.
+    """
+    return chemistry.rstrip('0123456789') or chemistry
+
+
+def _read_sidecar(data_file):
+    # Metadata from the JSON file next to a data file, if there is one
+    if data_file.endswith(OCP_MODEL_SUFFIX):
+        sidecar_file = data_file[:-len(OCP_MODEL_SUFFIX)] + '.json'
+    else:
+        sidecar_file = os.path.splitext(data_file)[0] + '.json'
+    if not os.path.exists(sidecar_file):
+        return {}
+    with open(sidecar_file, 'r') as file:
+        return json.load(file)
+
+
+def parse_half_cell_name(ID_number):
+    """
+    Parse the chemistry and source of a half-cell from its ID.
+
+    Parameters:
+    - ID_number (str): File name without extension, <Chemistry>-<Source>.
+
+    Returns:
+    - dict: 'chemistry', 'family' and 'source' (None if the name has
+      no source).
+    """
+    chemistry, _, source = ID_number.partition('-')
+    return {
+        'chemistry': chemistry,
+        'family': chemistry_family(chemistry),
+        'source': source or None
+    }
+
+
+def parse_full_cell_name(ID_number):
+    """
+    Parse the electrode chemistries and source of a full cell from its ID.
+
+    Parameters:
+    - ID_number (str): File name without extension,
+      <Cathode>vs<Anode>_OCV-<Source>.
+
+    Raises:
+    - ValueError: If the name does not follow the convention.
+
+    Returns:
+    - dict: 'cathode' and 'anode' chemistries and 'source'.
+    """
+    match = FULL_CELL_NAME.match(ID_number)
+    if match is None:
+        raise ValueError(
+            f"'{ID_number}' does not follow the naming convention "
+            "<Cathode>vs<Anode>_OCV-<Source>.")
+    return match.groupdict()
+
+
+def full_cell_metadata(battery_file):
+    """
+    Metadata of a full-cell file, from its name and sidecar file.
+
+    Parameters:
+    - battery_file (str): Path to the full-cell TXT file.
+
+    Raises:
+    - ValueError: If the chemistries are neither in the name nor in a
+      sidecar file.
+
+    Returns:
+    - dict: 'cathode' and 'anode' chemistries, 'source', and any other
+      key of the sidecar file.
+    """
+    ID_number = os.path.splitext(os.path.basename(battery_file))[0]
+    sidecar = _read_sidecar(battery_file)
+    if 'cathode' in sidecar and 'anode' in sidecar:
+        metadata = {'source': None}
+    else:
+        metadata = parse_full_cell_name(ID_number)
+    metadata.update(sidecar)
+    return metadata
+
+
+def index_half_cell_library(directory_name):
+    """
+    Index the half-cell files of a directory by chemistry.
+
+    The directory is resolved as in add_half_cell_data, and the IDs are the
+    same as the keys of its dictionary.
+
+    Parameters:
+    - directory_name (str): The directory name containing text files with data.
+
+    Raises:
+    - ValueError: If the specified directory does not exist.
+
+    Returns:
+    - dict: 'metadata', mapping every ID to its chemistry, family, source
+      and sidecar keys, and the lookup tables 'by_chemistry' and
+      'by_family', mapping a chemistry or family to a list of IDs.
+    """
+    directory_path = os.path.join(os.getcwd(), directory_name)
+    if not os.path.exists(directory_path):
+        raise ValueError(f"The directory '{directory_path}' does not exist.")
+
+    metadata = {}
+    for data_file in sorted(os.listdir(directory_path)):
+        if data_file.endswith(OCP_MODEL_SUFFIX):
+            ID_number = data_file[:-len(OCP_MODEL_SUFFIX)]
+        elif data_file.endswith('.txt'):
+            ID_number = os.path.splitext(data_file)[0]
+        else:
+            continue
+        entry = parse_half_cell_name(ID_number)
+        sidecar = _read_sidecar(os.path.join(directory_path, data_file))
+        if 'chemistry' in sidecar and 'family' not in sidecar:
+            entry['family'] = chemistry_family(sidecar['chemistry'])
+        entry.update(sidecar)
+        metadata[ID_number] = entry
+
+    index = {'metadata': metadata, 'by_chemistry': {}, 'by_family': {}}
+    for ID_number, entry in metadata.items():
+        index['by_chemistry'].setdefault(entry['chemistry'], []).append(
+            ID_number)
+        index['by_family'].setdefault(entry['family'], []).append(ID_number)
+
+    return index
+
+
+def matching_half_cells(index, chemistry, match='exact'):
+    """
+    IDs of the half-cells matching a chemistry.
+
+    Parameters:
+    - index (dict): Index returned by index_half_cell_library.
+    - chemistry (str): Chemistry to match.
+    - match (str, optional): 'exact' for the same chemistry, 'family' for
+      any chemistry of the same family (e.g. all NMC for NMC811).
+
+    Raises:
+    - ValueError: If match is not one of CHEMISTRY_MATCHES.
+
+    Returns:
+    - list of str: Matching IDs, possibly empty.
+    """
+    if match not in CHEMISTRY_MATCHES:
+        raise ValueError(
+            f"match must be one of {CHEMISTRY_MATCHES}, got '{match}'.")
+    if match == 'exact':
+        return list(index['by_chemistry'].get(chemistry, []))
+    return list(index['by_family'].get(chemistry_family(chemistry), []))
+
+
+def filter_pairs(cathode_index, anode_index, cathode_chemistry,
+                 anode_chemistry, match='exact', fallback=False):
+    """
+    Cathode and anode combinations matching the chemistries of a battery.
+
+    Parameters:
+    - cathode_index, anode_index (dict): Indexes returned by
+      index_half_cell_library.
+    - cathode_chemistry, anode_chemistry (str): Chemistries of the battery.
+    - match (str, optional): 'exact' or 'family' (see matching_half_cells).
+    - fallback (bool, optional): Use every half-cell of an electrode for
+      which no chemistry matches, instead of raising an error.
+
+    Raises:
+    - ValueError: If no half-cell of an electrode matches and fallback
+      is False.
+
+    Returns:
+    - list of tuple: (cathode ID, anode ID) combinations, to be passed as
+      pairs to perform_full_optimization_parallel.
+    """
+    candidates = []
+    for name, index, chemistry in (
+            ('cathode', cathode_index, cathode_chemistry),
+            ('anode', anode_index, anode_chemistry)):
+        IDs = matching_half_cells(index, chemistry, match)
+        if not IDs:
+            if not fallback:
+                raise ValueError(
+                    f"No {name} in the library matches '{chemistry}' "
+                    f"({match} match).")
+            IDs = list(index['metadata'])
+        candidates.append(IDs)
+
+    return list(product(*candidates))
+
+
+def half_cell_shape_matrix(half_cells, n_points=201):
+    """
+    Sample every half-cell curve on a common normalized lithiation grid.
+
+    Parameters:
+    - half_cells (dict): Half-cell data returned by add_half_cell_data.
+    - n_points (int, optional): Number of points of the grid.
+
+    Returns:
+    - list of str, numpy.ndarray: IDs and the potentials, one row per ID.
+    """
+    IDs = list(half_cells)
+    grid = np.linspace(0, 1, n_points)
+    shapes = np.empty((len(IDs), n_points))
+    for row, ID_number in enumerate(IDs):
+        x_values = half_cells[ID_number]['x_values']
+        shapes[row] = half_cells[ID_number]['interpolated_function'](
+            x_values[0] + grid * (x_values[-1] - x_values[0]))
+    return IDs, shapes
+
+
+def cluster_half_cells(half_cells, threshold=0.05, n_points=201):
+    """
+    Cluster half-cells whose curves have nearly the same shape.
+
+    The distance of two curves is the RMS difference of their potentials on
+    a common normalized grid, and clusters are formed by average-linkage
+    hierarchical clustering cut at the threshold.
+
+    Parameters:
+    - half_cells (dict): Half-cell data returned by add_half_cell_data.
+    - threshold (float, optional): Largest average RMS distance, in V, of
+      the curves of one cluster.
+    - n_points (int, optional): Number of points of the common grid.
+
+    Returns:
+    - list of dict: Clusters with their 'members' (list of IDs) and
+      'representative', the member closest to all others.
+    """
+    IDs, shapes = half_cell_shape_matrix(half_cells, n_points)
+    if len(IDs) == 1:
+        return [{'representative': IDs[0], 'members': IDs}]
+
+    distances = pdist(shapes) / np.sqrt(n_points)
+    labels = fcluster(linkage(distances, method='average'),
+                      t=threshold, criterion='distance')
+    distance_matrix = squareform(distances)
+
+    clusters = []
+    for label in np.unique(labels):
+        rows = np.flatnonzero(labels == label)
+        medoid = rows[np.argmin(
+            distance_matrix[np.ix_(rows, rows)].sum(axis=1))]
+        clusters.append({'representative': IDs[medoid],
+                         'members': [IDs[row] for row in rows]})
+    return clusters
+
+
+def perform_clustered_optimization(SOC_battery, OCV_battery,
+                                   interpolated_cathodes, interpolated_anodes,
+                                   threshold=0.05, top_clusters=2,
+                                   battery=1, derivative_inverse=0,
+                                   iterations=5, adaptive=False,
+                                   tolerance=1e-5, stable_restarts=2,
+                                   time_budget=None, **kwargs):
+    """
+    Search cluster representatives first, then the members of the best.
+
+    Both libraries are clustered with cluster_half_cells. Every
+    representative cathode is optimized once against every representative
+    anode; the members of the top_clusters best cluster pairs are then
+    searched with perform_full_optimization_parallel. The cost grows with
+    the number of distinct curve shapes rather than the number of files.
+    Both stages use the same solver, limits and initializer, and share
+    one deadline.
+
+    Parameters:
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - threshold: float, optional
+        Clustering threshold in V (see cluster_half_cells).
+    - top_clusters: int, optional
+        Number of best cluster pairs whose members are searched.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - iterations, adaptive, tolerance, stable_restarts: optional
+        Iterations and adaptive restarts of the second stage (see
+        perform_full_optimization_parallel).
+    - time_budget: float, optional
+        Seconds within which both stages must return. The first stage gets
+        the share of one iteration.
+    - **kwargs:
+        Further keyword arguments passed to perform_pair_search in the first
+        stage and to perform_full_optimization_parallel in the second, e.g.
+        parallel, dtype, solver or limits.
+
+    Raises:
+    - ValueError: If the time budget is not positive, or ran out before
+      any representative or member pair was searched.
+
+    Returns:
+    - result: dict
+        Result of perform_full_optimization_parallel, plus 'Clusters' with
+        the cathode and anode clusters and 'Searched Pairs', the number of
+        pairs optimized in the second stage.
+    """
+    deadline = None
+    if time_budget is not None:
+        if time_budget <= 0:
+            raise ValueError("time_budget must be positive.")
+        deadline = time.time() + time_budget
+
+    clusters = {
+        'cathode': cluster_half_cells(interpolated_cathodes, threshold),
+        'anode': cluster_half_cells(interpolated_anodes, threshold)}
+    members = {
+        (electrode, cluster['representative']): cluster['members']
+        for electrode, electrode_clusters in clusters.items()
+        for cluster in electrode_clusters}
+
+    representative_pairs = list(product(
+        [cluster['representative'] for cluster in clusters['cathode']],
+        [cluster['representative'] for cluster in clusters['anode']]))
+    representative_results = perform_pair_search(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        battery=battery, derivative_inverse=derivative_inverse,
+        pairs=representative_pairs, deadline=deadline,
+        rounds=iterations + 1, **kwargs)
+    if not representative_results:
+        raise TimeBudgetExceeded(
+            "The time budget ran out before any cluster representative was "
+            "searched.")
+    representative_results.sort(key=lambda x: x['RMSD'])
+
+    pairs = []
+    for representative_result in representative_results[:top_clusters]:
+        pairs.extend(product(
+            members['cathode', representative_result['cathode_data_ID']],
+            members['anode', representative_result['anode_data_ID']]))
+
+    result = perform_full_optimization_parallel(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        iterations=iterations, battery=battery,
+        derivative_inverse=derivative_inverse, adaptive=adaptive,
+        tolerance=tolerance, stable_restarts=stable_restarts, pairs=pairs,
+        deadline=deadline, **kwargs)
+    result['Clusters'] = clusters
+    result['Searched Pairs'] = len(pairs)
+    return result
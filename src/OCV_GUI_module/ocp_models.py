@@ -0,0 +1,277 @@
+"""
+Analytic open-circuit potential (OCP) models of half-cells.
+
+Besides tables of measured points, a half-cell can be described by a
+coefficient file, <Chemistry>-<Source>.ocp.json, in the same directory:
+
+    {"model": "redlich_kister", "x_range": [0.05, 0.95],
+     "U0": 3.9, "A": [-31000.0, 1200.0, -4500.0]}
+
+    {"model": "tanh", "x_range": [0.0, 1.0], "offset": 0.2,
+     "slope": -0.1, "terms": [[0.5, 0.02, 0.01], [-0.06, 0.55, 0.03]]}
+
+    {"model": "expression", "x_range": [0.1, 0.9],
+     "expression": "a + b * x + c * exp(-x / d)",
+     "parameters": {"a": 3.5, "b": 0.8, "c": -0.6, "d": 0.05}}
+
+'x_range' is the range of the stoichiometry x the model is valid for.
+add_half_cell_data samples it at 1001 points for the alignment indices.
+Every model is a callable evaluated as a vectorized NumPy expression, with
+an exact derivative. A cropped electrode is then evaluated in closed form
+instead of through a new cubic spline (see calculate_battery_OCV). The
+dQ/dV term uses the exact dV/dSOC instead of np.gradient.
+
+Models are registered by name in OCP_MODELS; a custom model is added with
+the register_ocp_model decorator:
+
+    @register_ocp_model('polynomial')
+    class Polynomial(OCPModel):
+        ...
+"""
+import ast
+import json
+
+import numpy as np
+
+# Gas constant (J/(mol K)) and Faraday constant (C/mol)
+GAS_CONSTANT = 8.314462618
+FARADAY_CONSTANT = 96485.33212
+
+OCP_MODELS = {}
+
+
+def register_ocp_model(name):
+    """
+    Decorator registering an OCP model class under a name.
+
+    Parameters:
+    - name (str): Value of 'model' in the coefficient files.
+
+    Returns:
+    - callable: The decorator, which returns the class unchanged.
+    """
+    def decorator(model):
+        OCP_MODELS[name] = model
+        return model
+    return decorator
+
+
+class OCPModel:
+    """
+    Base class of the analytic OCP models.
+
+    Subclasses implement __call__(x) and derivative(x), both vectorized
+    over an array of stoichiometries x.
+
+    Parameters:
+    - x_range (tuple): Lowest and highest stoichiometry of the model.
+    """
+
+    # Marks half-cell functions that can be evaluated in closed form
+    analytic = True
+
+    def __init__(self, x_range):
+        low, high = (float(value) for value in x_range)
+        if not low < high:
+            raise ValueError(
+                f"x_range must be increasing, got {list(x_range)}.")
+        self.x_range = (low, high)
+
+    def __call__(self, x):
+        raise NotImplementedError
+
+    def derivative(self, x):
+        raise NotImplementedError
+
+
+@register_ocp_model('redlich_kister')
+class RedlichKister(OCPModel):
+    """
+    Redlich-Kister expansion,
+
+        U = U0 + RT/F ln((1 - x) / x)
+            + 1/F sum_k A_k ((2x - 1)^(k+1) - 2kx(1 - x)(2x - 1)^(k-1)).
+
+    Parameters:
+    - x_range (tuple): Lowest and highest stoichiometry, inside (0, 1).
+    - U0 (float): Reference potential (V).
+    - A (list of float): Interaction coefficients A_0, A_1, ... (J/mol).
+    - T (float, optional): Temperature (K).
+    """
+
+    def __init__(self, x_range, U0, A, T=298.15):
+        super().__init__(x_range)
+        if not (0 < self.x_range[0] and self.x_range[1] < 1):
+            raise ValueError(
+                "The x_range of a Redlich-Kister model must be inside "
+                "(0, 1).")
+        self.U0 = float(U0)
+        self.A = np.asarray(A, dtype=np.float64)
+        self.T = float(T)
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        y = 2 * x - 1
+        # With y = 2x - 1, 2kx(1 - x) = k(1 - y^2)/2
+        excess = sum(
+            A_k * ((1 + k / 2) * y ** (k + 1)
+                   - (k / 2 * y ** (k - 1) if k else 0))
+            for k, A_k in enumerate(self.A))
+        return (self.U0
+                + GAS_CONSTANT * self.T / FARADAY_CONSTANT
+                * np.log((1 - x) / x)
+                + excess / FARADAY_CONSTANT)
+
+    def derivative(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        y = 2 * x - 1
+        excess = sum(
+            A_k * 2 * ((1 + k / 2) * (k + 1) * y ** k
+                       - (k / 2 * (k - 1) * y ** (k - 2) if k > 1 else 0))
+            for k, A_k in enumerate(self.A))
+        return (-GAS_CONSTANT * self.T / FARADAY_CONSTANT / (x * (1 - x))
+                + excess / FARADAY_CONSTANT)
+
+
+@register_ocp_model('tanh')
+class TanhSum(OCPModel):
+    """
+    Linear term plus a sum of steps,
+
+        U = offset + slope x + sum_i a_i tanh((x - c_i) / w_i).
+
+    Parameters:
+    - x_range (tuple): Lowest and highest stoichiometry.
+    - offset, slope (float, optional): Linear term (V).
+    - terms (list, optional): (a_i, c_i, w_i) of every step: height (V),
+      center and width.
+    """
+
+    def __init__(self, x_range, offset=0.0, slope=0.0, terms=()):
+        super().__init__(x_range)
+        self.offset = float(offset)
+        self.slope = float(slope)
+        terms = np.asarray(terms, dtype=np.float64).reshape(-1, 3)
+        self.amplitudes, self.centers, self.widths = terms.T[:, :, None]
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        steps = np.tanh((x.ravel() - self.centers) / self.widths)
+        return (self.offset + self.slope * x
+                + (self.amplitudes * steps).sum(axis=0).reshape(x.shape))
+
+    def derivative(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        steps = np.tanh((x.ravel() - self.centers) / self.widths)
+        slopes = self.amplitudes / self.widths * (1 - steps ** 2)
+        return self.slope + slopes.sum(axis=0).reshape(x.shape)
+
+
+# Functions and constants allowed in expression models
+EXPRESSION_FUNCTIONS = {
+    name: getattr(np, name) for name in (
+        'exp', 'log', 'log10', 'sqrt', 'tanh', 'sinh', 'cosh', 'arctan')}
+EXPRESSION_CONSTANTS = {'pi': np.pi}
+EXPRESSION_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name,
+    ast.Constant, ast.Load, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow,
+    ast.USub, ast.UAdd)
+
+
+@register_ocp_model('expression')
+class Expression(OCPModel):
+    """
+    Fitted formula of x, e.g. from symbolic regression.
+
+    The formula may use + - * / **, numbers, the parameters and the
+    functions of EXPRESSION_FUNCTIONS. The derivative is computed by
+    complex-step differentiation, which is exact to rounding for such
+    formulas.
+
+    Parameters:
+    - x_range (tuple): Lowest and highest stoichiometry.
+    - expression (str): Formula of x.
+    - parameters (dict, optional): Values of the other names of the
+      formula.
+    """
+
+    # Step of the complex-step differentiation
+    STEP = 1e-30
+
+    def __init__(self, x_range, expression, parameters=None):
+        super().__init__(x_range)
+        self.expression = expression
+        self.namespace = dict(EXPRESSION_CONSTANTS)
+        self.namespace.update(
+            {name: float(value) for name, value in (parameters or {}).items()})
+
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError as error:
+            raise ValueError(
+                f"Invalid OCP expression '{expression}': {error.msg}.")
+        for node in ast.walk(tree):
+            if not isinstance(node, EXPRESSION_NODES):
+                raise ValueError(
+                    f"'{ast.unparse(node)}' is not allowed in an OCP "
+                    f"expression.")
+            if isinstance(node, ast.Call) and (
+                    not isinstance(node.func, ast.Name)
+                    or node.func.id not in EXPRESSION_FUNCTIONS
+                    or node.keywords):
+                raise ValueError(
+                    f"'{ast.unparse(node)}' is not an allowed function call; "
+                    f"available: {', '.join(EXPRESSION_FUNCTIONS)}.")
+            if isinstance(node, ast.Name) and node.id != 'x' \
+                    and node.id not in EXPRESSION_FUNCTIONS \
+                    and node.id not in self.namespace:
+                raise ValueError(
+                    f"Unknown name '{node.id}' in the OCP expression.")
+            if isinstance(node, ast.Constant) \
+                    and not isinstance(node.value, (int, float)):
+                raise ValueError(
+                    f"Only numbers are allowed in an OCP expression, got "
+                    f"{node.value!r}.")
+        self.code = compile(tree, '<ocp expression>', 'eval')
+        self.namespace.update(EXPRESSION_FUNCTIONS)
+
+    def _evaluate(self, x):
+        # The syntax tree was checked, so the formula can only compute
+        return eval(self.code, {'__builtins__': {}}, dict(self.namespace, x=x))
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        return np.broadcast_to(self._evaluate(x), x.shape).astype(np.float64)
+
+    def derivative(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        values = self._evaluate(x + 1j * self.STEP)
+        return np.broadcast_to(np.imag(values) / self.STEP, x.shape)
+
+
+def load_ocp_model(filename):
+    """
+    Load an OCP model from a coefficient file.
+
+    Parameters:
+    - filename (str): Path to the .ocp.json file.
+
+    Raises:
+    - ValueError: If the model is not registered or its coefficients are
+      invalid.
+
+    Returns:
+    - OCPModel: The model.
+    """
+    with open(filename, 'r') as file:
+        coefficients = json.load(file)
+
+    name = coefficients.pop('model', None)
+    if name not in OCP_MODELS:
+        raise ValueError(
+            f"Unknown OCP model {name!r} in '{filename}', available: "
+            f"{', '.join(OCP_MODELS)}.")
+    try:
+        return OCP_MODELS[name](**coefficients)
+    except TypeError as error:
+        raise ValueError(f"Invalid coefficients in '{filename}': {error}")
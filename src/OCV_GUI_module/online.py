@@ -0,0 +1,276 @@
+"""
+Online decomposition from battery OCV points arriving a few at a time.
+
+A battery management system reports rest voltages and SOC values a few
+points at a time instead of a complete curve. OnlineDecomposition keeps a
+fixed cathode and anode pair and the current alignment estimate, and
+refines the estimate with a short Nelder-Mead search around it whenever new
+points arrive. A full search over the whole alignment range runs when the
+residual after this local update exceeds baseline + drift_threshold, where
+the baseline is the lowest residual since the last full search.
+
+The points are kept in SOC bins, the latest point of every bin, so the
+memory does not grow with the length of the stream and old points are
+replaced as the cell is revisited at the same SOC. Points are weighted by
+forgetting ** (number of batches since they arrived), so the estimate
+follows an ageing cell instead of averaging over its life. An evaluation
+computes the battery OCV of an alignment once and interpolates it at the
+kept points, so the cost of a local update is bounded by local_evaluations
+evaluations whatever the number of points received.
+
+Only the OCV term is fitted: the dQ/dV of a few scattered points is
+dominated by noise.
+
+Example:
+    online = OnlineDecomposition.from_result(
+        load_result('result.json'), interpolated_cathodes,
+        interpolated_anodes)
+    for SOC, OCV in batches:
+        state = online.update(SOC, OCV)
+"""
+import numpy as np
+from scipy.optimize import minimize
+
+from .optimization_functions import (
+    calculate_alignment_indices, calculate_alignment_params,
+    calculate_battery_OCV)
+from .solvers import get_solver
+
+# SOC values of the battery OCV calculated for an alignment
+BATTERY_SOC = np.linspace(0, 1, 1001)
+
+
+class OnlineDecomposition:
+    """
+    Alignment of a fixed electrode pair, updated as OCV points arrive.
+
+    Parameters:
+    - cathode_info, anode_info (dict): Half-cell data of the pair.
+    - params (array-like, optional): Initial e, f, g, h percentages. Without
+      them, the alignment is searched once min_points points are kept.
+    - n_bins (int, optional): Number of SOC bins, the most points kept.
+    - drift_threshold (float, optional): Rise of the RMSD (V) above its
+      baseline after which the alignment is searched again over its whole
+      range.
+    - forgetting (float, optional): Weight factor per batch of the age of
+      a point; 1 weighs all kept points equally.
+    - min_points (int, optional): Number of kept points before the first
+      update.
+    - local_evaluations (int, optional): Evaluations of a local update.
+    - step (float, optional): Size of the initial Nelder-Mead simplex, in
+      alignment percentages.
+    - solver (str, optional): Registered solver of the full searches.
+    - solver_options (dict, optional): popsize, tol and maxiter of the
+      solver.
+    - seed (int, optional): Seed of the full searches.
+    """
+
+    def __init__(self, cathode_info, anode_info, params=None, n_bins=101,
+                 drift_threshold=0.005, forgetting=0.9, min_points=10,
+                 local_evaluations=40,
+                 step=0.02, solver='differential_evolution',
+                 solver_options=None, seed=None):
+        self.cathode_info = cathode_info
+        self.anode_info = anode_info
+        self.params = None if params is None else np.asarray(
+            params, dtype=np.float64)
+        self.drift_threshold = drift_threshold
+        self.forgetting = forgetting
+        self.min_points = min_points
+        self.local_evaluations = local_evaluations
+        self.step = step
+        self.solver = get_solver(solver)
+        self.solver_options = solver_options or {}
+        self.seed = seed
+
+        self.SOC_points = np.full(n_bins, np.nan)
+        self.OCV_points = np.full(n_bins, np.nan)
+        self.batches = np.zeros(n_bins, dtype=np.int64)
+        self.batch = 0
+        self.residual = None
+        self.baseline = None
+        self.updates = 0
+        self.searches = 0
+        self.nfev = 0
+
+    @classmethod
+    def from_result(cls, result, interpolated_cathodes, interpolated_anodes,
+                    **kwargs):
+        """
+        Start from the pair and alignment of a decomposition result.
+
+        Parameters:
+        - result (dict): Result of perform_full_optimization_parallel or
+          load_result.
+        - interpolated_cathodes, interpolated_anodes (dict): Half-cell data
+          returned by add_half_cell_data.
+        - **kwargs: Other arguments of OnlineDecomposition.
+
+        Raises:
+        - ValueError: If the pair of the result is not in the half-cell
+          data.
+
+        Returns:
+        - OnlineDecomposition: The online decomposition.
+        """
+        cathode_ID = result['Best Cathode Data ID']
+        anode_ID = result['Best Anode Data ID']
+        if (cathode_ID not in interpolated_cathodes
+                or anode_ID not in interpolated_anodes):
+            raise ValueError(
+                f"The pair {cathode_ID} / {anode_ID} of the result is not in "
+                f"the half-cell data.")
+        cathode_info = interpolated_cathodes[cathode_ID]
+        anode_info = interpolated_anodes[anode_ID]
+        params = calculate_alignment_params(
+            result['Best Parameters'], len(anode_info['x_values']),
+            len(cathode_info['x_values']))
+        return cls(cathode_info, anode_info, params, **kwargs)
+
+    @property
+    def n_points(self):
+        """Number of kept points."""
+        return int(np.count_nonzero(~np.isnan(self.SOC_points)))
+
+    @property
+    def best_parameters(self):
+        """Alignment indices e, f, g, h of the estimate, or None."""
+        if self.params is None:
+            return None
+        return calculate_alignment_indices(
+            self.params, len(self.anode_info['x_values']),
+            len(self.cathode_info['x_values']))
+
+    def add_points(self, SOC, OCV):
+        """
+        Keep new points, replacing the older points of their SOC bins.
+
+        Parameters:
+        - SOC, OCV (array-like): SOC (0 to 1) and OCV (V) of the points.
+
+        Raises:
+        - ValueError: If SOC and OCV differ in length or a SOC is outside
+          of 0 to 1.
+        """
+        SOC = np.atleast_1d(np.asarray(SOC, dtype=np.float64))
+        OCV = np.atleast_1d(np.asarray(OCV, dtype=np.float64))
+        if SOC.shape != OCV.shape:
+            raise ValueError(
+                f"SOC and OCV must have the same length, got {len(SOC)} "
+                f"and {len(OCV)}.")
+        if np.any((SOC < 0) | (SOC > 1)):
+            raise ValueError("SOC values must be between 0 and 1.")
+
+        n_bins = len(self.SOC_points)
+        bins = np.rint(SOC * (n_bins - 1)).astype(int)
+        # The last point of every bin wins
+        _, last = np.unique(bins[::-1], return_index=True)
+        last = len(bins) - 1 - last
+        self.SOC_points[bins[last]] = SOC[last]
+        self.OCV_points[bins[last]] = OCV[last]
+        self.batch += 1
+        self.batches[bins[last]] = self.batch
+
+    def objective(self, params):
+        """
+        Weighted RMSD between an alignment and the kept points.
+
+        Parameters:
+        - params (array-like): e, f, g, h percentages.
+
+        Returns:
+        - float: RMSD (V).
+        """
+        params = np.clip(params, 0, 1)
+        calculated_battery_OCV = calculate_battery_OCV(
+            params, self.anode_info['interpolated_function'],
+            self.anode_info['x_values'],
+            self.cathode_info['interpolated_function'],
+            self.cathode_info['x_values'])
+        kept = ~np.isnan(self.SOC_points)
+        calculated = np.interp(self.SOC_points[kept], BATTERY_SOC,
+                               calculated_battery_OCV)
+        weights = self.forgetting ** (self.batch - self.batches[kept])
+        return float(np.sqrt(np.average(
+            (calculated - self.OCV_points[kept]) ** 2, weights=weights)))
+
+    def local_update(self):
+        """
+        Refine the estimate with a bounded Nelder-Mead search around it.
+
+        Returns:
+        - float: Residual of the refined estimate.
+        """
+        simplex = np.vstack((self.params,
+                             self.params + self.step * np.eye(4)))
+        result = minimize(
+            self.objective, self.params, method='Nelder-Mead',
+            bounds=[(0, 1)] * 4,
+            options={'initial_simplex': np.clip(simplex, 0, 1),
+                     'maxfev': self.local_evaluations, 'xatol': 1e-3,
+                     'fatol': 1e-7})
+        self.nfev += result.nfev
+        self.params = np.clip(result.x, 0, 1)
+        return float(result.fun)
+
+    def full_search(self):
+        """
+        Search the alignment over its whole range, from the estimate.
+
+        Returns:
+        - float: Residual of the new estimate.
+        """
+        result = self.solver(self.objective, [(0, 1)] * 4, seed=self.seed,
+                             x0=self.params, **self.solver_options)
+        self.nfev += result.nfev
+        self.searches += 1
+        if self.residual is None or result.fun < self.residual:
+            self.params = np.clip(result.x, 0, 1)
+            return float(result.fun)
+        return self.residual
+
+    def update(self, SOC, OCV):
+        """
+        Add new points and update the alignment estimate.
+
+        The estimate is refined locally; if its residual is still more than
+        drift_threshold above the baseline, the alignment is searched again
+        over its whole range. Nothing is fitted before min_points points are
+        kept.
+
+        Parameters:
+        - SOC, OCV (array-like): SOC (0 to 1) and OCV (V) of the new points.
+
+        Returns:
+        - dict: 'Points' kept, 'Best Parameters' (alignment indices, None
+          before the first fit), 'Residual' and 'Baseline' (V),
+          'Re-searched' (whether a full search was run) and 'nfev' of this
+          update.
+        """
+        self.add_points(SOC, OCV)
+        nfev = self.nfev
+        re_searched = False
+        if self.n_points >= self.min_points:
+            self.updates += 1
+            if self.params is None:
+                self.residual = self.full_search()
+                re_searched = True
+            else:
+                self.residual = self.local_update()
+                if (self.baseline is not None and self.residual
+                        > self.baseline + self.drift_threshold):
+                    self.residual = self.full_search()
+                    re_searched = True
+            if re_searched or self.baseline is None:
+                self.baseline = self.residual
+            else:
+                self.baseline = min(self.baseline, self.residual)
+
+        return {
+            'Points': self.n_points,
+            'Best Parameters': self.best_parameters,
+            'Residual': self.residual,
+            'Baseline': self.baseline,
+            'Re-searched': re_searched,
+            'nfev': self.nfev - nfev
+        }
@@ -1,8 +1,38 @@
 import numpy as np
 from scipy.interpolate import interp1d
 from scipy.optimize import differential_evolution
-from joblib import Parallel, delayed
+from joblib import Parallel, delayed, cpu_count
+import inspect
 import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Parallel layouts of a pair search:
+# - 'processes': one process per combination (joblib's default backend)
+# - 'threads': one thread per combination, no process start-up
+# - 'workers': combinations one after another, each differential evolution
+#   evaluating its population on all cores
+# - 'serial': everything in the calling process
+PARALLEL_LAYOUTS = ('processes', 'threads', 'workers', 'serial')
+
+# Cost model used to choose a layout: typical number of objective
+# evaluations of one differential evolution, start-up time (s) of a pool of
+# worker processes, and fraction of an evaluation that runs without the GIL
+SEARCH_EVALUATIONS = 1500
+PROCESS_START_COST = 1.5
+THREAD_PARALLEL_FRACTION = 0.5
+
+
+class TimeBudgetExceeded(ValueError):
+    """
+    The time budget ran out before anything was searched.
+
+    A ValueError, so that callers checking the options of a search handle
+    it too; catch it alone to tell a deadline from an invalid request.
+    """
 
 
 def calculate_derivative_and_inverse(x, y):
@@ -41,12 +71,238 @@ def calculate_inverse_derivative(x, y):
     Returns:
     - yi: array-like
         Inverse of the derivative of the function.
+        For multi-dimensional y, the derivative is taken along the last axis.
     """
-    yd = np.gradient(y, x)
+    yd = np.gradient(y, x, axis=-1)
     yi = 1 / yd
     return yi
 
 
+def calculate_alignment_indices(params, anode_length, cathode_length):
+    """
+    Convert optimization parameters to alignment indices.
+
+    Parameters e and f may trim up to 30 % of the anode array from either
+    end, g and h up to 15 % of the cathode array.
+
+    Parameters:
+    - params: tuple
+        Optimization parameters:
+        e_percentage, f_percentage, g_percentage, h_percentage.
+    - anode_length: int
+        Number of anode data points.
+    - cathode_length: int
+        Number of cathode data points.
+
+    Returns:
+    - tuple: Alignment indices e, f, g, h.
+    """
+    e_percentage, f_percentage, g_percentage, h_percentage = params
+
+    e = int(e_percentage * anode_length * 0.3)
+    f = anode_length - int(f_percentage * anode_length * 0.3)
+    g = int(g_percentage * cathode_length * 0.15)
+    h = cathode_length - int(h_percentage * cathode_length * 0.15)
+
+    if f > anode_length:
+        f = anode_length
+
+    if h > cathode_length:
+        h = cathode_length
+
+    return e, f, g, h
+
+
+def calculate_alignment_params(best_parameters, anode_length,
+                               cathode_length):
+    """
+    Convert alignment indices to optimization parameters.
+
+    This is the inverse of calculate_alignment_indices. Indices outside of
+    the search bounds are clipped to the bounds.
+
+    Parameters:
+    - best_parameters: tuple
+        Alignment indices e, f, g, h.
+    - anode_length: int
+        Number of anode data points.
+    - cathode_length: int
+        Number of cathode data points.
+
+    Returns:
+    - numpy.ndarray: e_percentage, f_percentage, g_percentage, h_percentage.
+    """
+    e, f, g, h = best_parameters
+    # Aim at the middle of the range that truncates to each index
+    params = np.array([
+        (e + 0.5) / (anode_length * 0.3),
+        (anode_length - f + 0.5) / (anode_length * 0.3),
+        (g + 0.5) / (cathode_length * 0.15),
+        (cathode_length - h + 0.5) / (cathode_length * 0.15)
+    ])
+    return np.clip(params, 0, 1)
+
+
+def calculate_RMSD_terms(calculated_battery_OCV, OCV_battery, SOC_battery,
+                         calculated_derivative=None):
+    """
+    Unweighted OCV and differential capacity terms of the RMSD.
+
+    Parameters:
+    - calculated_battery_OCV: array-like
+        Battery OCV calculated from the aligned electrode curves.
+        A stack of curves along the last axis gives terms per curve.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - calculated_derivative: array-like, optional
+        Exact derivative of the calculated battery OCV, as returned by
+        calculate_battery_OCV_derivative. By default, the derivative is
+        computed with np.gradient.
+
+    Returns:
+    - OCV_term, derivative_term: float
+        RMSD of the OCV and of its inverse derivative (dQ/dV).
+    """
+    if calculated_derivative is None:
+        calculated_battery_OCV_d_in = calculate_inverse_derivative(
+            SOC_battery,
+            calculated_battery_OCV)
+    else:
+        # The derivative is taken over a SOC range of 1
+        calculated_battery_OCV_d_in = (
+            SOC_battery[-1] - SOC_battery[0]) / calculated_derivative
+    OCV_battery_d_in = calculate_inverse_derivative(
+        SOC_battery,
+        OCV_battery)
+
+    OCV_term = np.sqrt(
+        np.mean((calculated_battery_OCV - OCV_battery) ** 2, axis=-1))
+    derivative_term = np.sqrt(
+        np.mean((calculated_battery_OCV_d_in - OCV_battery_d_in) ** 2,
+                axis=-1))
+    return OCV_term, derivative_term
+
+
+def calculate_RMSD(calculated_battery_OCV, OCV_battery, SOC_battery,
+                   battery=1, derivative_inverse=0,
+                   calculated_derivative=None):
+    """
+    Calculate the weighted RMSD between calculated and measured battery OCV.
+
+    Parameters:
+    - calculated_battery_OCV: array-like
+        Battery OCV calculated from the aligned electrode curves.
+        A stack of curves along the last axis gives one RMSD per curve.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for the OCV and differential capacity terms.
+    - calculated_derivative: array-like, optional
+        Exact derivative of the calculated battery OCV
+        (see calculate_RMSD_terms).
+
+    Returns:
+    - RMSD: float
+        Root Mean Square Deviation.
+    """
+    OCV_term, derivative_term = calculate_RMSD_terms(
+        calculated_battery_OCV, OCV_battery, SOC_battery,
+        calculated_derivative)
+    return battery * OCV_term + derivative_inverse * derivative_term
+
+
+def is_analytic(function):
+    """
+    Whether a half-cell function is an analytic OCP model.
+
+    Parameters:
+    - function: callable
+        'interpolated_function' of a half-cell.
+
+    Returns:
+    - bool: True for the models of ocp_models, which are evaluated in
+      closed form and have an exact derivative.
+    """
+    return getattr(function, 'analytic', False)
+
+
+def calculate_battery_OCV(params, anode_interp, anode_x_values,
+                          cathode_interp, cathode_x_values):
+    """
+    Battery OCV of an alignment, on 1001 equally spaced SOC values.
+
+    A cropped electrode is resampled through a cubic spline of its
+    samples, or evaluated directly if it is an analytic OCP model.
+
+    Parameters:
+    - params: tuple
+        Optimization parameters:
+        e_percentage, f_percentage, g_percentage, h_percentage.
+    - anode_interp, cathode_interp: callable
+        Interpolated functions for the anode and cathode.
+    - anode_x_values, cathode_x_values: array-like
+        X-axis values for the anode and cathode.
+
+    Returns:
+    - numpy.ndarray: Calculated battery OCV.
+    """
+    e, f, g, h = calculate_alignment_indices(
+        params, len(anode_x_values), len(cathode_x_values))
+
+    axv = anode_x_values
+    x_a = np.linspace(axv[e:f][0], axv[e:f][-1], 1001)
+    if is_analytic(anode_interp):
+        w = anode_interp
+    else:
+        v = anode_interp(anode_x_values)
+        w = interp1d(axv[e:f], v[e:f], kind='cubic',
+                     fill_value='extrapolate')
+    cxv = cathode_x_values
+    x_c = np.linspace(cxv[g:h][0], cxv[g:h][-1], 1001)
+    if is_analytic(cathode_interp):
+        r = cathode_interp
+    else:
+        q = cathode_interp(cathode_x_values)
+        r = interp1d(cxv[g:h], q[g:h], kind='cubic',
+                     fill_value='extrapolate')
+
+    return r(x_c) - w(x_a)
+
+
+def calculate_battery_OCV_derivative(params, anode_interp, anode_x_values,
+                                     cathode_interp, cathode_x_values):
+    """
+    Exact derivative of the battery OCV of calculate_battery_OCV.
+
+    Parameters:
+    - params: tuple
+        Optimization parameters:
+        e_percentage, f_percentage, g_percentage, h_percentage.
+    - anode_interp, cathode_interp: callable
+        Interpolated functions for the anode and cathode.
+    - anode_x_values, cathode_x_values: array-like
+        X-axis values for the anode and cathode.
+
+    Returns:
+    - numpy.ndarray or None: Derivative of the battery OCV over a SOC
+      range of 1, or None unless both electrodes are analytic OCP models.
+    """
+    if not (is_analytic(anode_interp) and is_analytic(cathode_interp)):
+        return None
+
+    e, f, g, h = calculate_alignment_indices(
+        params, len(anode_x_values), len(cathode_x_values))
+    x_a = np.linspace(anode_x_values[e], anode_x_values[f - 1], 1001)
+    x_c = np.linspace(cathode_x_values[g], cathode_x_values[h - 1], 1001)
+    # Both stoichiometries are linear in the SOC
+    return (cathode_interp.derivative(x_c) * (x_c[-1] - x_c[0])
+            - anode_interp.derivative(x_a) * (x_a[-1] - x_a[0]))
+
+
 def optimization(params, anode_interp, anode_x_values, cathode_interp,
                  cathode_x_values, OCV_battery, SOC_battery, battery=1,
                  derivative_inverse=0):
@@ -76,48 +332,165 @@ def optimization(params, anode_interp, anode_x_values, cathode_interp,
     - RMSD: float
         Root Mean Square Deviation, the objective value for optimization.
     """
-    e_percentage, f_percentage, g_percentage, h_percentage = params
+    calculated_battery_OCV = calculate_battery_OCV(
+        params, anode_interp, anode_x_values, cathode_interp,
+        cathode_x_values)
+    calculated_derivative = None
+    if derivative_inverse:
+        calculated_derivative = calculate_battery_OCV_derivative(
+            params, anode_interp, anode_x_values, cathode_interp,
+            cathode_x_values)
 
-    e = int(e_percentage * len(anode_x_values) * 0.3)
-    f = len(anode_x_values) - int(f_percentage * len(anode_x_values) * 0.3)
-    g = int(g_percentage * len(cathode_x_values) * 0.15)
-    h = len(cathode_x_values) - int(
-        h_percentage * len(cathode_x_values) * 0.15)
+    return calculate_RMSD(calculated_battery_OCV, OCV_battery, SOC_battery,
+                          battery, derivative_inverse, calculated_derivative)
 
-    if f > len(anode_x_values):
-        f = len(anode_x_values)
 
-    if h > len(cathode_x_values):
-        h = len(cathode_x_values)
+class TabulatedObjective:
+    """
+    Objective function of a single precision search.
 
-    v = anode_interp(anode_x_values)
-    axv = anode_x_values
-    w = interp1d(axv[e:f], v[e:f], kind='cubic', fill_value='extrapolate')
-    x_a = np.linspace(axv[e:f][0], axv[e:f][-1], 1001)
-    q = cathode_interp(cathode_x_values)
-    cxv = cathode_x_values
-    r = interp1d(cxv[g:h], q[g:h], kind='cubic', fill_value='extrapolate')
-    x_c = np.linspace(cxv[g:h][0], cxv[g:h][-1], 1001)
+    Both half-cells are tabulated once on uniform grids of their x range,
+    together with the slopes between the table points. An evaluation
+    resamples the cropped electrodes by linear interpolation in the
+    tables, in the floating point type of the tables, instead of building
+    new cubic splines as optimization() does. The battery dQ/dV is computed
+    once, in double precision, and the dQ/dV term of the alignment only when
+    derivative_inverse is not 0, with np.gradient also for analytic OCP
+    models.
 
-    calculated_battery_OCV = r(x_c) - w(x_a)
+    Parameters:
+    - cathode_info, anode_info (dict): Half-cell data of the pair.
+    - SOC_battery, OCV_battery (array-like): SOC and OCV of the battery.
+    - battery, derivative_inverse (float, optional): Weighting factors for
+      different components of the objective function.
+    - dtype (numpy.dtype, optional): Floating point type of the tables,
+      resampled curves and residuals.
+    - n_table (int, optional): Number of points of every table.
+    """
 
-    calculated_battery_OCV_d_in = calculate_inverse_derivative(
-        SOC_battery,
-        calculated_battery_OCV)
-    OCV_battery_d_in = calculate_inverse_derivative(
-        SOC_battery,
-        OCV_battery)
+    def __init__(self, cathode_info, anode_info, SOC_battery, OCV_battery,
+                 battery=1, derivative_inverse=0, dtype=np.float32,
+                 n_table=4001):
+        self.dtype = np.dtype(dtype)
+        self.cathode = self._tabulate(cathode_info, n_table)
+        self.anode = self._tabulate(anode_info, n_table)
+        self.SOC_battery = np.asarray(SOC_battery, dtype=self.dtype)
+        self.OCV_battery = np.asarray(OCV_battery, dtype=self.dtype)
+        # Flat parts of the battery curve need double precision for dQ/dV
+        self.OCV_battery_d_in = calculate_inverse_derivative(
+            np.asarray(SOC_battery, dtype=np.float64),
+            np.asarray(OCV_battery, dtype=np.float64)).astype(self.dtype)
+        self.battery = battery
+        self.derivative_inverse = derivative_inverse
+        self.t = np.linspace(0, 1, len(self.SOC_battery), dtype=self.dtype)
+
+    def _tabulate(self, half_cell, n_table):
+        x_values = np.asarray(half_cell['x_values'], dtype=np.float64)
+        OCP = half_cell['interpolated_function'](
+            np.linspace(x_values[0], x_values[-1], n_table))
+        OCP = np.asarray(OCP, dtype=self.dtype)
+        # A zero slope after the last point covers positions at the end
+        return {'x_values': x_values,
+                # Table position per unit of x
+                'scale': (n_table - 1) / (x_values[-1] - x_values[0]),
+                'OCP': OCP, 'slopes': np.diff(OCP, append=OCP[-1])}
+
+    def _resample(self, table, start, stop):
+        # Window of x_values[start:stop], as in calculate_battery_OCV
+        x_values = table['x_values']
+        first = (x_values[start] - x_values[0]) * table['scale']
+        last = (x_values[stop - 1] - x_values[0]) * table['scale']
+        position = self.dtype.type(first) \
+            + self.dtype.type(last - first) * self.t
+        index = position.astype(np.intp)
+        weight = position - index.astype(self.dtype)
+        return table['OCP'][index] + table['slopes'][index] * weight
+
+    def __call__(self, params):
+        e, f, g, h = calculate_alignment_indices(
+            params, len(self.anode['x_values']),
+            len(self.cathode['x_values']))
+        calculated_battery_OCV = self._resample(self.cathode, g, h) \
+            - self._resample(self.anode, e, f)
+
+        residual = calculated_battery_OCV - self.OCV_battery
+        RMSD = self.battery * np.sqrt(residual @ residual / len(residual))
+        if self.derivative_inverse:
+            residual = calculate_inverse_derivative(
+                self.SOC_battery, calculated_battery_OCV) \
+                - self.OCV_battery_d_in
+            RMSD += self.derivative_inverse \
+                * np.sqrt(residual @ residual / len(residual))
+        return float(RMSD)
+
+
+def search_objective(cathode_info, anode_info, OCV_battery, SOC_battery,
+                     battery=1, derivative_inverse=0, dtype=np.float64):
+    """
+    Objective function and arguments of the search of a combination.
+
+    Parameters:
+    - cathode_info, anode_info: dict
+        Information about the cathode and anode,
+        including interpolated function and x values.
+    - OCV_battery, SOC_battery: array-like
+        OCV and SOC values of the battery.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - dtype: numpy.dtype, optional
+        numpy.float64 searches with optimization(), numpy.float32 with a
+        TabulatedObjective in single precision.
+
+    Raises:
+    - ValueError: If dtype is neither numpy.float64 nor numpy.float32.
 
-    RMSD = battery * np.sqrt(
-            np.mean((calculated_battery_OCV - OCV_battery) ** 2)) \
-        + derivative_inverse * np.sqrt(
-            np.mean((calculated_battery_OCV_d_in - OCV_battery_d_in) ** 2))
-    return RMSD
+    Returns:
+    - callable, tuple: The objective and its arguments after params.
+    """
+    if np.dtype(dtype) == np.float64:
+        return optimization, (
+            anode_info['interpolated_function'], anode_info['x_values'],
+            cathode_info['interpolated_function'], cathode_info['x_values'],
+            OCV_battery, SOC_battery, battery, derivative_inverse)
+    if np.dtype(dtype) != np.float32:
+        raise ValueError(
+            f"dtype must be numpy.float64 or numpy.float32, got "
+            f"{np.dtype(dtype).name}.")
+    return TabulatedObjective(
+        cathode_info, anode_info, SOC_battery, OCV_battery, battery,
+        derivative_inverse, dtype), ()
+
+
+def stop_callback(stop_time, interrupted):
+    """
+    Callback stopping a differential evolution at a given time.
+
+    Parameters:
+    - stop_time: float
+        time.time() after which the evolution is stopped.
+    - interrupted: list
+        Receives the number of generations run if the evolution is stopped.
+
+    Returns:
+    - callable: Callback for the callback argument of
+      differential_evolution.
+    """
+    def reached_stop_time(intermediate_result):
+        # Called after every generation; True stops the evolution
+        if time.time() >= stop_time:
+            interrupted.append(intermediate_result.nit)
+            return True
+        return False
+    return reached_stop_time
 
 
 def perform_optimization(cathode_number, cathode_info, anode_number,
                          anode_info, OCV_battery, SOC_battery, battery,
-                         derivative_inverse):
+                         derivative_inverse, dtype=np.float64, seed=None,
+                         initializer=None, workers=1, limits=None,
+                         solver='differential_evolution',
+                         solver_options=None, deadline=None,
+                         time_limit=None):
     """
     Perform optimization for a specific cathode and anode combination.
 
@@ -136,13 +509,55 @@ def perform_optimization(cathode_number, cathode_info, anode_number,
         Measured battery open-circuit voltage (OCV).
     - SOC_battery: array-like
         State of charge (SOC) values for the battery.
+    - dtype: numpy.dtype, optional
+        numpy.float32 searches with a TabulatedObjective, in single
+        precision. The RMSD of the optimized parameters is always
+        recomputed in double precision.
+    - seed: int, optional
+        Seed of the differential evolution, for reproducible results.
+    - initializer: str, optional
+        'features' starts the differential evolution from a population
+        around the alignment estimated from dQ/dV features
+        (see features.feature_initial_population), with popsize times
+        the number of parameters members, as differential_evolution. By
+        default, the population is a Latin hypercube over the whole
+        search space.
+    - workers: int, optional
+        Number of processes evaluating the population of the differential
+        evolution (-1 for all cores).
+    - limits: dict, optional
+        Per-chemistry search limits (see constraints.load_search_limits)
+        that narrow the bounds and constrain the electrode balance.
+    - solver: str, optional
+        Name of a solver registered in solvers.SOLVERS. Solvers other than
+        the differential evolution start from the feature estimate with
+        initializer='features' and ignore workers.
+    - solver_options: dict, optional
+        popsize, tol and maxiter of the solver.
+    - deadline: float, optional
+        time.time() after which the combination is skipped, or its
+        differential evolution stopped with the best population member
+        found so far. Other solvers only skip the combination.
+    - time_limit: float, optional
+        Seconds the search may take, within the deadline.
 
     Returns:
-    - optimization_results: dict
+    - optimization_results: dict or None
         Dictionary containing optimization results,
         including cathode and anode data IDs,
-        optimized parameters, and RMSD (Root Mean Square Deviation).
+        optimized parameters, RMSD (Root Mean Square Deviation),
+        the number of objective evaluations, the unweighted OCV and dQ/dV
+        'RMSD_terms', the 'seconds' taken and whether the search was
+        interrupted by the deadline. None if the deadline had passed.
     """
+    start = time.perf_counter()
+    stop_time = None
+    if deadline is not None:
+        if time.time() >= deadline:
+            return None
+        stop_time = deadline if time_limit is None \
+            else min(deadline, time.time() + time_limit)
+
     cathode_interp = cathode_info['interpolated_function']
     cathode_x_values = cathode_info['x_values']
 
@@ -150,142 +565,156 @@ def perform_optimization(cathode_number, cathode_info, anode_number,
     anode_x_values = anode_info['x_values']
 
     bounds = [(0, 1), (0, 1), (0, 1), (0, 1)]
+    constraints = ()
+    if limits is not None:
+        try:
+            from .constraints import search_space
+        except ImportError:
+            # Imported as a top-level module, as GUI.py does
+            from constraints import search_space
+        bounds, constraints = search_space(
+            limits, cathode_number, cathode_info, anode_number, anode_info)
 
     battery = battery
     derivative_inverse = derivative_inverse
 
-    opt_result = differential_evolution(
-        lambda params: optimization(params, anode_interp, anode_x_values,
-                                    cathode_interp, cathode_x_values,
-                                    OCV_battery, SOC_battery, battery=battery,
-                                    derivative_inverse=derivative_inverse),
-        bounds
-    )
+    solver_options = solver_options or {}
+    init = 'latinhypercube'
+    if initializer == 'features':
+        try:
+            from .features import feature_initial_population
+        except ImportError:
+            # Imported as a top-level module, as GUI.py does
+            from features import feature_initial_population
+        popsize = solver_options.get('popsize') or inspect.signature(
+            differential_evolution).parameters['popsize'].default
+        init = feature_initial_population(
+            cathode_info, anode_info, SOC_battery, OCV_battery,
+            battery=battery, derivative_inverse=derivative_inverse,
+            popsize=popsize * len(bounds), seed=seed)
+        init = np.clip(init, *np.transpose(bounds))
+    elif initializer is not None:
+        raise ValueError(f"Unknown initializer '{initializer}'.")
+
+    # The objective and its arguments are passed separately, so they can be
+    # sent to the worker processes
+    objective, args = search_objective(
+        cathode_info, anode_info, OCV_battery, SOC_battery, battery,
+        derivative_inverse, dtype)
+    interrupted = []
+    if solver == 'differential_evolution':
+        opt_result = differential_evolution(
+            objective, bounds, args=args,
+            seed=seed, init=init, workers=workers, constraints=constraints,
+            # The constrained polish (trust-constr) may step outside the bounds
+            polish=not constraints,
+            updating='immediate' if workers == 1 else 'deferred',
+            callback=None if stop_time is None
+            else stop_callback(stop_time, interrupted),
+            **solver_options
+        )
+    else:
+        try:
+            from .solvers import get_solver
+        except ImportError:
+            # Imported as a top-level module, as GUI.py does
+            from solvers import get_solver
+        opt_result = get_solver(solver)(
+            objective, bounds, args=args, seed=seed,
+            x0=None if isinstance(init, str) else init[0],
+            constraints=constraints, **solver_options)
     optimized_params = opt_result.x
     RMSD_opt = opt_result.fun
 
+    # Both terms of the objective at the optimum, in double precision
+    RMSD_terms = calculate_RMSD_terms(
+        calculate_battery_OCV(optimized_params, anode_interp, anode_x_values,
+                              cathode_interp, cathode_x_values),
+        np.asarray(OCV_battery), np.asarray(SOC_battery),
+        calculate_battery_OCV_derivative(
+            optimized_params, anode_interp, anode_x_values, cathode_interp,
+            cathode_x_values))
+    if np.dtype(dtype) != np.float64:
+        RMSD_opt = battery * RMSD_terms[0] \
+            + derivative_inverse * RMSD_terms[1]
+
     return {
         'cathode_data_ID': cathode_number,
         'anode_data_ID': anode_number,
         'optimized_params': optimized_params,
-        'RMSD': RMSD_opt
+        'RMSD': RMSD_opt,
+        'nfev': opt_result.nfev,
+        'RMSD_terms': RMSD_terms,
+        'seconds': time.perf_counter() - start,
+        'interrupted': bool(interrupted)
     }
 
 
-def perform_full_optimization_parallel(SOC_battery, OCV_battery,
-                                       interpolated_cathodes,
-                                       interpolated_anodes, iterations=5,
-                                       battery=1, derivative_inverse=0):
+def calculate_aligned_curves(cathode_info, anode_info, best_parameters):
     """
-    Perform parallelized full optimization for multiple iterations
-    and find the overall best optimization result.
+    Calculate the aligned electrode curves and the resulting battery OCV.
 
     Parameters:
-    - SOC_battery: array-like
-        State of charge (SOC) values for the battery.
-    - OCV_battery: array-like
-        Measured battery open-circuit voltage (OCV).
-    - interpolated_cathodes: dict
-        Dictionary containing information about interpolated cathode functions.
-    - interpolated_anodes: dict
-        Dictionary containing information about interpolated anode functions.
-    - iterations: int, optional
-        Number of iterations for optimization.
-    - battery, derivative_inverse: float, optional
-        Weighting factors for different components of the objective function.
+    - cathode_info: dict
+        Information about the cathode,
+        including interpolated function and x values.
+    - anode_info: dict
+        Information about the anode,
+        including interpolated function and x values.
+    - best_parameters: tuple
+        Alignment indices e, f, g, h.
 
     Returns:
-    - result: dict
-        Dictionary containing optimization results and plots.
+    - dict: Calculated battery OCV and the cropped and full electrode
+      curves, keyed as in the result of perform_full_optimization_parallel.
     """
-    best_optimization_results = []
-
-    for iteration in range(iterations):
-        optimization_results = []
-
-        def optimize_single_case(
-                cathode_number, cathode_info, anode_number, anode_info):
-            return perform_optimization(cathode_number, cathode_info,
-                                        anode_number, anode_info, OCV_battery,
-                                        SOC_battery, battery,
-                                        derivative_inverse)
-
-        optimization_results = Parallel(n_jobs=-1)(
-            delayed(optimize_single_case)(cathode_number, cathode_info,
-                                          anode_number, anode_info)
-            for cathode_number, cathode_info in interpolated_cathodes.items()
-            for anode_number, anode_info in interpolated_anodes.items()
-        )
+    e_opt, f_opt, g_opt, h_opt = best_parameters
 
-        best_optimization_result = min(
-            optimization_results, key=lambda x: x['RMSD'])
-        best_optimization_results.append(best_optimization_result)
-
-    best_optimization_result = min(
-        best_optimization_results, key=lambda x: x['RMSD'])
-
-    best_cathode_data_ID = best_optimization_result['cathode_data_ID']
-    best_anode_data_ID = best_optimization_result['anode_data_ID']
-
-    Best_Cathode = interpolated_cathodes.get(best_cathode_data_ID)
-    Best_Anode = interpolated_anodes.get(best_anode_data_ID)
-
-    if Best_Cathode is not None and Best_Anode is not None:
-        e_percentage_opt, f_percentage_opt, g_percentage_opt, \
-            h_percentage_opt = best_optimization_result['optimized_params']
-        e_opt = int(e_percentage_opt * len(Best_Anode['x_values']) * 0.3)
-        f_opt = len(Best_Anode['x_values']) - \
-            int(f_percentage_opt * len(Best_Anode['x_values']) * 0.3)
-        g_opt = int(g_percentage_opt * len(Best_Cathode['x_values']) * 0.15)
-        h_opt = len(Best_Cathode['x_values']) - \
-            int(h_percentage_opt * len(Best_Cathode['x_values']) * 0.15)
-        best_parameters = e_opt, f_opt, g_opt, h_opt
-
-        v1 = Best_Anode['interpolated_function'](Best_Anode['x_values'])
-        axv_opt = Best_Anode['x_values']
+    v1 = anode_info['interpolated_function'](anode_info['x_values'])
+    axv_opt = anode_info['x_values']
+    if is_analytic(anode_info['interpolated_function']):
+        w1 = w1_ns = anode_info['interpolated_function']
+    else:
         w1 = interp1d(
             axv_opt[e_opt:f_opt], v1[e_opt:f_opt],
             kind='cubic', fill_value='extrapolate')
         w1_ns = interp1d(
             axv_opt, v1,
             kind='cubic', fill_value='extrapolate')
-        x_a1 = np.linspace(
-            axv_opt[e_opt:f_opt][0], axv_opt[e_opt:f_opt][-1], 1001)
-        x_a1_ns = np.linspace(
-            axv_opt[0], axv_opt[-1], 1001+e_opt+(1001-f_opt))
-        q1 = Best_Cathode['interpolated_function'](Best_Cathode['x_values'])
-        cxv_opt = Best_Cathode['x_values']
+    x_a1 = np.linspace(
+        axv_opt[e_opt:f_opt][0], axv_opt[e_opt:f_opt][-1], 1001)
+    x_a1_ns = np.linspace(
+        axv_opt[0], axv_opt[-1], 1001+e_opt+(1001-f_opt))
+    q1 = cathode_info['interpolated_function'](cathode_info['x_values'])
+    cxv_opt = cathode_info['x_values']
+    if is_analytic(cathode_info['interpolated_function']):
+        r1 = r1_ns = cathode_info['interpolated_function']
+    else:
         r1 = interp1d(
             cxv_opt[g_opt:h_opt], q1[g_opt:h_opt],
             kind='cubic', fill_value='extrapolate')
         r1_ns = interp1d(
             cxv_opt, q1,
             kind='cubic', fill_value='extrapolate')
-        x_c1 = np.linspace(
-            cxv_opt[g_opt:h_opt][0], cxv_opt[g_opt:h_opt][-1], 1001)
-        x_c1_ns = np.linspace(
-            cxv_opt[0], cxv_opt[-1], 1001+g_opt+(1001-h_opt))
+    x_c1 = np.linspace(
+        cxv_opt[g_opt:h_opt][0], cxv_opt[g_opt:h_opt][-1], 1001)
+    x_c1_ns = np.linspace(
+        cxv_opt[0], cxv_opt[-1], 1001+g_opt+(1001-h_opt))
 
-        calculated_battery_OCV_opt = r1(x_c1) - w1(x_a1)
+    calculated_battery_OCV_opt = r1(x_c1) - w1(x_a1)
 
-        cscalesoc = x_c1 - min(x_c1)
-        c_SOC = cscalesoc / max(cscalesoc)
+    cscalesoc = x_c1 - min(x_c1)
+    c_SOC = cscalesoc / max(cscalesoc)
 
-        cfullscalesoc = x_c1_ns - min(x_c1)
-        c_SOC_full = cfullscalesoc / max(cscalesoc)
-        ascalesoc = x_a1 - min(x_a1)
-        a_SOC = ascalesoc / max(ascalesoc)
+    cfullscalesoc = x_c1_ns - min(x_c1)
+    c_SOC_full = cfullscalesoc / max(cscalesoc)
+    ascalesoc = x_a1 - min(x_a1)
+    a_SOC = ascalesoc / max(ascalesoc)
 
-        afullscalesoc = x_a1_ns - min(x_a1)
-        a_SOC_full = afullscalesoc / max(ascalesoc)
+    afullscalesoc = x_a1_ns - min(x_a1)
+    a_SOC_full = afullscalesoc / max(ascalesoc)
 
-    result = {
-        'Best Cathode Data ID': best_cathode_data_ID,
-        'Best Anode Data ID': best_anode_data_ID,
-        'Best Parameters': best_parameters,
-        'Lowest RMSD': best_optimization_result['RMSD'],
-        'SOC_battery': SOC_battery,
-        'OCV_battery': OCV_battery,
+    return {
         'calculated_battery_OCV_opt': calculated_battery_OCV_opt,
         'c_SOC_full': c_SOC_full,
         'r1_ns_x_c1_ns': r1_ns(x_c1_ns),
@@ -297,171 +726,469 @@ def perform_full_optimization_parallel(SOC_battery, OCV_battery,
         'w1_x_a1': w1(x_a1)
     }
 
-    return result
-
 
-def perform_full_optimization_parallel_to_json_GUI(filename, SOC_battery,
-                                                   OCV_battery,
-                                                   interpolated_cathodes,
-                                                   interpolated_anodes,
-                                                   iterations=5,
-                                                   battery=1,
-                                                   derivative_inverse=0):
+def evaluate_alignment(best_parameters, cathode_info, anode_info,
+                       SOC_battery, OCV_battery, battery=1,
+                       derivative_inverse=0):
     """
-    Perform parallelized full optimization for multiple iterations
-    and find the overall best optimization result.
+    Evaluate a single electrode pair at fixed alignment indices.
+
+    Used for manual alignment, where the indices are changed by hand and
+    the curves and RMSD are recomputed without running an optimization.
 
     Parameters:
-    - filename: str
-        Name of the JSON file to write the results.
+    - best_parameters: tuple
+        Alignment indices e, f, g, h.
+    - cathode_info: dict
+        Information about the cathode,
+        including interpolated function and x values.
+    - anode_info: dict
+        Information about the anode,
+        including interpolated function and x values.
     - SOC_battery: array-like
         State of charge (SOC) values for the battery.
     - OCV_battery: array-like
         Measured battery open-circuit voltage (OCV).
-    - interpolated_cathodes: dict
-        Dictionary containing information about interpolated cathode functions.
-    - interpolated_anodes: dict
-        Dictionary containing information about interpolated anode functions.
-    - iterations: int, optional
-        Number of iterations for optimization.
     - battery, derivative_inverse: float, optional
         Weighting factors for different components of the objective function.
 
     Returns:
-    None
+    - result: dict
+        Dictionary with the same keys as the result of
+        perform_full_optimization_parallel.
     """
-    best_optimization_results = []
-
-    for iteration in range(iterations):
-        optimization_results = []
-
-        def optimize_single_case(
-                cathode_number, cathode_info, anode_number, anode_info):
-            return perform_optimization(cathode_number, cathode_info,
-                                        anode_number, anode_info, OCV_battery,
-                                        SOC_battery, battery,
-                                        derivative_inverse)
-
-        optimization_results = Parallel(n_jobs=-1)(
-            delayed(optimize_single_case)(cathode_number, cathode_info,
-                                          anode_number, anode_info)
-            for cathode_number, cathode_info in interpolated_cathodes.items()
-            for anode_number, anode_info in interpolated_anodes.items()
-        )
-
-        best_optimization_result = min(
-            optimization_results, key=lambda x: x['RMSD'])
-        best_optimization_results.append(best_optimization_result)
-
-    best_optimization_result = min(
-        best_optimization_results, key=lambda x: x['RMSD'])
-
-    best_cathode_data_ID = best_optimization_result['cathode_data_ID']
-    best_anode_data_ID = best_optimization_result['anode_data_ID']
-
-    Best_Cathode = interpolated_cathodes.get(best_cathode_data_ID)
-    Best_Anode = interpolated_anodes.get(best_anode_data_ID)
-
-    if Best_Cathode is not None and Best_Anode is not None:
-        e_percentage_opt, f_percentage_opt, g_percentage_opt, \
-            h_percentage_opt = best_optimization_result['optimized_params']
-        e_opt = int(e_percentage_opt * len(Best_Anode['x_values']) * 0.3)
-        f_opt = len(Best_Anode['x_values']) - \
-            int(f_percentage_opt * len(Best_Anode['x_values']) * 0.3)
-        g_opt = int(g_percentage_opt * len(Best_Cathode['x_values']) * 0.15)
-        h_opt = len(Best_Cathode['x_values']) - \
-            int(h_percentage_opt * len(Best_Cathode['x_values']) * 0.15)
-        best_parameters = e_opt, f_opt, g_opt, h_opt
-
-        v1 = Best_Anode['interpolated_function'](Best_Anode['x_values'])
-        axv_opt = Best_Anode['x_values']
-        w1 = interp1d(
-            axv_opt[e_opt:f_opt], v1[e_opt:f_opt],
-            kind='cubic', fill_value='extrapolate')
-        w1_ns = interp1d(
-            axv_opt, v1,
-            kind='cubic', fill_value='extrapolate')
-        x_a1 = np.linspace(
-            axv_opt[e_opt:f_opt][0], axv_opt[e_opt:f_opt][-1], 1001)
-        x_a1_ns = np.linspace(
-            axv_opt[0], axv_opt[-1], 1001+e_opt+(1001-f_opt))
-        q1 = Best_Cathode['interpolated_function'](Best_Cathode['x_values'])
-        cxv_opt = Best_Cathode['x_values']
-        r1 = interp1d(
-            cxv_opt[g_opt:h_opt], q1[g_opt:h_opt],
-            kind='cubic', fill_value='extrapolate')
-        r1_ns = interp1d(
-            cxv_opt, q1,
-            kind='cubic', fill_value='extrapolate')
-        x_c1 = np.linspace(
-            cxv_opt[g_opt:h_opt][0], cxv_opt[g_opt:h_opt][-1], 1001)
-        x_c1_ns = np.linspace(
-            cxv_opt[0], cxv_opt[-1], 1001+g_opt+(1001-h_opt))
-
-        calculated_battery_OCV_opt = r1(x_c1) - w1(x_a1)
-
-        cscalesoc = x_c1 - min(x_c1)
-        c_SOC = cscalesoc / max(cscalesoc)
-
-        cfullscalesoc = x_c1_ns - min(x_c1)
-        c_SOC_full = cfullscalesoc / max(cscalesoc)
-        ascalesoc = x_a1 - min(x_a1)
-        a_SOC = ascalesoc / max(ascalesoc)
-
-        afullscalesoc = x_a1_ns - min(x_a1)
-        a_SOC_full = afullscalesoc / max(ascalesoc)
-
-    SOC_battery_list = SOC_battery.tolist()
-    OCV_battery_list = OCV_battery.tolist()
-    calculated_battery_OCV_opt_list = calculated_battery_OCV_opt.tolist()
-    c_SOC_full_list = c_SOC_full.tolist()
-    r1_ns_x_c1_ns_list = r1_ns(x_c1_ns).tolist()
-    c_SOC_list = c_SOC.tolist()
-    r1_x_c1_list = r1(x_c1).tolist()
-    a_SOC_full_list = a_SOC_full.tolist()
-    w1_ns_x_a1_ns_list = w1_ns(x_a1_ns).tolist()
-    a_SOC_list = a_SOC.tolist()
-    w1_x_a1_list = w1(x_a1).tolist()
+    best_parameters = tuple(int(index) for index in best_parameters)
+    curves = calculate_aligned_curves(cathode_info, anode_info,
+                                      best_parameters)
 
     result = {
-        'Best Cathode Data ID': best_cathode_data_ID,
-        'Best Anode Data ID': best_anode_data_ID,
+        'Best Cathode Data ID': cathode_info['ID_number'],
+        'Best Anode Data ID': anode_info['ID_number'],
         'Best Parameters': best_parameters,
-        'Lowest RMSD': best_optimization_result['RMSD'],
-        'Battery SOC': SOC_battery_list,
-        'Battery OCV': OCV_battery_list,
-        'Calculated Battery OCV': calculated_battery_OCV_opt_list,
-        'Cathode SOC full': c_SOC_full_list,
-        'Cathode OCP full': r1_ns_x_c1_ns_list,
-        'Cathode SOC': c_SOC_list,
-        'Cathode OCP': r1_x_c1_list,
-        'Anode SOC full': a_SOC_full_list,
-        'Anode OCP full': w1_ns_x_a1_ns_list,
-        'Anode SOC': a_SOC_list,
-        'Anode OCP': w1_x_a1_list
+        'Lowest RMSD': calculate_RMSD(
+            curves['calculated_battery_OCV_opt'], OCV_battery, SOC_battery,
+            battery, derivative_inverse),
+        'SOC_battery': SOC_battery,
+        'OCV_battery': OCV_battery
     }
+    result.update(curves)
 
-    with open(filename, 'w') as f:
-        json.dump(result, f)
+    return result
 
 
-def perform_full_optimization_parallel_to_json(filename, file_location,
-                                               SOC_battery,
-                                               OCV_battery,
-                                               interpolated_cathodes,
-                                               interpolated_anodes,
-                                               iterations=5,
-                                               battery=1,
-                                               derivative_inverse=0):
+def resample_cropped_curves(half_cell_info, starts, stops, n_points=1001):
     """
-    Perform parallelized full optimization for multiple iterations
-    and find the overall best optimization result.
+    Resample many cropped windows of a half-cell curve at once.
+
+    Every window [starts, stops) is resampled to n_points equally spaced
+    points, as in optimization(). The interpolated function of the full
+    curve is evaluated instead of a new spline per window, which differs
+    from optimization() only by the edge effects of refitting the spline.
+
+    Parameters:
+    - half_cell_info: dict
+        Information about the half-cell,
+        including interpolated function and x values.
+    - starts, stops: array-like of int
+        Start and stop indices of the windows, broadcast against each other.
+    - n_points: int, optional
+        Number of resampled points per window.
+
+    Returns:
+    - numpy.ndarray: Resampled OCP values with shape
+      broadcast(starts, stops).shape + (n_points,).
+    """
+    x_values = half_cell_info['x_values']
+    x_start = x_values[np.asarray(starts)]
+    x_stop = x_values[np.asarray(stops) - 1]
+    t = np.linspace(0, 1, n_points)
+    x = x_start[..., None] + (x_stop - x_start)[..., None] * t
+    return half_cell_info['interpolated_function'](x)
+
+
+def calculate_RMSD_landscape(best_parameters, cathode_info, anode_info,
+                             SOC_battery, OCV_battery, axes=('e', 'f'),
+                             resolution=300, battery=1, derivative_inverse=0,
+                             chunk_size=16):
+    """
+    Evaluate the objective over a 2-D slice of the alignment indices.
+
+    Two of the indices e, f, g, h are varied over their search bounds while
+    the other two are kept at best_parameters. The anode and cathode windows
+    are resampled in batches and the RMSD of a whole block of grid rows is
+    computed with a single broadcast NumPy expression.
+
+    Parameters:
+    - best_parameters: tuple
+        Alignment indices e, f, g, h at the centre of the slice.
+    - cathode_info: dict
+        Information about the cathode,
+        including interpolated function and x values.
+    - anode_info: dict
+        Information about the anode,
+        including interpolated function and x values.
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - axes: tuple, optional
+        Names of the two varied indices, e.g. ('e', 'f') or ('f', 'h').
+    - resolution: int, optional
+        Maximum number of grid points along each axis.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - chunk_size: int, optional
+        Number of grid rows evaluated per batch, which bounds memory use.
+
+    Raises:
+    - ValueError: If axes does not name two different indices.
+
+    Returns:
+    - landscape: dict
+        'axes', the grid indices 'x_indices' and 'y_indices' of the two
+        axes, and 'RMSD' with shape (len(x_indices), len(y_indices)).
+    """
+    names = 'efgh'
+    if len(axes) != 2 or axes[0] == axes[1] \
+            or not all(axis in names for axis in axes):
+        raise ValueError(
+            f"axes must name two different indices out of e, f, g, h, "
+            f"got {axes}.")
+
+    anode_length = len(anode_info['x_values'])
+    cathode_length = len(cathode_info['x_values'])
+    lower = calculate_alignment_indices(
+        (0, 1, 0, 1), anode_length, cathode_length)
+    upper = calculate_alignment_indices(
+        (1, 0, 1, 0), anode_length, cathode_length)
+
+    # Grid of each index: the varied ones span their bounds (shape (n, 1)
+    # for the first axis, (1, n) for the second), the others stay fixed
+    grid = {}
+    axis_indices = []
+    for name, value, low, high in zip(names, best_parameters, lower, upper):
+        if name in axes:
+            indices = np.unique(
+                np.linspace(low, high, resolution).astype(int))
+            axis_indices.append(indices)
+            shape = (-1, 1) if name == axes[0] else (1, -1)
+            grid[name] = indices.reshape(shape)
+        else:
+            grid[name] = np.full((1, 1), int(value))
+    if names.index(axes[0]) > names.index(axes[1]):
+        axis_indices.reverse()
+
+    x_indices, y_indices = axis_indices
+    RMSD = np.empty((len(x_indices), len(y_indices)))
+    SOC_battery = np.asarray(SOC_battery)
+    OCV_battery = np.asarray(OCV_battery)
+
+    for row in range(0, len(x_indices), chunk_size):
+        rows = slice(row, row + chunk_size)
+        block = {
+            name: indices[rows] if name == axes[0] else indices
+            for name, indices in grid.items()}
+        anode_OCP = resample_cropped_curves(
+            anode_info, block['e'], block['f'], len(SOC_battery))
+        cathode_OCP = resample_cropped_curves(
+            cathode_info, block['g'], block['h'], len(SOC_battery))
+        RMSD[rows] = calculate_RMSD(
+            cathode_OCP - anode_OCP, OCV_battery, SOC_battery,
+            battery, derivative_inverse)
+
+    return {
+        'axes': tuple(axes),
+        'x_indices': x_indices,
+        'y_indices': y_indices,
+        'RMSD': RMSD
+    }
+
+
+def measure_evaluation_cost(cathode_info, anode_info, SOC_battery,
+                            OCV_battery, battery=1, derivative_inverse=0,
+                            dtype=np.float64, n_evaluations=20):
+    """
+    Measure the time of one evaluation of the objective function.
+
+    Parameters:
+    - cathode_info, anode_info: dict
+        Information about the cathode and anode,
+        including interpolated function and x values.
+    - SOC_battery, OCV_battery: array-like
+        SOC and OCV values of the battery.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - dtype: numpy.dtype, optional
+        Floating point type of the evaluations.
+    - n_evaluations: int, optional
+        Number of timed evaluations at random parameters.
+
+    Returns:
+    - float: Mean time of one evaluation, in seconds.
+    """
+    objective, args = search_objective(
+        cathode_info, anode_info, OCV_battery, SOC_battery, battery,
+        derivative_inverse, dtype)
+    params = np.random.default_rng(0).uniform(size=(n_evaluations + 1, 4))
+
+    def evaluate(params):
+        return objective(params, *args)
+
+    # The first evaluation is not timed, it may include one-off set-up costs
+    evaluate(params[0])
+    start = time.perf_counter()
+    for evaluation_params in params[1:]:
+        evaluate(evaluation_params)
+    return (time.perf_counter() - start) / n_evaluations
+
+
+def estimate_layout_times(n_tasks, evaluation_cost, n_cores):
+    """
+    Estimate the wall time of a pair search for every parallel layout.
+
+    Parameters:
+    - n_tasks: int
+        Number of cathode and anode combinations to optimize.
+    - evaluation_cost: float
+        Time of one evaluation of the objective function, in seconds.
+    - n_cores: int
+        Number of available cores.
+
+    Returns:
+    - dict: Estimated time in seconds, keyed by layout.
+    """
+    search_cost = evaluation_cost * SEARCH_EVALUATIONS
+    rounds = -(-n_tasks // n_cores)
+    threads = min(n_tasks, n_cores)
+
+    # Ordered from the least to the most overhead, which wins a tie
+    return {
+        'serial': n_tasks * search_cost,
+        'threads': n_tasks * search_cost * (
+            1 - THREAD_PARALLEL_FRACTION + THREAD_PARALLEL_FRACTION / threads),
+        'processes': rounds * search_cost + PROCESS_START_COST,
+        'workers': n_tasks * (search_cost / n_cores + PROCESS_START_COST)
+    }
+
+
+def choose_parallel_layout(n_tasks, evaluation_cost, n_cores=None):
+    """
+    Choose the parallel layout with the lowest estimated wall time.
+
+    Parameters:
+    - n_tasks: int
+        Number of cathode and anode combinations to optimize.
+    - evaluation_cost: float
+        Time of one evaluation of the objective function, in seconds.
+    - n_cores: int, optional
+        Number of available cores. By default, the cores of this machine.
+
+    Returns:
+    - str: One of PARALLEL_LAYOUTS.
+    """
+    n_cores = n_cores or cpu_count()
+    if n_cores == 1:
+        return 'serial'
+
+    times = estimate_layout_times(n_tasks, evaluation_cost, n_cores)
+    return min(times, key=times.get)
+
+
+def select_parallel_layout(SOC_battery, OCV_battery, interpolated_cathodes,
+                           interpolated_anodes, n_tasks, battery=1,
+                           derivative_inverse=0, dtype=np.float64,
+                           parallel='auto'):
+    """
+    Resolve the parallel layout of a pair search.
+
+    With parallel='auto', the cost of one evaluation is measured on the
+    first cathode and anode, and the layout is chosen with
+    choose_parallel_layout. The choice is logged.
+
+    Parameters:
+    - SOC_battery, OCV_battery: array-like
+        SOC and OCV values of the battery.
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data of the cathodes and anodes.
+    - n_tasks: int
+        Number of cathode and anode combinations to optimize.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - dtype: numpy.dtype, optional
+        Floating point type used during the search.
+    - parallel: str, optional
+        'auto' or one of PARALLEL_LAYOUTS to override the choice.
+
+    Raises:
+    - ValueError: If parallel is not 'auto' or one of PARALLEL_LAYOUTS.
+
+    Returns:
+    - str: One of PARALLEL_LAYOUTS.
+    """
+    if parallel != 'auto':
+        if parallel not in PARALLEL_LAYOUTS:
+            raise ValueError(
+                f"parallel must be 'auto' or one of {PARALLEL_LAYOUTS}, "
+                f"got '{parallel}'.")
+        logger.info("Parallel layout '%s' (override)", parallel)
+        return parallel
+
+    evaluation_cost = measure_evaluation_cost(
+        next(iter(interpolated_cathodes.values())),
+        next(iter(interpolated_anodes.values())), SOC_battery, OCV_battery,
+        battery=battery, derivative_inverse=derivative_inverse, dtype=dtype)
+    n_cores = cpu_count()
+    layout = choose_parallel_layout(n_tasks, evaluation_cost, n_cores)
+    logger.info(
+        "Parallel layout '%s' for %d combinations on %d cores "
+        "(%.2f ms per evaluation, estimated times: %s)",
+        layout, n_tasks, n_cores, 1e3 * evaluation_cost,
+        ", ".join(f"{name} {seconds:.1f} s" for name, seconds in
+                  estimate_layout_times(
+                      n_tasks, evaluation_cost, n_cores).items()))
+    return layout
+
+
+def parallel_settings(layout):
+    """
+    Settings of the joblib schedule and the solver for a parallel layout.
+
+    Parameters:
+    - layout: str
+        One of PARALLEL_LAYOUTS.
+
+    Returns:
+    - dict: 'n_jobs' and 'prefer' of the joblib.Parallel running the
+      combinations, and 'workers' of the differential evolution of every
+      combination.
+    """
+    return {
+        'n_jobs': 1 if layout in ('workers', 'serial') else -1,
+        'prefer': 'threads' if layout == 'threads' else None,
+        'workers': -1 if layout == 'workers' else 1
+    }
+
+
+def search_time_limit(deadline, n_tasks, n_jobs, rounds=1):
+    """
+    Share of the time left until a deadline for the search of one task.
+
+    Searches run in batches of the number of concurrent jobs, and the time
+    left is shared by rounds searches of every task.
+
+    Parameters:
+    - deadline: float or None
+        time.time() by which all searches must end.
+    - n_tasks: int
+        Number of searches per round.
+    - n_jobs: int
+        Number of concurrent jobs, -1 for all cores.
+    - rounds: int, optional
+        Number of rounds, including this one, that share the time left.
+
+    Returns:
+    - float or None: Seconds per search, None without a deadline.
+    """
+    if deadline is None:
+        return None
+    concurrent = min(cpu_count() if n_jobs == -1 else n_jobs, n_tasks)
+    return max(deadline - time.time(), 0) / rounds * concurrent / n_tasks
+
+
+
+def run_search_iterations(search, iterations, n_searches, deadline=None,
+                          runs=None):
+    """
+    Repeat a search of all pairs for several iterations before a deadline.
+
+    Parameters:
+    - search: callable
+        search(iteration) runs one iteration and returns the results of the
+        searches that were not skipped, each with 'cathode_data_ID',
+        'anode_data_ID', 'RMSD' and 'interrupted'.
+    - iterations: int
+        Number of iterations.
+    - n_searches: int
+        Number of results of an iteration without skipped searches.
+    - deadline: float, optional
+        time.time() after which no iteration begins.
+    - runs: list, optional
+        List to which (iteration, result) of every run is appended.
+
+    Returns:
+    - best_optimization_results: list of dict
+        Best result of every iteration run.
+    - completeness: dict
+        'complete', False if the deadline cut the search short, the number
+        of 'iterations' run, of 'interrupted' and 'skipped' runs, and the
+        (cathode ID, anode ID) pairs 'searched'.
+    """
+    best_optimization_results = []
+    completeness = {'complete': True, 'iterations': 0, 'interrupted': 0,
+                    'skipped': 0, 'searched': set()}
+    for iteration in range(iterations):
+        if deadline is not None and time.time() >= deadline:
+            break
+        optimization_results = search(iteration)
+        completeness['iterations'] += 1
+        if runs is not None:
+            runs.extend((iteration, optimization_result)
+                        for optimization_result in optimization_results)
+        completeness['skipped'] += n_searches - len(optimization_results)
+        completeness['interrupted'] += sum(
+            optimization_result['interrupted']
+            for optimization_result in optimization_results)
+        completeness['searched'].update(
+            (optimization_result['cathode_data_ID'],
+             optimization_result['anode_data_ID'])
+            for optimization_result in optimization_results)
+        if not optimization_results:
+            break
+        best_optimization_results.append(
+            min(optimization_results, key=lambda x: x['RMSD']))
+
+    completeness['complete'] = completeness['iterations'] == iterations \
+        and not completeness['interrupted'] and not completeness['skipped']
+    return best_optimization_results, completeness
+
+
+def search_completeness(completeness, n_pairs, start):
+    """
+    'Search Completeness' entry of the result of a search with a deadline.
+
+    Parameters:
+    - completeness: dict
+        Completeness returned by run_search_iterations.
+    - n_pairs: int
+        Number of (cathode ID, anode ID) pairs to search.
+    - start: float
+        time.time() at which the search began.
+
+    Returns:
+    - dict: Whether the search was 'Complete', the number of 'Pairs' and
+      'Pairs Searched', the 'Iterations' run, the 'Interrupted Runs' and
+      'Skipped Runs', and the 'Seconds' taken.
+    """
+    return {
+        'Complete': completeness['complete'],
+        'Pairs': n_pairs,
+        'Pairs Searched': len(completeness['searched']),
+        'Iterations': completeness['iterations'],
+        'Interrupted Runs': completeness['interrupted'],
+        'Skipped Runs': completeness['skipped'],
+        'Seconds': time.time() - start
+    }
+
+
+def perform_pair_search(SOC_battery, OCV_battery, interpolated_cathodes,
+                        interpolated_anodes, battery=1, derivative_inverse=0,
+                        dtype=np.float64, seed=None, pairs=None,
+                        parallel='auto', deadline=None, rounds=1,
+                        broadcast=None, **kwargs):
+    """
+    Optimize every cathode and anode combination once, in parallel.
 
     Parameters:
-    - filename: str
-        Name of the JSON file to write the results.
-    - file_location: str
-        Location where the JSON file will be saved.
     - SOC_battery: array-like
         State of charge (SOC) values for the battery.
     - OCV_battery: array-like
@@ -470,36 +1197,372 @@ def perform_full_optimization_parallel_to_json(filename, file_location,
         Dictionary containing information about interpolated cathode functions.
     - interpolated_anodes: dict
         Dictionary containing information about interpolated anode functions.
-    - iterations: int, optional
-        Number of iterations for optimization.
     - battery, derivative_inverse: float, optional
         Weighting factors for different components of the objective function.
+    - dtype: numpy.dtype, optional
+        Floating point type used during the search (see optimization()).
+    - seed: int, optional
+        Seed of the differential evolution of every combination.
+    - pairs: list of tuple, optional
+        (cathode ID, anode ID) combinations to optimize.
+        By default, every cathode is combined with every anode.
+    - parallel: str, optional
+        Parallel layout, 'auto' or one of PARALLEL_LAYOUTS
+        (see select_parallel_layout).
+    - deadline: float, optional
+        time.time() by which the search must end. Every combination gets
+        an equal share of the time left, divided by rounds, and
+        combinations not started by the deadline are skipped.
+    - rounds: int, optional
+        Number of searches, including this one, that share the time left.
+    - broadcast: str, optional
+        'anode' to search all anodes at once per cathode, 'cathode' all
+        cathodes at once per anode (see broadcast.py). Only the best pair
+        of every fixed half-cell is then returned, and the options of
+        perform_optimization in kwargs must keep their defaults.
+    - **kwargs:
+        Further keyword arguments passed to perform_optimization.
+
+    Raises:
+    - ValueError: If parallel is unknown, or broadcast is combined with an
+      option of perform_optimization it does not support.
 
     Returns:
-    None
+    - optimization_results: list of dict
+        Result of perform_optimization for every combination that was not
+        skipped.
     """
-    best_optimization_results = []
+    if pairs is None:
+        pairs = [(cathode_number, anode_number)
+                 for cathode_number in interpolated_cathodes
+                 for anode_number in interpolated_anodes]
+
+    if parallel == 'auto':
+        parallel = select_parallel_layout(
+            SOC_battery, OCV_battery, interpolated_cathodes,
+            interpolated_anodes, len(pairs), battery=battery,
+            derivative_inverse=derivative_inverse, dtype=dtype)
+    elif parallel not in PARALLEL_LAYOUTS:
+        raise ValueError(
+            f"parallel must be 'auto' or one of {PARALLEL_LAYOUTS}, "
+            f"got '{parallel}'.")
+
+    settings = parallel_settings(parallel)
+    n_jobs, workers, prefer = \
+        settings['n_jobs'], settings['workers'], settings['prefer']
+
+    n_tasks = len(pairs)
+    if broadcast is not None:
+        defaults = inspect.signature(perform_optimization).parameters
+        unsupported = [name for name, value in kwargs.items()
+                       if value != defaults[name].default]
+        if unsupported:
+            raise ValueError(
+                "broadcast does not support "
+                f"{', '.join(sorted(unsupported))}.")
+        # One search per fixed half-cell
+        n_tasks = len({pair[0] if broadcast == 'anode' else pair[1]
+                       for pair in pairs})
+
+    time_limit = search_time_limit(deadline, n_tasks, n_jobs, rounds)
+
+    if broadcast is not None:
+        try:
+            from .broadcast import perform_broadcast_pair_search
+        except ImportError:
+            # Imported as a top-level module, as GUI.py does
+            from broadcast import perform_broadcast_pair_search
+        return perform_broadcast_pair_search(
+            SOC_battery, OCV_battery, interpolated_cathodes,
+            interpolated_anodes, pairs, battery=battery,
+            derivative_inverse=derivative_inverse, broadcast=broadcast,
+            dtype=dtype, seed=seed, n_jobs=n_jobs, prefer=prefer,
+            deadline=deadline, time_limit=time_limit)
+
+    optimization_results = Parallel(n_jobs=n_jobs, prefer=prefer)(
+        delayed(perform_optimization)(cathode_number,
+                                      interpolated_cathodes[cathode_number],
+                                      anode_number,
+                                      interpolated_anodes[anode_number],
+                                      OCV_battery, SOC_battery, battery,
+                                      derivative_inverse, dtype=dtype,
+                                      seed=seed, workers=workers,
+                                      deadline=deadline,
+                                      time_limit=time_limit, **kwargs)
+        for cathode_number, anode_number in pairs
+    )
+    return [optimization_result
+            for optimization_result in optimization_results
+            if optimization_result is not None]
+
+
+def perform_adaptive_pair_search(SOC_battery, OCV_battery,
+                                 interpolated_cathodes, interpolated_anodes,
+                                 max_restarts=5, tolerance=1e-5,
+                                 stable_restarts=2, battery=1,
+                                 derivative_inverse=0, dtype=np.float64,
+                                 pairs=None, deadline=None, history=None,
+                                 **kwargs):
+    """
+    Restart the pair search only for combinations that have not converged.
 
-    for iteration in range(iterations):
-        optimization_results = []
-
-        def optimize_single_case(
-                cathode_number, cathode_info, anode_number, anode_info):
-            return perform_optimization(cathode_number, cathode_info,
-                                        anode_number, anode_info, OCV_battery,
-                                        SOC_battery, battery,
-                                        derivative_inverse)
-
-        optimization_results = Parallel(n_jobs=-1)(
-            delayed(optimize_single_case)(cathode_number, cathode_info,
-                                          anode_number, anode_info)
-            for cathode_number, cathode_info in interpolated_cathodes.items()
-            for anode_number, anode_info in interpolated_anodes.items()
-        )
+    A restart agrees with the best result of its combination if it does not
+    improve the RMSD by more than the tolerance and, when it reaches the
+    same RMSD, finds the same alignment indices. A combination is converged
+    once stable_restarts restarts agree with its best result; only the other
+    combinations are restarted. The search stops as soon as the overall best
+    combination and indices stay the same for stable_restarts rounds, or
+    when no combination is left to restart.
 
-        best_optimization_result = min(
-            optimization_results, key=lambda x: x['RMSD'])
-        best_optimization_results.append(best_optimization_result)
+    Parameters:
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - interpolated_cathodes: dict
+        Dictionary containing information about interpolated cathode functions.
+    - interpolated_anodes: dict
+        Dictionary containing information about interpolated anode functions.
+    - max_restarts: int, optional
+        Maximum number of restarts per combination.
+    - tolerance: float, optional
+        RMSD change below which two results are considered the same.
+    - stable_restarts: int, optional
+        Number of agreeing restarts required for convergence.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - dtype: numpy.dtype, optional
+        Floating point type used during the search (see optimization()).
+    - pairs: list of tuple, optional
+        (cathode ID, anode ID) combinations to optimize.
+        By default, every cathode is combined with every anode.
+    - deadline: float, optional
+        time.time() by which the search must end. The time left is shared
+        by the restarts still possible, and no restart begins after it.
+    - history: list, optional
+        List to which (round, result) of every run is appended.
+    - **kwargs:
+        Further keyword arguments passed to perform_optimization.
+
+    Raises:
+    - ValueError: If kwargs select a broadcast search, which does not
+      return every combination.
+
+    Returns:
+    - best_optimization_results: dict
+        Best result of perform_optimization per (cathode ID, anode ID).
+    - restarts: dict
+        Number of restarts used per (cathode ID, anode ID).
+    - completeness: dict
+        'rounds' of restarts run, 'interrupted' and 'skipped' runs, and
+        'converged', False if the deadline ended the search.
+    """
+    def indices(optimization_result):
+        return calculate_alignment_indices(
+            optimization_result['optimized_params'],
+            len(interpolated_anodes[
+                optimization_result['anode_data_ID']]['x_values']),
+            len(interpolated_cathodes[
+                optimization_result['cathode_data_ID']]['x_values']))
+
+    if kwargs.get('broadcast') is not None:
+        raise ValueError(
+            "The adaptive search cannot be combined with broadcast.")
+
+    if pairs is None:
+        pairs = [(cathode_number, anode_number)
+                 for cathode_number in interpolated_cathodes
+                 for anode_number in interpolated_anodes]
+    best_optimization_results = {}
+    restarts = dict.fromkeys(pairs, 0)
+    agreeing = dict.fromkeys(pairs, 0)
+    top, top_rounds = None, 0
+    completeness = {'rounds': 0, 'interrupted': 0, 'skipped': 0,
+                    'converged': True}
+
+    active = pairs
+    while active:
+        if deadline is not None and time.time() >= deadline:
+            completeness['converged'] = False
+            break
+        optimization_results = perform_pair_search(
+            SOC_battery, OCV_battery, interpolated_cathodes,
+            interpolated_anodes, battery=battery,
+            derivative_inverse=derivative_inverse, dtype=dtype,
+            pairs=active, deadline=deadline,
+            rounds=max_restarts - min(restarts[pair] for pair in active),
+            **kwargs)
+        completeness['rounds'] += 1
+        completeness['skipped'] += len(active) - len(optimization_results)
+        completeness['interrupted'] += sum(
+            optimization_result['interrupted']
+            for optimization_result in optimization_results)
+        if history is not None:
+            history.extend((completeness['rounds'] - 1, optimization_result)
+                           for optimization_result in optimization_results)
+        if not best_optimization_results and not optimization_results:
+            break
+
+        for optimization_result in optimization_results:
+            pair = (optimization_result['cathode_data_ID'],
+                    optimization_result['anode_data_ID'])
+            restarts[pair] += 1
+            best = best_optimization_results.get(pair)
+
+            if best is None:
+                changed = True
+            elif best['RMSD'] - optimization_result['RMSD'] > tolerance:
+                changed = True
+            else:
+                changed = abs(best['RMSD'] - optimization_result['RMSD']) \
+                    <= tolerance \
+                    and indices(best) != indices(optimization_result)
+
+            if best is None or optimization_result['RMSD'] < best['RMSD']:
+                best_optimization_results[pair] = optimization_result
+            agreeing[pair] = 1 if changed else agreeing[pair] + 1
+
+        best = min(best_optimization_results.values(),
+                   key=lambda x: x['RMSD'])
+        new_top = (best['cathode_data_ID'], best['anode_data_ID'],
+                   indices(best))
+        top_rounds = top_rounds + 1 if new_top == top else 1
+        top = new_top
+        if top_rounds >= stable_restarts:
+            break
+
+        active = [pair for pair in active
+                  if agreeing[pair] < stable_restarts
+                  and restarts[pair] < max_restarts]
+
+    return best_optimization_results, restarts, completeness
+
+
+def perform_full_optimization_parallel(SOC_battery, OCV_battery,
+                                       interpolated_cathodes,
+                                       interpolated_anodes, iterations=5,
+                                       battery=1, derivative_inverse=0,
+                                       dtype=np.float64, adaptive=False,
+                                       tolerance=1e-5, stable_restarts=2,
+                                       parallel='auto', pairs=None,
+                                       time_budget=None, deadline=None,
+                                       **kwargs):
+    """
+    Perform parallelized full optimization for multiple iterations
+    and find the overall best optimization result.
+
+    Parameters:
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - interpolated_cathodes: dict
+        Dictionary containing information about interpolated cathode functions.
+    - interpolated_anodes: dict
+        Dictionary containing information about interpolated anode functions.
+    - iterations: int, optional
+        Number of iterations for optimization. With adaptive restarts,
+        the maximum number of restarts per combination.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - dtype: numpy.dtype, optional
+        Floating point type used during the search (see optimization()).
+        The RMSD and curves of the result are always in double precision.
+    - adaptive: bool, optional
+        Restart only combinations that have not converged and stop once the
+        best result is stable (see perform_adaptive_pair_search).
+    - tolerance, stable_restarts: optional
+        Convergence settings of the adaptive restarts.
+    - parallel: str, optional
+        Parallel layout, 'auto' or one of PARALLEL_LAYOUTS. With 'auto', the
+        layout is chosen once from the number of combinations, the number
+        of cores and the measured cost of one evaluation.
+    - pairs: list of tuple, optional
+        (cathode ID, anode ID) combinations to optimize, e.g. from
+        library.filter_pairs. By default, every cathode is combined with
+        every anode.
+    - time_budget: float, optional
+        Seconds within which the search must return. The time is shared
+        by the iterations and the combinations; the differential evolution
+        of a combination is stopped when its share is used, and searches
+        not started when the budget runs out are skipped. The best result
+        found so far is returned.
+    - deadline: float, optional
+        time.time() by which the search must return, instead of a
+        time_budget, e.g. to share one budget between several stages.
+    - **kwargs:
+        Further keyword arguments passed to perform_optimization,
+        e.g. initializer='features'.
+
+    Raises:
+    - ValueError: If the time budget is not positive, or ran out before
+      any combination was searched.
+
+    Returns:
+    - result: dict
+        Dictionary containing optimization results and plots. With adaptive
+        restarts, 'Restarts per pair' holds the number of restarts used per
+        (cathode ID, anode ID). 'Parallel Layout' is the layout used.
+        'Results Table' is a results_table.ResultsTable with the outcome of
+        every run of every pair, for rankings and restart statistics. With
+        a time budget or deadline, 'Search Completeness' holds whether the
+        search was 'Complete', the number of 'Pairs' and 'Pairs Searched',
+        the 'Iterations' (or rounds of restarts) run, the 'Interrupted
+        Runs' and 'Skipped Runs', and the 'Seconds' taken.
+    """
+    runs = []
+
+    start = time.time()
+    if time_budget is not None:
+        if time_budget <= 0:
+            raise ValueError("time_budget must be positive.")
+        deadline = start + time_budget
+
+    if pairs is None:
+        pairs = [(cathode_number, anode_number)
+                 for cathode_number in interpolated_cathodes
+                 for anode_number in interpolated_anodes]
+
+    parallel = select_parallel_layout(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        len(pairs),
+        battery=battery, derivative_inverse=derivative_inverse, dtype=dtype,
+        parallel=parallel)
+
+    if adaptive:
+        best_per_pair, restarts, completeness = perform_adaptive_pair_search(
+            SOC_battery, OCV_battery, interpolated_cathodes,
+            interpolated_anodes, max_restarts=iterations,
+            tolerance=tolerance, stable_restarts=stable_restarts,
+            battery=battery, derivative_inverse=derivative_inverse,
+            dtype=dtype, parallel=parallel, pairs=pairs, deadline=deadline,
+            history=runs, **kwargs)
+        best_optimization_results = list(best_per_pair.values())
+        completeness = {
+            'complete': completeness['converged']
+            and not completeness['interrupted']
+            and not completeness['skipped'],
+            'iterations': completeness['rounds'],
+            'interrupted': completeness['interrupted'],
+            'skipped': completeness['skipped'],
+            'searched': set(best_per_pair)}
+    else:
+        # A broadcast search returns one result per fixed half-cell
+        broadcast = kwargs.get('broadcast')
+        n_searches = len(pairs) if broadcast is None else len(
+            {pair[0] if broadcast == 'anode' else pair[1] for pair in pairs})
+        best_optimization_results, completeness = run_search_iterations(
+            lambda iteration: perform_pair_search(
+                SOC_battery, OCV_battery, interpolated_cathodes,
+                interpolated_anodes, battery=battery,
+                derivative_inverse=derivative_inverse, dtype=dtype,
+                parallel=parallel, pairs=pairs, deadline=deadline,
+                rounds=iterations - iteration, **kwargs),
+            iterations, n_searches, deadline=deadline, runs=runs)
+
+    if not best_optimization_results:
+        raise TimeBudgetExceeded(
+            "The time budget ran out before any combination was searched.")
 
     best_optimization_result = min(
         best_optimization_results, key=lambda x: x['RMSD'])
@@ -510,84 +1573,328 @@ def perform_full_optimization_parallel_to_json(filename, file_location,
     Best_Cathode = interpolated_cathodes.get(best_cathode_data_ID)
     Best_Anode = interpolated_anodes.get(best_anode_data_ID)
 
-    if Best_Cathode is not None and Best_Anode is not None:
-        e_percentage_opt, f_percentage_opt, g_percentage_opt, \
-            h_percentage_opt = best_optimization_result['optimized_params']
-        e_opt = int(e_percentage_opt * len(Best_Anode['x_values']) * 0.3)
-        f_opt = len(Best_Anode['x_values']) - \
-            int(f_percentage_opt * len(Best_Anode['x_values']) * 0.3)
-        g_opt = int(g_percentage_opt * len(Best_Cathode['x_values']) * 0.15)
-        h_opt = len(Best_Cathode['x_values']) - \
-            int(h_percentage_opt * len(Best_Cathode['x_values']) * 0.15)
-        best_parameters = e_opt, f_opt, g_opt, h_opt
-
-        v1 = Best_Anode['interpolated_function'](Best_Anode['x_values'])
-        axv_opt = Best_Anode['x_values']
-        w1 = interp1d(
-            axv_opt[e_opt:f_opt], v1[e_opt:f_opt],
-            kind='cubic', fill_value='extrapolate')
-        w1_ns = interp1d(
-            axv_opt, v1,
-            kind='cubic', fill_value='extrapolate')
-        x_a1 = np.linspace(
-            axv_opt[e_opt:f_opt][0], axv_opt[e_opt:f_opt][-1], 1001)
-        x_a1_ns = np.linspace(
-            axv_opt[0], axv_opt[-1], 1001+e_opt+(1001-f_opt))
-        q1 = Best_Cathode['interpolated_function'](Best_Cathode['x_values'])
-        cxv_opt = Best_Cathode['x_values']
-        r1 = interp1d(
-            cxv_opt[g_opt:h_opt], q1[g_opt:h_opt],
-            kind='cubic', fill_value='extrapolate')
-        r1_ns = interp1d(
-            cxv_opt, q1,
-            kind='cubic', fill_value='extrapolate')
-        x_c1 = np.linspace(
-            cxv_opt[g_opt:h_opt][0], cxv_opt[g_opt:h_opt][-1], 1001)
-        x_c1_ns = np.linspace(
-            cxv_opt[0], cxv_opt[-1], 1001+g_opt+(1001-h_opt))
-
-        calculated_battery_OCV_opt = r1(x_c1) - w1(x_a1)
-
-        cscalesoc = x_c1 - min(x_c1)
-        c_SOC = cscalesoc / max(cscalesoc)
-
-        cfullscalesoc = x_c1_ns - min(x_c1)
-        c_SOC_full = cfullscalesoc / max(cscalesoc)
-        ascalesoc = x_a1 - min(x_a1)
-        a_SOC = ascalesoc / max(ascalesoc)
-
-        afullscalesoc = x_a1_ns - min(x_a1)
-        a_SOC_full = afullscalesoc / max(ascalesoc)
-
-    SOC_battery_list = SOC_battery.tolist()
-    OCV_battery_list = OCV_battery.tolist()
-    calculated_battery_OCV_opt_list = calculated_battery_OCV_opt.tolist()
-    c_SOC_full_list = c_SOC_full.tolist()
-    r1_ns_x_c1_ns_list = r1_ns(x_c1_ns).tolist()
-    c_SOC_list = c_SOC.tolist()
-    r1_x_c1_list = r1(x_c1).tolist()
-    a_SOC_full_list = a_SOC_full.tolist()
-    w1_ns_x_a1_ns_list = w1_ns(x_a1_ns).tolist()
-    a_SOC_list = a_SOC.tolist()
-    w1_x_a1_list = w1(x_a1).tolist()
+    best_parameters = calculate_alignment_indices(
+        best_optimization_result['optimized_params'],
+        len(Best_Anode['x_values']), len(Best_Cathode['x_values']))
 
     result = {
         'Best Cathode Data ID': best_cathode_data_ID,
         'Best Anode Data ID': best_anode_data_ID,
         'Best Parameters': best_parameters,
         'Lowest RMSD': best_optimization_result['RMSD'],
-        'SOC_battery': SOC_battery_list,
-        'OCV_battery': OCV_battery_list,
-        'calculated_battery_OCV_opt': calculated_battery_OCV_opt_list,
-        'c_SOC_full': c_SOC_full_list,
-        'r1_ns_x_c1_ns': r1_ns_x_c1_ns_list,
-        'c_SOC': c_SOC_list,
-        'r1_x_c1': r1_x_c1_list,
-        'a_SOC_full': a_SOC_full_list,
-        'w1_ns_x_a1_ns': w1_ns_x_a1_ns_list,
-        'a_SOC': a_SOC_list,
-        'w1_x_a1': w1_x_a1_list
+        'SOC_battery': SOC_battery,
+        'OCV_battery': OCV_battery,
+        'Parallel Layout': parallel
+    }
+    if adaptive:
+        result['Restarts per pair'] = restarts
+    try:
+        from .results_table import ResultsTable
+    except ImportError:
+        # Imported as a top-level module, as GUI.py does
+        from results_table import ResultsTable
+    result['Results Table'] = ResultsTable.from_runs(
+        runs, interpolated_cathodes, interpolated_anodes)
+    if deadline is not None:
+        result['Search Completeness'] = search_completeness(
+            completeness, len(pairs), start)
+    result.update(
+        calculate_aligned_curves(Best_Cathode, Best_Anode, best_parameters))
+
+    return result
+
+
+def validate_single_precision(SOC_battery, OCV_battery, interpolated_cathodes,
+                              interpolated_anodes, battery=1,
+                              derivative_inverse=0, seed=0):
+    """
+    Check that a single precision search selects the same result.
+
+    The pair search is run once in double and once in single precision,
+    with the same seed, and the selected pairs and alignment indices are
+    compared.
+
+    Parameters:
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - interpolated_cathodes: dict
+        Dictionary containing information about interpolated cathode functions.
+    - interpolated_anodes: dict
+        Dictionary containing information about interpolated anode functions.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - seed: int, optional
+        Seed of the differential evolution of both searches.
+
+    Returns:
+    - validation: dict
+        'same_pair' and 'same_parameters' flags, the best pair and
+        parameters of both searches, and their RMSD in double precision.
+    """
+    best = {}
+    for dtype in (np.float64, np.float32):
+        optimization_results = perform_pair_search(
+            SOC_battery, OCV_battery, interpolated_cathodes,
+            interpolated_anodes, battery=battery,
+            derivative_inverse=derivative_inverse, dtype=dtype, seed=seed)
+        best_optimization_result = min(
+            optimization_results, key=lambda x: x['RMSD'])
+
+        cathode_ID = best_optimization_result['cathode_data_ID']
+        anode_ID = best_optimization_result['anode_data_ID']
+        best[np.dtype(dtype).name] = {
+            'pair': (cathode_ID, anode_ID),
+            'parameters': calculate_alignment_indices(
+                best_optimization_result['optimized_params'],
+                len(interpolated_anodes[anode_ID]['x_values']),
+                len(interpolated_cathodes[cathode_ID]['x_values'])),
+            'RMSD': best_optimization_result['RMSD']
+        }
+
+    return {
+        'same_pair': best['float64']['pair'] == best['float32']['pair'],
+        'same_parameters':
+            best['float64']['parameters'] == best['float32']['parameters'],
+        'float64': best['float64'],
+        'float32': best['float32']
     }
 
-    with open(file_location + '/' + filename, 'w') as f:
-        json.dump(result, f)
+
+# Labels used for the result keys in JSON files saved from the GUI
+GUI_JSON_KEYS = {
+    'SOC_battery': 'Battery SOC',
+    'OCV_battery': 'Battery OCV',
+    'calculated_battery_OCV_opt': 'Calculated Battery OCV',
+    'c_SOC_full': 'Cathode SOC full',
+    'r1_ns_x_c1_ns': 'Cathode OCP full',
+    'c_SOC': 'Cathode SOC',
+    'r1_x_c1': 'Cathode OCP',
+    'a_SOC_full': 'Anode SOC full',
+    'w1_ns_x_a1_ns': 'Anode OCP full',
+    'a_SOC': 'Anode SOC',
+    'w1_x_a1': 'Anode OCP'
+}
+
+RESULT_SUMMARY_KEYS = ('Best Cathode Data ID', 'Best Anode Data ID',
+                       'Best Parameters', 'Lowest RMSD')
+
+
+def result_to_json_data(result, keys=None):
+    """
+    Convert an optimization result to JSON serializable data.
+
+    Parameters:
+    - result: dict
+        Result returned by perform_full_optimization_parallel.
+    - keys: dict, optional
+        Mapping from result keys to the labels used in the data.
+        By default, the result keys are used unchanged.
+
+    Returns:
+    - dict: The summary and curves of the result, with lists for arrays.
+    """
+    keys = keys or {}
+    data = {key: result[key] for key in RESULT_SUMMARY_KEYS}
+    for key in GUI_JSON_KEYS:
+        data[keys.get(key, key)] = np.asarray(result[key]).tolist()
+    return data
+
+
+def save_result_to_json(result, filename, keys=None):
+    """
+    Write an optimization result to a JSON file.
+
+    Parameters:
+    - result: dict
+        Result returned by perform_full_optimization_parallel.
+    - filename: str
+        Path of the JSON file to write.
+    - keys: dict, optional
+        Mapping from result keys to the labels used in the file.
+        By default, the result keys are used unchanged.
+
+    Returns:
+    None
+    """
+    with open(filename, 'w') as f:
+        json.dump(result_to_json_data(result, keys), f)
+
+
+# Extensions of the result files read by load_result
+RESULT_FILE_EXTENSIONS = ('.json', '.npz')
+
+
+def save_result_to_npz(result, filename):
+    """
+    Write an optimization result to a compressed NumPy file.
+
+    The curves are stored as binary arrays, so the file is smaller and
+    loads faster than the JSON file of save_result_to_json.
+
+    Parameters:
+    - result: dict
+        Result returned by perform_full_optimization_parallel.
+    - filename: str
+        Path of the .npz file to write.
+
+    Returns:
+    None
+    """
+    arrays = {key: np.asarray(result[key]) for key in RESULT_SUMMARY_KEYS}
+    for key in GUI_JSON_KEYS:
+        arrays[key] = np.asarray(result[key], dtype=np.float64)
+    np.savez_compressed(filename, **arrays)
+
+
+def load_result(filename):
+    """
+    Load a result saved by save_result_to_json or save_result_to_npz.
+
+    JSON files saved from the GUI, with the labels of GUI_JSON_KEYS, are
+    read too. The curves are returned as arrays under the keys of the
+    result of perform_full_optimization_parallel, so the result can be
+    plotted again without recomputing it.
+
+    Parameters:
+    - filename: str
+        Path of a .json or .npz result file.
+
+    Returns:
+    - dict: The summary (RESULT_SUMMARY_KEYS) and curves of the result.
+
+    Raises:
+    - ValueError: If the file is neither .json nor .npz, or is not a
+      saved decomposition result.
+    """
+    if filename.endswith('.json'):
+        with open(filename) as f:
+            data = json.load(f)
+    elif filename.endswith('.npz'):
+        with np.load(filename) as arrays:
+            data = {key: arrays[key] for key in arrays.files}
+    else:
+        raise ValueError(
+            f"Results must be .json or .npz files, got '{filename}'.")
+
+    result = {}
+    for key in RESULT_SUMMARY_KEYS + tuple(GUI_JSON_KEYS):
+        # Files saved from the GUI use the labels instead of the keys
+        label = GUI_JSON_KEYS.get(key, key)
+        value = data.get(key, data.get(label))
+        if value is None:
+            raise ValueError(
+                f"'{filename}' is not a decomposition result: "
+                f"'{key}' is missing.")
+        result[key] = value
+
+    result['Best Cathode Data ID'] = str(result['Best Cathode Data ID'])
+    result['Best Anode Data ID'] = str(result['Best Anode Data ID'])
+    result['Best Parameters'] = tuple(
+        int(index) for index in result['Best Parameters'])
+    result['Lowest RMSD'] = float(result['Lowest RMSD'])
+    for key in GUI_JSON_KEYS:
+        result[key] = np.asarray(result[key], dtype=np.float64)
+    return result
+
+
+def list_result_files(directory):
+    """
+    Result files of a directory, by name.
+
+    Only the directory is listed; no file is opened, so a directory of
+    many results is browsed by loading each one with load_result when it
+    is shown.
+
+    Parameters:
+    - directory: str
+        Directory to list.
+
+    Returns:
+    - list of str: Paths of the files with an extension of
+      RESULT_FILE_EXTENSIONS.
+    """
+    with os.scandir(directory) as entries:
+        return sorted(entry.path for entry in entries
+                      if entry.is_file()
+                      and entry.name.endswith(RESULT_FILE_EXTENSIONS))
+
+
+def perform_full_optimization_parallel_to_json_GUI(filename, SOC_battery,
+                                                   OCV_battery,
+                                                   interpolated_cathodes,
+                                                   interpolated_anodes,
+                                                   iterations=5,
+                                                   battery=1,
+                                                   derivative_inverse=0):
+    """
+    Perform parallelized full optimization for multiple iterations
+    and find the overall best optimization result.
+
+    Parameters:
+    - filename: str
+        Name of the JSON file to write the results.
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - interpolated_cathodes: dict
+        Dictionary containing information about interpolated cathode functions.
+    - interpolated_anodes: dict
+        Dictionary containing information about interpolated anode functions.
+    - iterations: int, optional
+        Number of iterations for optimization.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+
+    Returns:
+    None
+    """
+    result = perform_full_optimization_parallel(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        iterations=iterations, battery=battery,
+        derivative_inverse=derivative_inverse)
+
+    save_result_to_json(result, filename, keys=GUI_JSON_KEYS)
+
+
+def perform_full_optimization_parallel_to_json(filename, file_location,
+                                               SOC_battery,
+                                               OCV_battery,
+                                               interpolated_cathodes,
+                                               interpolated_anodes,
+                                               iterations=5,
+                                               battery=1,
+                                               derivative_inverse=0):
+    """
+    Perform parallelized full optimization for multiple iterations
+    and find the overall best optimization result.
+
+    Parameters:
+    - filename: str
+        Name of the JSON file to write the results.
+    - file_location: str
+        Location where the JSON file will be saved.
+    - SOC_battery: array-like
+        State of charge (SOC) values for the battery.
+    - OCV_battery: array-like
+        Measured battery open-circuit voltage (OCV).
+    - interpolated_cathodes: dict
+        Dictionary containing information about interpolated cathode functions.
+    - interpolated_anodes: dict
+        Dictionary containing information about interpolated anode functions.
+    - iterations: int, optional
+        Number of iterations for optimization.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+
+    Returns:
+    None
+    """
+    result = perform_full_optimization_parallel(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        iterations=iterations, battery=battery,
+        derivative_inverse=derivative_inverse)
+
+    save_result_to_json(result, file_location + '/' + filename)
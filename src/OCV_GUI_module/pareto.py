@@ -0,0 +1,352 @@
+"""
+Pareto fronts of the OCV and dQ/dV terms of the objective.
+
+The objective of optimization() is a weighted sum of two RMSD terms,
+
+    battery * OCV_term + derivative_inverse * derivative_term,
+
+so every change of the weights used to need a full new run. Here, the
+searches of a pair record both terms of every evaluated alignment and
+keep the alignments that no other one beats in both terms (the Pareto
+front). The best pair and alignment for any weights, or a whole sweep of
+weights, is then read from the fronts without evaluating the objective
+again.
+
+Every pair is searched once per weight of SEARCH_WEIGHTS, the two single
+terms and their sum, and all evaluations are pooled. A run therefore costs
+as many full searches per pair as there are search weights, three times a
+single-weight run by default. The result is exact for the search weights
+and an approximation between them, which improves with more search
+weights.
+
+The pairs are spread over the cores with the layouts of
+optimization_functions.select_parallel_layout, except that the population
+of a search is never spread over processes ('workers'): the evaluations
+must be recorded in the process running the search, so 'workers' runs one
+process per pair instead.
+"""
+import logging
+
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.optimize import differential_evolution
+
+from .optimization_functions import (
+    calculate_aligned_curves, calculate_alignment_indices,
+    calculate_battery_OCV, calculate_battery_OCV_derivative,
+    calculate_RMSD_terms, parallel_settings, select_parallel_layout)
+from .solvers import get_solver
+
+logger = logging.getLogger(__name__)
+
+# (battery, derivative_inverse) weights of the searches run for every pair
+SEARCH_WEIGHTS = ((1, 0), (1, 1), (0, 1))
+
+
+class TermRecorder:
+    """
+    Objective recording the OCV and dQ/dV terms of every evaluation.
+
+    Parameters:
+    - cathode_info, anode_info (dict): Half-cell data of the pair.
+    - SOC_battery, OCV_battery (array-like): SOC and OCV of the battery.
+    """
+
+    def __init__(self, cathode_info, anode_info, SOC_battery, OCV_battery):
+        self.cathode_info = cathode_info
+        self.anode_info = anode_info
+        self.SOC_battery = np.asarray(SOC_battery)
+        self.OCV_battery = np.asarray(OCV_battery)
+        self.params = []
+        self.terms = []
+
+    def __call__(self, params, battery=1, derivative_inverse=0):
+        functions = (self.anode_info['interpolated_function'],
+                     self.anode_info['x_values'],
+                     self.cathode_info['interpolated_function'],
+                     self.cathode_info['x_values'])
+        terms = calculate_RMSD_terms(
+            calculate_battery_OCV(params, *functions), self.OCV_battery,
+            self.SOC_battery,
+            calculate_battery_OCV_derivative(params, *functions))
+        self.params.append(np.array(params))
+        self.terms.append(terms)
+        return battery * terms[0] + derivative_inverse * terms[1]
+
+
+def nondominated_terms(terms):
+    """
+    Indices of the points not dominated in both terms.
+
+    Parameters:
+    - terms (array-like): OCV and dQ/dV terms, one row per point.
+
+    Returns:
+    - numpy.ndarray: Indices of the front, by increasing OCV term.
+    """
+    terms = np.asarray(terms)
+    order = np.lexsort((terms[:, 1], terms[:, 0]))
+    derivative_terms = terms[order, 1]
+    # A point is on the front if its dQ/dV term is below the one of every
+    # point with a lower (or equal) OCV term
+    lowest_before = np.concatenate(
+        ([np.inf], np.minimum.accumulate(derivative_terms)[:-1]))
+    return order[derivative_terms < lowest_before]
+
+
+def perform_pareto_optimization(cathode_number, cathode_info, anode_number,
+                                anode_info, OCV_battery, SOC_battery,
+                                search_weights=SEARCH_WEIGHTS, seed=None,
+                                solver='differential_evolution',
+                                solver_options=None):
+    """
+    Pareto front of the OCV and dQ/dV terms for a cathode and anode pair.
+
+    Parameters:
+    - cathode_number, anode_number: str
+        Identifiers for the cathode and anode data.
+    - cathode_info, anode_info: dict
+        Information about the cathode and anode,
+        including interpolated function and x values.
+    - OCV_battery, SOC_battery: array-like
+        OCV and SOC values of the battery.
+    - search_weights: tuple, optional
+        (battery, derivative_inverse) weights, one search per weight.
+    - seed: int, optional
+        Seed of the solver.
+    - solver: str, optional
+        Name of a solver registered in solvers.SOLVERS.
+    - solver_options: dict, optional
+        popsize, tol and maxiter of the solver.
+
+    Returns:
+    - front: dict
+        Cathode and anode data IDs, 'params' with the e, f, g, h
+        percentages of the front (one row per point), 'terms' with their
+        OCV and dQ/dV terms and 'nfev', the number of evaluations.
+    """
+    recorder = TermRecorder(cathode_info, anode_info, SOC_battery,
+                            OCV_battery)
+    for battery, derivative_inverse in search_weights:
+        if solver == 'differential_evolution':
+            differential_evolution(recorder, [(0, 1)] * 4,
+                                   args=(battery, derivative_inverse),
+                                   seed=seed, **(solver_options or {}))
+        else:
+            get_solver(solver)(recorder, [(0, 1)] * 4,
+                               args=(battery, derivative_inverse), seed=seed,
+                               **(solver_options or {}))
+
+    params = np.array(recorder.params)
+    terms = np.array(recorder.terms)
+    front = nondominated_terms(terms)
+    return {
+        'cathode_data_ID': cathode_number,
+        'anode_data_ID': anode_number,
+        'params': params[front],
+        'terms': terms[front],
+        'nfev': len(terms)
+    }
+
+
+def perform_full_pareto_optimization(SOC_battery, OCV_battery,
+                                     interpolated_cathodes,
+                                     interpolated_anodes, iterations=1,
+                                     search_weights=SEARCH_WEIGHTS,
+                                     pairs=None, seed=None,
+                                     solver='differential_evolution',
+                                     solver_options=None, parallel='auto'):
+    """
+    Pareto fronts of every cathode and anode pair of the library.
+
+    Parameters:
+    - SOC_battery, OCV_battery: array-like
+        SOC and OCV values of the battery.
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - iterations: int, optional
+        Number of iterations; the fronts of all iterations are merged.
+    - search_weights: tuple, optional
+        (battery, derivative_inverse) weights searched for every pair. Every
+        weight costs one full search per pair and iteration.
+    - pairs: list of tuple, optional
+        (cathode ID, anode ID) combinations to optimize.
+        By default, every cathode is combined with every anode.
+    - seed, solver, solver_options: optional
+        As in perform_pareto_optimization.
+    - parallel: str, optional
+        Parallel layout, 'auto' or one of PARALLEL_LAYOUTS (see
+        optimization_functions.select_parallel_layout); 'workers' runs one
+        process per pair.
+
+    Raises:
+    - ValueError: If parallel is unknown.
+
+    Returns:
+    - fronts: dict
+        Front of perform_pareto_optimization per (cathode ID, anode ID).
+    """
+    if pairs is None:
+        pairs = [(cathode_number, anode_number)
+                 for cathode_number in interpolated_cathodes
+                 for anode_number in interpolated_anodes]
+
+    parallel = select_parallel_layout(
+        SOC_battery, OCV_battery, interpolated_cathodes, interpolated_anodes,
+        len(pairs), parallel=parallel)
+    if parallel == 'workers':
+        logger.info("Pareto searches run one process per pair instead of "
+                    "'workers'")
+        parallel = 'processes'
+    settings = parallel_settings(parallel)
+
+    fronts = {}
+    for iteration in range(iterations):
+        pair_fronts = Parallel(n_jobs=settings['n_jobs'],
+                               prefer=settings['prefer'])(
+            delayed(perform_pareto_optimization)(
+                cathode_number, interpolated_cathodes[cathode_number],
+                anode_number, interpolated_anodes[anode_number],
+                OCV_battery, SOC_battery, search_weights=search_weights,
+                seed=seed, solver=solver, solver_options=solver_options)
+            for cathode_number, anode_number in pairs
+        )
+        for front in pair_fronts:
+            pair = (front['cathode_data_ID'], front['anode_data_ID'])
+            if pair in fronts:
+                previous = fronts[pair]
+                params = np.vstack((previous['params'], front['params']))
+                terms = np.vstack((previous['terms'], front['terms']))
+                merged = nondominated_terms(terms)
+                front = dict(front, params=params[merged],
+                             terms=terms[merged],
+                             nfev=previous['nfev'] + front['nfev'])
+            fronts[pair] = front
+
+    return fronts
+
+
+def best_on_fronts(fronts, battery=1, derivative_inverse=0):
+    """
+    Best pair and alignment of the fronts for a pair of weights.
+
+    Parameters:
+    - fronts: dict
+        Fronts returned by perform_full_pareto_optimization.
+    - battery, derivative_inverse: float, optional
+        Weighting factors of the OCV and dQ/dV terms.
+
+    Returns:
+    - front, int, float: Front of the best pair, index of the best point
+      on it and its weighted RMSD.
+    """
+    best = None
+    for front in fronts.values():
+        RMSD = front['terms'] @ (battery, derivative_inverse)
+        point = int(np.argmin(RMSD))
+        if best is None or RMSD[point] < best[2]:
+            best = (front, point, float(RMSD[point]))
+    return best
+
+
+def weight_sweep(fronts, interpolated_cathodes, interpolated_anodes,
+                 weights):
+    """
+    Best pair and alignment for every pair of weights, from the fronts.
+
+    Parameters:
+    - fronts: dict
+        Fronts returned by perform_full_pareto_optimization.
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - weights: list of tuple
+        (battery, derivative_inverse) weights.
+
+    Returns:
+    - list of dict: Per weight, 'Battery Weight', 'Derivative Weight',
+      'Best Cathode Data ID', 'Best Anode Data ID', 'Best Parameters'
+      (alignment indices), 'Lowest RMSD', 'OCV RMSD' and 'dQ/dV RMSD'.
+    """
+    sweep = []
+    for battery, derivative_inverse in weights:
+        front, point, RMSD = best_on_fronts(fronts, battery,
+                                            derivative_inverse)
+        sweep.append({
+            'Battery Weight': battery,
+            'Derivative Weight': derivative_inverse,
+            'Best Cathode Data ID': front['cathode_data_ID'],
+            'Best Anode Data ID': front['anode_data_ID'],
+            'Best Parameters': calculate_alignment_indices(
+                front['params'][point],
+                len(interpolated_anodes[front['anode_data_ID']]['x_values']),
+                len(interpolated_cathodes[
+                    front['cathode_data_ID']]['x_values'])),
+            'Lowest RMSD': RMSD,
+            'OCV RMSD': float(front['terms'][point, 0]),
+            'dQ/dV RMSD': float(front['terms'][point, 1])
+        })
+    return sweep
+
+
+def result_from_fronts(fronts, SOC_battery, OCV_battery,
+                       interpolated_cathodes, interpolated_anodes,
+                       battery=1, derivative_inverse=0):
+    """
+    Full result for a pair of weights, read from the fronts.
+
+    Parameters:
+    - fronts: dict
+        Fronts returned by perform_full_pareto_optimization.
+    - SOC_battery, OCV_battery: array-like
+        SOC and OCV values of the battery.
+    - interpolated_cathodes, interpolated_anodes: dict
+        Half-cell data returned by add_half_cell_data.
+    - battery, derivative_inverse: float, optional
+        Weighting factors of the OCV and dQ/dV terms.
+
+    Returns:
+    - result: dict
+        Same keys as the result of perform_full_optimization_parallel
+        (without 'Parallel Layout'), plus the 'Pareto Front' of the best
+        pair.
+    """
+    front, point, RMSD = best_on_fronts(fronts, battery, derivative_inverse)
+    Best_Cathode = interpolated_cathodes[front['cathode_data_ID']]
+    Best_Anode = interpolated_anodes[front['anode_data_ID']]
+    best_parameters = calculate_alignment_indices(
+        front['params'][point], len(Best_Anode['x_values']),
+        len(Best_Cathode['x_values']))
+
+    result = {
+        'Best Cathode Data ID': front['cathode_data_ID'],
+        'Best Anode Data ID': front['anode_data_ID'],
+        'Best Parameters': best_parameters,
+        'Lowest RMSD': RMSD,
+        'SOC_battery': SOC_battery,
+        'OCV_battery': OCV_battery,
+        'Pareto Front': front
+    }
+    result.update(
+        calculate_aligned_curves(Best_Cathode, Best_Anode, best_parameters))
+    return result
+
+
+def fronts_to_json_data(fronts):
+    """
+    JSON serializable form of the fronts.
+
+    Parameters:
+    - fronts (dict): Fronts returned by perform_full_pareto_optimization.
+
+    Returns:
+    - list of dict: Per pair, 'cathode' and 'anode' IDs, 'params',
+      'OCV_RMSD' and 'dQdV_RMSD' lists and 'nfev'.
+    """
+    return [{
+        'cathode': front['cathode_data_ID'],
+        'anode': front['anode_data_ID'],
+        'params': front['params'].tolist(),
+        'OCV_RMSD': front['terms'][:, 0].tolist(),
+        'dQdV_RMSD': front['terms'][:, 1].tolist(),
+        'nfev': front['nfev']
+    } for front in fronts.values()]
@@ -0,0 +1,147 @@
+"""
+Plotting of battery OCV decomposition results.
+
+The figure and its line artists are created once and updated in place
+for every new result, so repeated runs do not create new figures.
+"""
+import numpy as np
+from matplotlib.figure import Figure
+
+# Maximum number of points drawn per curve
+MAX_DISPLAY_POINTS = 2000
+
+# Result keys (x, y) and line style of every plotted curve
+RESULT_LINES = {
+    'measured': ('SOC_battery', 'OCV_battery', 'r-',
+                 'Measured battery OCV'),
+    'calculated': ('SOC_battery', 'calculated_battery_OCV_opt', 'b-',
+                   'Optimized Battery OCV'),
+    'cathode_full': ('c_SOC_full', 'r1_ns_x_c1_ns', 'r--', None),
+    'cathode': ('c_SOC', 'r1_x_c1', 'g-', 'Optimized Cathode OCP'),
+    'anode_full': ('a_SOC_full', 'w1_ns_x_a1_ns', 'r--', None),
+    'anode': ('a_SOC', 'w1_x_a1', 'k-', 'Optimized Anode OCP')
+}
+
+
+def decimate_curve(x, y, max_points=MAX_DISPLAY_POINTS):
+    """
+    Reduce the number of points of a curve for display.
+
+    The curve is split into buckets and the minimum and maximum of every
+    bucket are kept, so peaks stay visible after decimation.
+
+    Parameters:
+    - x, y: array-like
+        Points of the curve.
+    - max_points: int, optional
+        Maximum number of points returned.
+
+    Returns:
+    - numpy.ndarray, numpy.ndarray: Decimated x and y values.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= max_points:
+        return x, y
+
+    n_buckets = max((max_points - 2) // 2, 1)
+    bucket_size = len(y) // n_buckets
+    n_used = n_buckets * bucket_size
+    buckets = y[:n_used].reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size
+    low = offsets + np.argmin(buckets, axis=1)
+    high = offsets + np.argmax(buckets, axis=1)
+
+    # Keep the extremes in their original order, plus both end points
+    indices = np.unique(np.concatenate(([0], low, high, [len(y) - 1])))
+    return x[indices], y[indices]
+
+
+def create_result_figure(figsize=(8, 6)):
+    """
+    Create the figure and the line artists used to plot results.
+
+    Parameters:
+    - figsize: tuple, optional
+        Size of the figure in inches.
+
+    Returns:
+    - matplotlib.figure.Figure, dict: The figure and its line artists,
+      keyed by the names in RESULT_LINES.
+    """
+    figure = Figure(figsize=figsize)
+    axes = figure.add_subplot()
+
+    lines = {}
+    for name, (_, _, style, label) in RESULT_LINES.items():
+        lines[name], = axes.plot([], [], style, label=label)
+
+    axes.set_title("Optimization")
+    axes.set_xlabel('SOC (% / 100)')
+    axes.set_ylabel('OCV (V)')
+    axes.grid(True)
+    axes.legend()
+
+    return figure, lines
+
+
+def update_result_lines(lines, result, max_points=MAX_DISPLAY_POINTS):
+    """
+    Update the line artists with the curves of a result.
+
+    Parameters:
+    - lines: dict
+        Line artists returned by create_result_figure.
+    - result: dict
+        Result returned by perform_full_optimization_parallel.
+    - max_points: int, optional
+        Maximum number of points drawn per curve.
+
+    Returns:
+    None
+    """
+    for name, (x_key, y_key, _, _) in RESULT_LINES.items():
+        lines[name].set_data(
+            *decimate_curve(result[x_key], result[y_key], max_points))
+
+    axes = lines['measured'].axes
+    axes.relim()
+    axes.autoscale_view()
+
+
+def plot_RMSD_landscape(figure, landscape, best_parameters):
+    """
+    Draw an RMSD landscape as a heatmap.
+
+    The figure is cleared and reused, so drawing several slices in the same
+    window does not create new figures.
+
+    Parameters:
+    - figure: matplotlib.figure.Figure
+        Figure to draw on.
+    - landscape: dict
+        Result of calculate_RMSD_landscape.
+    - best_parameters: tuple
+        Alignment indices e, f, g, h at the centre of the slice,
+        marked on the heatmap.
+
+    Returns:
+    None
+    """
+    figure.clear()
+    axes = figure.add_subplot()
+
+    x_indices = landscape['x_indices']
+    y_indices = landscape['y_indices']
+    image = axes.imshow(
+        landscape['RMSD'].T, origin='lower', aspect='auto',
+        extent=(x_indices[0], x_indices[-1], y_indices[0], y_indices[-1]))
+    figure.colorbar(image, ax=axes, label='RMSD')
+
+    x_name, y_name = landscape['axes']
+    centre = dict(zip('efgh', best_parameters))
+    axes.plot(centre[x_name], centre[y_name], 'w+', markersize=12)
+
+    axes.set_title("RMSD landscape")
+    axes.set_xlabel(x_name)
+    axes.set_ylabel(y_name)
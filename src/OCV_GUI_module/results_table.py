@@ -0,0 +1,254 @@
+"""
+Table of every (iteration, pair) outcome of a search.
+
+perform_full_optimization_parallel keeps only the best result, so the
+ranking of the alternative pairs and the spread of the restarts used to be
+lost. The outcomes are kept in a NumPy structured array with one row per
+run; the cathode and anode IDs are stored once and referenced by integer
+codes, so a row takes about 100 bytes whatever the length of the IDs.
+
+Example:
+    table = result['Results Table']
+    table.top_k(5)              # five best pairs, best run of each
+    table.pair_statistics()     # spread of the restarts of every pair
+    table.save_csv('runs.csv')  # or table.save_npz('runs.npz')
+"""
+import csv
+
+import numpy as np
+
+try:
+    from .optimization_functions import calculate_alignment_indices
+except ImportError:
+    # Imported as a top-level module, as GUI.py does
+    from optimization_functions import calculate_alignment_indices
+
+RESULT_DTYPE = np.dtype([
+    ('iteration', np.int32),
+    ('cathode', np.int32),
+    ('anode', np.int32),
+    ('params', np.float64, (4,)),
+    ('e', np.int32),
+    ('f', np.int32),
+    ('g', np.int32),
+    ('h', np.int32),
+    ('RMSD', np.float64),
+    ('OCV_RMSD', np.float64),
+    ('dQdV_RMSD', np.float64),
+    ('nfev', np.int32),
+    ('seconds', np.float64),
+    ('interrupted', np.bool_)
+])
+
+PAIR_STATISTICS_DTYPE = np.dtype([
+    ('cathode', np.int32),
+    ('anode', np.int32),
+    ('runs', np.int32),
+    ('best_RMSD', np.float64),
+    ('mean_RMSD', np.float64),
+    ('std_RMSD', np.float64),
+    ('spread_RMSD', np.float64),
+    ('distinct_indices', np.int32),
+    ('nfev', np.int64),
+    ('seconds', np.float64)
+])
+
+
+class ResultsTable:
+    """
+    Outcomes of the runs of a search, one row of RESULT_DTYPE per run.
+
+    Parameters:
+    - records (numpy.ndarray): Structured array of RESULT_DTYPE.
+    - cathode_IDs, anode_IDs (list of str): IDs referenced by the
+      'cathode' and 'anode' codes of the records.
+    """
+
+    def __init__(self, records, cathode_IDs, anode_IDs):
+        self.records = records
+        self.cathode_IDs = list(cathode_IDs)
+        self.anode_IDs = list(anode_IDs)
+
+    @classmethod
+    def from_runs(cls, runs, interpolated_cathodes, interpolated_anodes):
+        """
+        Build a table from the results of perform_optimization.
+
+        Parameters:
+        - runs (list of tuple): (iteration, result) of every run.
+        - interpolated_cathodes, interpolated_anodes (dict): Half-cell data,
+          for the alignment indices.
+
+        Returns:
+        - ResultsTable: The table.
+        """
+        cathode_IDs = list(dict.fromkeys(
+            result['cathode_data_ID'] for _, result in runs))
+        anode_IDs = list(dict.fromkeys(
+            result['anode_data_ID'] for _, result in runs))
+        cathode_codes = {ID: code for code, ID in enumerate(cathode_IDs)}
+        anode_codes = {ID: code for code, ID in enumerate(anode_IDs)}
+
+        records = np.zeros(len(runs), dtype=RESULT_DTYPE)
+        for row, (iteration, result) in enumerate(runs):
+            cathode_ID = result['cathode_data_ID']
+            anode_ID = result['anode_data_ID']
+            record = records[row]
+            record['iteration'] = iteration
+            record['cathode'] = cathode_codes[cathode_ID]
+            record['anode'] = anode_codes[anode_ID]
+            record['params'] = result['optimized_params']
+            (record['e'], record['f'], record['g'],
+             record['h']) = calculate_alignment_indices(
+                result['optimized_params'],
+                len(interpolated_anodes[anode_ID]['x_values']),
+                len(interpolated_cathodes[cathode_ID]['x_values']))
+            record['RMSD'] = result['RMSD']
+            record['OCV_RMSD'], record['dQdV_RMSD'] = result.get(
+                'RMSD_terms', (np.nan, np.nan))
+            record['nfev'] = result.get('nfev', 0)
+            record['seconds'] = result.get('seconds', np.nan)
+            record['interrupted'] = result.get('interrupted', False)
+
+        return cls(records, cathode_IDs, anode_IDs)
+
+    def __len__(self):
+        return len(self.records)
+
+    def pair_IDs(self, records):
+        """
+        Cathode and anode IDs of records.
+
+        Parameters:
+        - records (numpy.ndarray): Rows of this table (or of
+          pair_statistics).
+
+        Returns:
+        - list of tuple: (cathode ID, anode ID) per row.
+        """
+        return [(self.cathode_IDs[cathode], self.anode_IDs[anode])
+                for cathode, anode in zip(records['cathode'],
+                                          records['anode'])]
+
+    def top_k(self, k=10, per_pair=True):
+        """
+        Runs with the lowest RMSD.
+
+        Parameters:
+        - k (int, optional): Number of rows.
+        - per_pair (bool, optional): Keep only the best run of every pair,
+          so the rows rank alternative pairs.
+
+        Returns:
+        - numpy.ndarray: Rows of the table by increasing RMSD.
+        """
+        records = self.records[np.argsort(self.records['RMSD'],
+                                          kind='stable')]
+        if per_pair:
+            _, first = np.unique(
+                np.stack((records['cathode'], records['anode']), axis=1),
+                axis=0, return_index=True)
+            records = records[np.sort(first)]
+        return records[:k]
+
+    def pair_statistics(self):
+        """
+        Statistics of the runs of every pair, by increasing best RMSD.
+
+        'spread_RMSD' is the difference between the worst and best run and
+        'distinct_indices' the number of different alignments found, which
+        show whether the restarts of a pair agree.
+
+        Returns:
+        - numpy.ndarray: One row of PAIR_STATISTICS_DTYPE per pair.
+        """
+        pairs, inverse = np.unique(
+            np.stack((self.records['cathode'], self.records['anode']),
+                     axis=1),
+            axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        statistics = np.zeros(len(pairs), dtype=PAIR_STATISTICS_DTYPE)
+        for row, (cathode, anode) in enumerate(pairs):
+            runs = self.records[inverse == row]
+            RMSD = runs['RMSD']
+            statistics[row] = (
+                cathode, anode, len(runs), RMSD.min(), RMSD.mean(),
+                RMSD.std(), RMSD.max() - RMSD.min(),
+                len(np.unique(np.stack(
+                    (runs['e'], runs['f'], runs['g'], runs['h']), axis=1),
+                    axis=0)),
+                runs['nfev'].sum(), runs['seconds'].sum())
+        return statistics[np.argsort(statistics['best_RMSD'], kind='stable')]
+
+    def save_csv(self, filename, records=None):
+        """
+        Save rows to a CSV file, with the cathode and anode IDs.
+
+        Parameters:
+        - filename (str): Path to the CSV file.
+        - records (numpy.ndarray, optional): Rows of this table or of
+          pair_statistics. By default, every row of the table.
+        """
+        records = self.records if records is None else records
+        names = [name for name in records.dtype.names
+                 if name not in ('cathode', 'anode', 'params')]
+        with open(filename, 'w', newline='') as file:
+            writer = csv.writer(file)
+            header = ['cathode', 'anode'] + names
+            if 'params' in records.dtype.names:
+                header += ['e_percentage', 'f_percentage', 'g_percentage',
+                           'h_percentage']
+            writer.writerow(header)
+            for record, (cathode_ID, anode_ID) in zip(
+                    records, self.pair_IDs(records)):
+                row = [cathode_ID, anode_ID] + [record[name].item()
+                                                for name in names]
+                if 'params' in records.dtype.names:
+                    row += record['params'].tolist()
+                writer.writerow(row)
+
+    def save_npz(self, filename):
+        """
+        Save the table to a compressed NumPy file.
+
+        Parameters:
+        - filename (str): Path to the .npz file.
+        """
+        np.savez_compressed(filename, records=self.records,
+                            cathode_IDs=np.array(self.cathode_IDs),
+                            anode_IDs=np.array(self.anode_IDs))
+
+    @classmethod
+    def load_npz(cls, filename):
+        """
+        Load a table saved by save_npz.
+
+        Parameters:
+        - filename (str): Path to the .npz file.
+
+        Returns:
+        - ResultsTable: The table.
+        """
+        with np.load(filename) as data:
+            return cls(data['records'], data['cathode_IDs'].tolist(),
+                       data['anode_IDs'].tolist())
+
+    def save(self, filename):
+        """
+        Save the table as CSV or npz, depending on the file extension.
+
+        Parameters:
+        - filename (str): Path ending in .csv or .npz.
+
+        Raises:
+        - ValueError: If the extension is neither .csv nor .npz.
+        """
+        if filename.endswith('.csv'):
+            self.save_csv(filename)
+        elif filename.endswith('.npz'):
+            self.save_npz(filename)
+        else:
+            raise ValueError(
+                f"The results table must be saved as .csv or .npz, "
+                f"got '{filename}'.")
@@ -0,0 +1,437 @@
+"""
+Local decomposition server.
+
+The server loads the half-cell library once and starts a pool of worker
+processes that lives as long as the server. Every worker receives the
+library once, when it starts; a request only sends the battery curve and
+the IDs of the pairs to search. The pairs of a request are split between
+the workers, which search their share serially, so the latency of a
+request is the optimization time alone. It speaks a minimal HTTP/1.1 over
+TCP or a Unix socket:
+
+    GET  /status     library sizes, queued and running requests
+    POST /decompose  decompose a battery curve, e.g.
+                     {"SOC": [...], "OCV": [...], "iterations": 3}
+
+The response of /decompose is sent when its decomposition finishes and
+holds the same data as a JSON file saved by save_result_to_json. Requests
+wait in a queue of limited size; when it is full, the server answers
+503 at once instead of accepting more work than it can finish.
+
+Example:
+    pybep serve --cathodes data/cathode_data --anodes data/anode_data
+    curl -X POST localhost:8765/decompose \\
+        -d '{"battery": "data/NMC811vsGraphite_OCV-LICeM.txt"}'
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from joblib import cpu_count
+
+from .add_battery import load_soc_ocv_data
+from .add_curves import add_half_cell_data
+from .library import (
+    filter_pairs, full_cell_metadata, index_half_cell_library)
+from .optimization_functions import (
+    TimeBudgetExceeded, perform_full_optimization_parallel,
+    result_to_json_data)
+
+logger = logging.getLogger(__name__)
+
+# Options of a decomposition request and their default values
+REQUEST_DEFAULTS = {
+    'iterations': 5,
+    'battery_weight': 1.0,
+    'derivative_weight': 0.0,
+    'single_precision': False,
+    'adaptive': False,
+    'tolerance': 1e-5,
+    'stable_restarts': 2,
+    'feature_init': False,
+    'match_chemistry': None,
+    'cathode_chemistry': None,
+    'anode_chemistry': None,
+    'fallback_all_pairs': False,
+    'time_budget': None
+}
+
+# Conversion of every request option; None is kept where it is the default
+REQUEST_TYPES = {
+    'iterations': int,
+    'battery_weight': float,
+    'derivative_weight': float,
+    'single_precision': bool,
+    'adaptive': bool,
+    'tolerance': float,
+    'stable_restarts': int,
+    'feature_init': bool,
+    'match_chemistry': str,
+    'cathode_chemistry': str,
+    'anode_chemistry': str,
+    'fallback_all_pairs': bool,
+    'time_budget': float
+}
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 500: 'Internal Server Error',
+                503: 'Service Unavailable'}
+
+
+# Half-cell data of a worker process, set once by _load_worker_library
+_worker_library = {}
+
+
+def _load_worker_library(interpolated_cathodes, interpolated_anodes):
+    # Initializer of the worker processes
+    _worker_library['cathodes'] = interpolated_cathodes
+    _worker_library['anodes'] = interpolated_anodes
+
+
+def _decompose_pairs(SOC_battery, OCV_battery, pairs, settings):
+    # Search a share of the pairs of a request serially in a worker process
+    result = perform_full_optimization_parallel(
+        SOC_battery, OCV_battery, _worker_library['cathodes'],
+        _worker_library['anodes'], parallel='serial', pairs=pairs,
+        **settings)
+    data = result_to_json_data(result)
+    if 'Search Completeness' in result:
+        data['Search Completeness'] = result['Search Completeness']
+    return data
+
+
+def parse_request(request):
+    """
+    Check a decomposition request and convert its options.
+
+    Parameters:
+    - request (dict): 'SOC' and 'OCV' lists or a 'battery' TXT file, and
+      any option of REQUEST_DEFAULTS.
+
+    Raises:
+    - ValueError: If an option is unknown or has an invalid value, or the
+      battery curve is missing or invalid.
+
+    Returns:
+    - numpy.ndarray, numpy.ndarray, dict: SOC and OCV of the battery and the
+      options, with the defaults of the options not given.
+    """
+    unknown = set(request) - set(REQUEST_DEFAULTS) - {'SOC', 'OCV', 'battery'}
+    if unknown:
+        raise ValueError(f"Unknown option(s): {', '.join(sorted(unknown))}")
+
+    options = dict(REQUEST_DEFAULTS)
+    for name, value in request.items():
+        if name not in REQUEST_TYPES:
+            continue
+        convert = REQUEST_TYPES[name]
+        if value is None and REQUEST_DEFAULTS[name] is None:
+            continue
+        if convert in (bool, str) and not isinstance(value, convert) \
+                or convert in (int, float) and isinstance(value, bool):
+            raise ValueError(f"Invalid value {value!r} for '{name}'.")
+        try:
+            options[name] = convert(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value {value!r} for '{name}'.")
+    if options['iterations'] < 1:
+        raise ValueError("'iterations' must be at least 1.")
+    if options['time_budget'] is not None and options['time_budget'] <= 0:
+        raise ValueError("'time_budget' must be positive.")
+
+    if 'battery' in request:
+        if not isinstance(request['battery'], str):
+            raise ValueError("'battery' must be a file path.")
+        SOC_battery, OCV_battery = load_soc_ocv_data(request['battery'])
+    elif 'SOC' in request and 'OCV' in request:
+        try:
+            SOC_battery = np.asarray(request['SOC'], dtype=float)
+            OCV_battery = np.asarray(request['OCV'], dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError("SOC and OCV must be lists of numbers.")
+        if SOC_battery.shape != OCV_battery.shape \
+                or SOC_battery.ndim != 1 or len(SOC_battery) < 2:
+            raise ValueError("SOC and OCV must be lists of equal length.")
+    else:
+        raise ValueError("A request needs 'SOC' and 'OCV' or 'battery'.")
+
+    if options['match_chemistry'] is not None:
+        if options['match_chemistry'] not in ('exact', 'family'):
+            raise ValueError(
+                "'match_chemistry' must be 'exact' or 'family', got "
+                f"'{options['match_chemistry']}'.")
+        # Chemistries not given are read from the battery file name
+        for name in ('cathode', 'anode'):
+            if options[f'{name}_chemistry'] is None:
+                if 'battery' not in request:
+                    raise ValueError(
+                        f"'match_chemistry' needs '{name}_chemistry' or a "
+                        "'battery' file named after its chemistries.")
+                options[f'{name}_chemistry'] = \
+                    full_cell_metadata(request['battery'])[name]
+
+    return SOC_battery, OCV_battery, options
+
+
+class DecompositionServer:
+    """
+    Asyncio server running decompositions against a preloaded library.
+
+    Parameters:
+    - cathodes, anodes (str): Folders with cathode and anode half-cell data.
+    - queue_size (int, optional): Number of requests that can wait for a
+      free slot; further requests are refused with 503.
+    - concurrency (int, optional): Number of decompositions run at the
+      same time. They share the worker processes.
+    - workers (int, optional): Number of worker processes, by default the
+      number of cores.
+    """
+
+    def __init__(self, cathodes, anodes, queue_size=8, concurrency=1,
+                 workers=None):
+        self.interpolated_cathodes = add_half_cell_data(cathodes)
+        self.interpolated_anodes = add_half_cell_data(anodes)
+        self.cathode_index = index_half_cell_library(cathodes)
+        self.anode_index = index_half_cell_library(anodes)
+
+        self.queue_size = queue_size
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.queue = None
+        self.running = 0
+        self.completed = 0
+
+        # The worker processes start now, with the library, rather than on
+        # the first request, and stay until the server stops
+        self.workers = workers or cpu_count()
+        self.process_pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_load_worker_library,
+            initargs=(self.interpolated_cathodes, self.interpolated_anodes))
+        for future in [self.process_pool.submit(os.getpid)
+                       for _ in range(self.workers)]:
+            future.result()
+
+    def status(self):
+        return {
+            'cathodes': len(self.interpolated_cathodes),
+            'anodes': len(self.interpolated_anodes),
+            'workers': self.workers,
+            'queued': self.queue.qsize() if self.queue else 0,
+            'queue_size': self.queue_size,
+            'running': self.running,
+            'completed': self.completed
+        }
+
+    def decompose(self, request):
+        """
+        Run one decomposition request.
+
+        The pairs are split into one share per worker process, and the best
+        result of the shares is returned. A time budget sets one deadline
+        for all shares.
+
+        Parameters:
+        - request (dict): 'SOC' and 'OCV' lists or a 'battery' TXT file,
+          and any option of REQUEST_DEFAULTS.
+
+        Raises:
+        - ValueError: If the request is invalid (see parse_request), or a
+          share failed with a ValueError.
+        - TimeBudgetExceeded: If the time budget ran out before any share
+          was searched.
+
+        Returns:
+        - dict: JSON serializable result, with the 'Parallel Layout' used,
+          the 'Seconds' taken and, with a time_budget, the
+          'Search Completeness'.
+        """
+        start = time.perf_counter()
+        SOC_battery, OCV_battery, options = parse_request(request)
+
+        if options['match_chemistry']:
+            pairs = filter_pairs(
+                self.cathode_index, self.anode_index,
+                options['cathode_chemistry'], options['anode_chemistry'],
+                match=options['match_chemistry'],
+                fallback=options['fallback_all_pairs'])
+        else:
+            pairs = [(cathode_number, anode_number)
+                     for cathode_number in self.interpolated_cathodes
+                     for anode_number in self.interpolated_anodes]
+
+        settings = {
+            'iterations': options['iterations'],
+            'battery': options['battery_weight'],
+            'derivative_inverse': options['derivative_weight'],
+            'dtype': np.float32 if options['single_precision']
+            else np.float64,
+            'adaptive': options['adaptive'],
+            'tolerance': options['tolerance'],
+            'stable_restarts': options['stable_restarts'],
+            'initializer': 'features' if options['feature_init'] else None,
+            'deadline': None if options['time_budget'] is None
+            else time.time() + options['time_budget']
+        }
+        n_shares = min(self.workers, len(pairs))
+        share_pairs = [pairs[share::n_shares] for share in range(n_shares)]
+        futures = [
+            self.process_pool.submit(
+                _decompose_pairs, SOC_battery, OCV_battery, share, settings)
+            for share in share_pairs]
+
+        shares, errors, skipped = [], [], 0
+        for share, future in zip(share_pairs, futures):
+            try:
+                shares.append(future.result())
+            except TimeBudgetExceeded as error:
+                # A share whose time ran out before it started
+                errors.append(error)
+                skipped += len(share)
+        if not shares:
+            raise errors[0]
+
+        data = min(shares, key=lambda share: share['Lowest RMSD'])
+        data['Parallel Layout'] = 'processes'
+        if settings['deadline'] is not None:
+            completeness = [share['Search Completeness'] for share in shares]
+            data['Search Completeness'] = {
+                'Complete': not errors and all(
+                    share['Complete'] for share in completeness),
+                'Pairs': len(pairs),
+                'Pairs Searched': sum(
+                    share['Pairs Searched'] for share in completeness),
+                'Iterations': min(
+                    share['Iterations'] for share in completeness),
+                'Interrupted Runs': sum(
+                    share['Interrupted Runs'] for share in completeness),
+                'Skipped Runs': skipped + sum(
+                    share['Skipped Runs'] for share in completeness),
+                'Seconds': time.perf_counter() - start
+            }
+        data['Seconds'] = time.perf_counter() - start
+        return data
+
+    async def _worker(self):
+        # Run queued requests one after another in the thread executor
+        loop = asyncio.get_running_loop()
+        while True:
+            request, future = await self.queue.get()
+            self.running += 1
+            try:
+                data = await loop.run_in_executor(
+                    self.executor, self.decompose, request)
+                if not future.cancelled():
+                    future.set_result(data)
+            except Exception as error:
+                if not future.cancelled():
+                    future.set_exception(error)
+            finally:
+                self.running -= 1
+                self.completed += 1
+                self.queue.task_done()
+
+    async def _respond(self, writer, status, data):
+        body = json.dumps(data).encode()
+        headers = [f"HTTP/1.1 {status} {HTTP_REASONS[status]}",
+                   "Content-Type: application/json",
+                   f"Content-Length: {len(body)}",
+                   "Connection: close"]
+        if status == 503:
+            headers.append("Retry-After: 5")
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve one HTTP request on a connection.
+        """
+        try:
+            request_line = (await reader.readline()).decode().split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                return await self._respond(
+                    writer, 400, {'error': "Malformed request."})
+
+            method, path = request_line[:2]
+            if path == '/status':
+                if method != 'GET':
+                    return await self._respond(
+                        writer, 405, {'error': "Use GET for /status."})
+                return await self._respond(writer, 200, self.status())
+            if path != '/decompose':
+                return await self._respond(
+                    writer, 404, {'error': f"Unknown path '{path}'."})
+            if method != 'POST':
+                return await self._respond(
+                    writer, 405, {'error': "Use POST for /decompose."})
+
+            body = await reader.readexactly(
+                int(headers.get('content-length', 0)))
+            try:
+                request = json.loads(body or b'{}')
+            except ValueError:
+                return await self._respond(
+                    writer, 400, {'error': "The body is not valid JSON."})
+            if not isinstance(request, dict):
+                return await self._respond(
+                    writer, 400, {'error': "The body must be a JSON object."})
+
+            # Backpressure: refuse at once instead of queueing without limit
+            if self.queue.full():
+                return await self._respond(
+                    writer, 503, {'error': "The queue is full.",
+                                  **self.status()})
+
+            future = asyncio.get_running_loop().create_future()
+            self.queue.put_nowait((request, future))
+            try:
+                data = await future
+            except (OSError, ValueError) as error:
+                return await self._respond(writer, 400, {'error': str(error)})
+            except Exception as error:
+                logger.exception("Decomposition failed")
+                return await self._respond(writer, 500, {'error': str(error)})
+            await self._respond(writer, 200, data)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, socket_path=None):
+        """
+        Accept requests until the task is cancelled.
+
+        Parameters:
+        - host, port (optional): TCP address to listen on.
+        - socket_path (str, optional): Unix socket to listen on instead.
+        """
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        workers = [asyncio.create_task(self._worker())
+                   for _ in range(self.concurrency)]
+
+        if socket_path:
+            server = await asyncio.start_unix_server(
+                self.handle_connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(
+                self.handle_connection, host=host, port=port)
+        logger.info("Serving on %s", socket_path or f"{host}:{port}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.executor.shutdown(wait=False)
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,523 @@
+"""
+Optimizer backends for the alignment search.
+
+Every solver has the same interface,
+
+    solver(objective, bounds, args=(), seed=None, popsize=None, tol=None,
+           maxiter=None, x0=None, constraints=())
+
+and returns a scipy.optimize.OptimizeResult with at least x, fun and nfev.
+popsize, tol and maxiter keep the meaning of differential_evolution where
+a solver has an equivalent setting (see the solver documentation) and are
+ignored otherwise. Solvers are registered by name in SOLVERS; a custom
+strategy is added with the register_solver decorator:
+
+    @register_solver('random_search')
+    def random_search(objective, bounds, args=(), seed=None, **options):
+        ...
+
+perform_optimization(..., solver=name, solver_options={...}) uses a
+registered solver for every pair, and compare_solvers measures how many
+evaluations each solver needs to reach a target RMSD.
+"""
+import statistics
+import time
+
+import numpy as np
+from scipy.interpolate import RBFInterpolator
+from scipy.optimize import (
+    OptimizeResult, differential_evolution, dual_annealing, minimize, shgo)
+from scipy.stats import qmc
+
+try:
+    from .optimization_functions import optimization
+except ImportError:
+    # Imported as a top-level module, as GUI.py does
+    from optimization_functions import optimization
+
+SOLVERS = {}
+
+
+def register_solver(name):
+    """
+    Decorator registering a solver under a name.
+
+    Parameters:
+    - name (str): Name used to select the solver.
+
+    Returns:
+    - callable: The decorator, which returns the solver unchanged.
+    """
+    def decorator(solver):
+        SOLVERS[name] = solver
+        return solver
+    return decorator
+
+
+def get_solver(name):
+    """
+    Look up a registered solver.
+
+    Parameters:
+    - name (str): Name of the solver.
+
+    Raises:
+    - ValueError: If no solver is registered under the name.
+
+    Returns:
+    - callable: The solver.
+    """
+    if name not in SOLVERS:
+        raise ValueError(
+            f"Unknown solver '{name}', available: {', '.join(SOLVERS)}.")
+    return SOLVERS[name]
+
+
+def _feasible(points, constraints):
+    # Mask of the points (one per row) satisfying the linear constraints
+    points = np.atleast_2d(points)
+    mask = np.ones(len(points), dtype=bool)
+    for constraint in constraints:
+        values = points @ np.atleast_2d(constraint.A).T
+        mask &= np.all((values >= constraint.lb) & (values <= constraint.ub),
+                       axis=1)
+    return mask
+
+
+def _constrained(objective, constraints):
+    # Objective returning infinity outside of the linear constraints,
+    # for solvers without constraint support
+    if not constraints:
+        return objective
+
+    def constrained_objective(params, *args):
+        if not _feasible(params, constraints)[0]:
+            return np.inf
+        return objective(params, *args)
+    return constrained_objective
+
+
+@register_solver('differential_evolution')
+def differential_evolution_solver(objective, bounds, args=(), seed=None,
+                                  popsize=None, tol=None, maxiter=None,
+                                  x0=None, constraints=()):
+    """
+    scipy.optimize.differential_evolution with its default settings.
+    """
+    options = {key: value for key, value in (
+        ('popsize', popsize), ('tol', tol), ('maxiter', maxiter))
+        if value is not None}
+    return differential_evolution(
+        objective, bounds, args=args, seed=seed, x0=x0,
+        constraints=constraints, polish=not constraints, **options)
+
+
+@register_solver('dual_annealing')
+def dual_annealing_solver(objective, bounds, args=(), seed=None,
+                          popsize=None, tol=None, maxiter=None, x0=None,
+                          constraints=()):
+    """
+    scipy.optimize.dual_annealing; maxiter is the number of global
+    iterations. The local search is disabled, since the objective is
+    piecewise constant in the parameters and has no useful gradient.
+    """
+    return dual_annealing(
+        _constrained(objective, constraints), bounds, args=args, seed=seed,
+        maxiter=maxiter or 1000, x0=x0, no_local_search=True)
+
+
+@register_solver('shgo')
+def shgo_solver(objective, bounds, args=(), seed=None, popsize=None,
+                tol=None, maxiter=None, x0=None, constraints=()):
+    """
+    scipy.optimize.shgo with Sobol sampling; popsize is the number of
+    sampling points per iteration and maxiter the number of iterations.
+    Local searches use Nelder-Mead, which needs no gradient; its points
+    are clipped to the bounds, which shgo does not pass to it.
+    """
+    lower, upper = np.transpose(bounds)
+    function = _constrained(objective, constraints)
+
+    def bounded_objective(params, *args):
+        return function(np.clip(params, lower, upper), *args)
+
+    result = shgo(
+        bounded_objective, bounds, args=args,
+        n=popsize or 128, iters=maxiter or 1, sampling_method='sobol',
+        minimizer_kwargs={'method': 'Nelder-Mead',
+                          'options': {'xatol': tol or 1e-3,
+                                      'fatol': 1e-7}})
+    result.x = np.clip(result.x, lower, upper)
+    return result
+
+
+@register_solver('nelder_mead')
+def nelder_mead_multistart(objective, bounds, args=(), seed=None,
+                           popsize=None, tol=None, maxiter=None, x0=None,
+                           constraints=()):
+    """
+    Bounded Nelder-Mead from several random starts; popsize is the number of
+    starts (default 10, the first one at x0 if given), tol the parameter
+    tolerance and maxiter the iterations per start.
+    """
+    rng = np.random.default_rng(seed)
+    lower, upper = np.transpose(bounds)
+    starts = lower + (upper - lower) * rng.uniform(
+        size=(popsize or 10, len(bounds)))
+    if x0 is not None:
+        starts[0] = x0
+
+    function = _constrained(objective, constraints)
+    best, nfev = None, 0
+    for start in starts:
+        # A large initial simplex, since the objective is flat at small
+        # scales (the parameters are rounded to array indices)
+        simplex = np.vstack((start, start + 0.1 * np.diag(upper - lower)))
+        simplex = np.clip(simplex, lower, upper)
+        result = minimize(
+            function, start, args=args, method='Nelder-Mead', bounds=bounds,
+            options={'initial_simplex': simplex, 'xatol': tol or 1e-3,
+                     'fatol': 1e-7, 'maxiter': maxiter or 400})
+        nfev += result.nfev
+        if best is None or result.fun < best.fun:
+            best = result
+
+    best.nfev = nfev
+    return best
+
+
+@register_solver('cma_es')
+def cma_es(objective, bounds, args=(), seed=None, popsize=None, tol=None,
+           maxiter=None, x0=None, constraints=(), sigma0=0.3):
+    """
+    Covariance matrix adaptation evolution strategy in pure NumPy.
+
+    The search runs in the unit cube of the bounds. Candidates outside are
+    evaluated at the nearest point inside and ranked with a penalty on
+    their distance to it. popsize is the number of candidates per
+    generation (default 4 + 3 ln n), tol the step size at which the search
+    stops (default 1e-3) and maxiter the number of generations
+    (default 200). A ValueError is raised if no candidate had a finite
+    value, e.g. because none satisfied the constraints.
+    """
+    rng = np.random.default_rng(seed)
+    lower, upper = np.transpose(np.asarray(bounds, dtype=float))
+    scale = upper - lower
+    n = len(bounds)
+    function = _constrained(objective, constraints)
+
+    # Strategy parameters (Hansen, The CMA Evolution Strategy: A Tutorial)
+    lam = popsize or 4 + int(3 * np.log(n))
+    mu = lam // 2
+    weights = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+    weights /= weights.sum()
+    mueff = 1 / np.sum(weights ** 2)
+    cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+    cs = (mueff + 2) / (n + mueff + 5)
+    c1 = 2 / ((n + 1.3) ** 2 + mueff)
+    cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+    damps = 1 + 2 * max(0, np.sqrt((mueff - 1) / (n + 1)) - 1) + cs
+    chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+    mean = rng.uniform(size=n) if x0 is None \
+        else (np.asarray(x0) - lower) / scale
+    sigma = sigma0
+    C = np.eye(n)
+    B = np.eye(n)
+    D = np.ones(n)
+    pc = np.zeros(n)
+    ps = np.zeros(n)
+
+    best_x, best_fun, nfev = None, np.inf, 0
+    for generation in range(maxiter or 200):
+        y = rng.standard_normal((lam, n)) @ (B * D).T
+        candidates = mean + sigma * y
+        inside = np.clip(candidates, 0, 1)
+        values = np.array([function(lower + scale * x, *args)
+                           for x in inside])
+        nfev += lam
+
+        index = np.argmin(values)
+        if values[index] < best_fun:
+            best_fun, best_x = values[index], lower + scale * inside[index]
+
+        penalty = np.sum((candidates - inside) ** 2, axis=1)
+        order = np.argsort(values + penalty)
+        y_selected = y[order[:mu]]
+        y_mean = weights @ y_selected
+        mean = np.clip(mean + sigma * y_mean, 0, 1)
+
+        C_inverse_sqrt = B @ np.diag(1 / D) @ B.T
+        ps = (1 - cs) * ps \
+            + np.sqrt(cs * (2 - cs) * mueff) * C_inverse_sqrt @ y_mean
+        hsig = np.linalg.norm(ps) / np.sqrt(
+            1 - (1 - cs) ** (2 * (generation + 1))) / chi_n \
+            < 1.4 + 2 / (n + 1)
+        pc = (1 - cc) * pc + hsig * np.sqrt(cc * (2 - cc) * mueff) * y_mean
+        C = (1 - c1 - cmu) * C \
+            + c1 * (np.outer(pc, pc) + (1 - hsig) * cc * (2 - cc) * C) \
+            + cmu * (y_selected.T * weights) @ y_selected
+        sigma *= np.exp((cs / damps) * (np.linalg.norm(ps) / chi_n - 1))
+
+        C = (C + C.T) / 2
+        eigenvalues, B = np.linalg.eigh(C)
+        D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+        if sigma * D.max() < (tol or 1e-3):
+            break
+
+    if best_x is None:
+        raise ValueError(
+            "The CMA-ES search found no point with a finite objective "
+            "value; check the search limits.")
+    return OptimizeResult(x=best_x, fun=best_fun, nfev=nfev,
+                          nit=generation + 1, success=True,
+                          message="Step size below tolerance or maxiter "
+                                  "reached.")
+
+
+# Weights of the predicted value against the distance to evaluated points,
+# cycled through by the surrogate search
+SURROGATE_WEIGHTS = (0.3, 0.5, 0.8, 0.95)
+
+# Batches of n_candidates uniform samples drawn at most to find feasible
+# initial points of the surrogate search
+SURROGATE_SAMPLE_BATCHES = 100
+
+
+@register_solver('surrogate')
+def surrogate_rbf(objective, bounds, args=(), seed=None, popsize=None,
+                  tol=None, maxiter=None, x0=None, constraints=(),
+                  n_candidates=1000, radius0=0.2):
+    """
+    Surrogate-assisted search with a fixed budget of true evaluations.
+
+    A cubic radial basis function model is fitted to every evaluated point
+    and proposes the next one: candidates are drawn around the best point
+    (and a tenth uniformly), and the candidate with the best weighted
+    score of predicted value and distance to the evaluated points is
+    evaluated with the true objective (stochastic RBF, Regis and Shoemaker,
+    2007). The radius around the best point halves after repeated failures
+    and doubles after repeated successes.
+
+    The model only proposes points: every value reported, including the
+    result, comes from the true objective.
+
+    popsize is the size of the initial Latin hypercube (default 20, with
+    x0 as first point if given), maxiter the budget of true evaluations
+    (default 200) and tol the radius, in fractions of the bounds, at which
+    the local search restarts with the initial radius (default 1e-3).
+    With constraints, infeasible initial points are replaced by feasible
+    uniform samples, which cost no evaluation.
+
+    Raises:
+    - ValueError: If fewer initial points than the model needs satisfy the
+      constraints after SURROGATE_SAMPLE_BATCHES batches of samples.
+    """
+    rng = np.random.default_rng(seed)
+    lower, upper = np.transpose(np.asarray(bounds, dtype=float))
+    scale = upper - lower
+    n = len(bounds)
+    budget = maxiter or 200
+    tol = tol or 1e-3
+
+    # The search runs in the unit cube of the bounds
+    def true_value(point):
+        return objective(lower + scale * point, *args)
+
+    n_initial = min(popsize or 20, budget)
+    points = qmc.LatinHypercube(d=n, seed=rng).random(n_initial)
+    if x0 is not None:
+        points[0] = (np.asarray(x0) - lower) / scale
+    if constraints:
+        points = points[_feasible(lower + scale * points, constraints)]
+        for _ in range(SURROGATE_SAMPLE_BATCHES):
+            if len(points) >= n_initial:
+                break
+            samples = rng.uniform(size=(n_candidates, n))
+            points = np.vstack((points, samples[
+                _feasible(lower + scale * samples, constraints)]))
+        # The linear polynomial of the model needs n + 1 points
+        if len(points) < min(n_initial, n + 1):
+            raise ValueError(
+                "The surrogate search found too few points satisfying the "
+                "constraints; check the search limits.")
+        points = points[:n_initial]
+    values = np.array([true_value(point) for point in points])
+
+    radius = radius0
+    successes = failures = 0
+    iteration = 0
+    while len(values) < budget:
+        if radius < tol:
+            # Converged locally: restart with the initial radius, keeping
+            # the model, until the budget is used
+            radius, successes, failures = radius0, 0, 0
+
+        finite = np.isfinite(values)
+        model = RBFInterpolator(points[finite], values[finite],
+                                kernel='cubic', smoothing=1e-12)
+        best = points[np.argmin(values)]
+
+        candidates = best + radius * rng.standard_normal((n_candidates, n))
+        uniform = rng.uniform(size=n_candidates // 10)
+        candidates[:len(uniform)] = rng.uniform(size=(len(uniform), n))
+        candidates = np.clip(candidates, 0, 1)
+        if constraints:
+            candidates = candidates[
+                _feasible(lower + scale * candidates, constraints)]
+        distances = np.min(np.linalg.norm(
+            candidates[:, None, :] - points[None, :, :], axis=2), axis=1)
+        candidates = candidates[distances > 1e-9]
+        distances = distances[distances > 1e-9]
+        if not len(candidates):
+            radius /= 2
+            continue
+
+        # Scores scaled to [0, 1]: low predicted value, far from points
+        predicted = model(candidates)
+        value_score = (predicted - predicted.min()) \
+            / max(np.ptp(predicted), 1e-300)
+        distance_score = (distances.max() - distances) \
+            / max(np.ptp(distances), 1e-300)
+        weight = SURROGATE_WEIGHTS[iteration % len(SURROGATE_WEIGHTS)]
+        candidate = candidates[np.argmin(
+            weight * value_score + (1 - weight) * distance_score)]
+        iteration += 1
+
+        value = true_value(candidate)
+        if value < values.min() - 1e-3 * abs(values.min()):
+            successes, failures = successes + 1, 0
+        else:
+            successes, failures = 0, failures + 1
+        points = np.vstack((points, candidate))
+        values = np.append(values, value)
+
+        if failures >= max(n, 5):
+            radius, failures = radius / 2, 0
+        elif successes >= 3:
+            radius, successes = min(2 * radius, radius0), 0
+
+    index = np.argmin(values)
+    return OptimizeResult(x=lower + scale * points[index], fun=values[index],
+                          nfev=len(values), nit=iteration, success=True,
+                          message="Evaluation budget used.")
+
+
+class _RecordingObjective:
+    # Objective recording the value of every evaluation
+    def __init__(self):
+        self.values = []
+
+    def __call__(self, params, *args):
+        value = optimization(params, *args)
+        self.values.append(value)
+        return value
+
+
+def compare_solvers(cathode_info, anode_info, SOC_battery, OCV_battery,
+                    solvers=None, repeats=5, target_RMSD=None,
+                    tolerance=1e-5, battery=1, derivative_inverse=0,
+                    solver_options=None):
+    """
+    Compare solvers on the number of evaluations to reach a target RMSD.
+
+    Every solver is run repeats times with different seeds on one cathode
+    and anode pair, and the value of every objective evaluation is
+    recorded.
+
+    Parameters:
+    - cathode_info, anode_info: dict
+        Half-cell data of the pair.
+    - SOC_battery, OCV_battery: array-like
+        SOC and OCV values of the battery.
+    - solvers: list of str, optional
+        Registered solver names. By default, all of SOLVERS.
+    - repeats: int, optional
+        Number of runs per solver, with seeds 0 to repeats - 1.
+    - target_RMSD: float, optional
+        RMSD counted as finding the optimum. By default, the lowest RMSD
+        found by any run plus tolerance.
+    - tolerance: float, optional
+        Margin above the best RMSD of the default target.
+    - battery, derivative_inverse: float, optional
+        Weighting factors for different components of the objective function.
+    - solver_options: dict, optional
+        Mapping from a solver name to its popsize, tol and maxiter.
+
+    Returns:
+    - dict: 'target_RMSD' and 'solvers', a list with, per solver, the
+      'success_rate' (fraction of runs reaching the target), the median
+      'evaluations_to_target' of the successful runs (None if none), the
+      median total 'nfev', the 'best_RMSD' and the median 'seconds'.
+    """
+    solvers = solvers or list(SOLVERS)
+    solver_options = solver_options or {}
+    args = (anode_info['interpolated_function'], anode_info['x_values'],
+            cathode_info['interpolated_function'], cathode_info['x_values'],
+            np.asarray(OCV_battery), np.asarray(SOC_battery), battery,
+            derivative_inverse)
+
+    runs = {}
+    for name in solvers:
+        solver = get_solver(name)
+        runs[name] = []
+        for seed in range(repeats):
+            objective = _RecordingObjective()
+            start = time.perf_counter()
+            result = solver(objective, [(0, 1)] * 4, args=args, seed=seed,
+                            **solver_options.get(name, {}))
+            runs[name].append({
+                'values': np.array(objective.values),
+                'seconds': time.perf_counter() - start,
+                'RMSD': float(np.min(objective.values))
+            })
+
+    if target_RMSD is None:
+        target_RMSD = min(run['RMSD'] for name in runs
+                          for run in runs[name]) + tolerance
+
+    report = []
+    for name, solver_runs in runs.items():
+        evaluations = [int(np.argmax(run['values'] <= target_RMSD)) + 1
+                       for run in solver_runs
+                       if run['RMSD'] <= target_RMSD]
+        report.append({
+            'solver': name,
+            'success_rate': len(evaluations) / len(solver_runs),
+            'evaluations_to_target': statistics.median(evaluations)
+            if evaluations else None,
+            'nfev': statistics.median(len(run['values'])
+                                      for run in solver_runs),
+            'best_RMSD': min(run['RMSD'] for run in solver_runs),
+            'seconds': statistics.median(run['seconds']
+                                         for run in solver_runs)
+        })
+
+    return {'target_RMSD': target_RMSD, 'solvers': report}
+
+
+def format_solver_comparison(comparison):
+    """
+    Format the result of compare_solvers as a text table.
+
+    Parameters:
+    - comparison: dict
+        Result of compare_solvers.
+
+    Returns:
+    - str: The formatted table.
+    """
+    lines = [f"Target RMSD: {comparison['target_RMSD']:.6f}",
+             f"{'solver':<24}{'success':>8}{'evals to target':>17}"
+             f"{'nfev':>8}{'best RMSD':>11}{'time (s)':>10}"]
+    for entry in comparison['solvers']:
+        evaluations = entry['evaluations_to_target']
+        lines.append(
+            f"{entry['solver']:<24}"
+            f"{entry['success_rate']:>8.0%}"
+            f"{'-' if evaluations is None else f'{evaluations:.0f}':>17}"
+            f"{entry['nfev']:>8.0f}"
+            f"{entry['best_RMSD']:>11.6f}"
+            f"{entry['seconds']:>10.2f}")
+    return '\n'.join(lines)
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from OCV_GUI_module.add_battery import extract_pseudo_ocv
+
+
+def discharge_rows(start_time, capacity, offset, step, dt=10.0):
+    # Constant 1 A discharge whose voltage falls linearly from offset + 1 V
+    # to offset over the capacity (Ah)
+    time = start_time + np.arange(0, capacity * 3600 + dt / 2, dt)
+    SOC = 1 - (time - start_time) / 3600 / capacity
+    return np.column_stack((time, -np.ones_like(time), offset + SOC,
+                            np.full_like(time, step)))
+
+
+def rest_rows(start_time, voltage, step, duration=600.0, dt=60.0):
+    time = start_time + np.arange(dt, duration + dt / 2, dt)
+    return np.column_stack((time, np.zeros_like(time),
+                            np.full_like(time, voltage),
+                            np.full_like(time, step)))
+
+
+@pytest.fixture
+def two_cycle_log(tmp_path):
+    # A 1 Ah discharge from 4 V to 3 V, a rest, then a 0.5 Ah discharge
+    # from 3.5 V to 2.5 V
+    first = discharge_rows(0.0, 1.0, 3.0, step=1)
+    rest = rest_rows(first[-1, 0], 3.0, step=2)
+    second = discharge_rows(rest[-1, 0] + 10.0, 0.5, 2.5, step=3)
+    rows = np.vstack((first, rest, second))
+    path = tmp_path / 'log.csv'
+    with open(path, 'w') as file:
+        file.write('Time,Current,Voltage,Step\n')
+        np.savetxt(file, rows, delimiter=',', fmt='%.6f')
+    return path
+
+
+def test_longest_segment_is_one_ramp(two_cycle_log):
+    SOC, OCV = extract_pseudo_ocv(two_cycle_log, step_column='Step')
+    assert SOC[0] == 0 and SOC[-1] == 1
+    np.testing.assert_allclose(np.interp([0.25, 0.5, 0.75], SOC, OCV),
+                               [3.25, 3.5, 3.75], atol=0.01)
+
+
+def test_segment_index(two_cycle_log):
+    SOC, OCV = extract_pseudo_ocv(two_cycle_log, segment=1)
+    np.testing.assert_allclose(np.interp([0.25, 0.5, 0.75], SOC, OCV),
+                               [2.75, 3.0, 3.25], atol=0.01)
+
+
+def test_steps_select_one_segment(two_cycle_log):
+    SOC, OCV = extract_pseudo_ocv(two_cycle_log, step_column='Step',
+                                  steps=[3], segment=None)
+    np.testing.assert_allclose(np.interp(0.5, SOC, OCV), 3.0, atol=0.01)
+
+
+def test_single_segment_required(two_cycle_log):
+    with pytest.raises(ValueError, match='more than one segment'):
+        extract_pseudo_ocv(two_cycle_log, segment=None)
+
+
+def test_missing_segment(two_cycle_log):
+    with pytest.raises(ValueError, match='Segment 2 not found'):
+        extract_pseudo_ocv(two_cycle_log, segment=2)
+
+
+def test_small_chunks(two_cycle_log):
+    expected = extract_pseudo_ocv(two_cycle_log)
+    SOC, OCV = extract_pseudo_ocv(two_cycle_log, chunk_size=1000)
+    np.testing.assert_allclose(SOC, expected[0])
+    # Rounding of the charge may move a row to the next charge bin
+    np.testing.assert_allclose(OCV, expected[1], atol=2e-4)
+
+
+def test_step_change_starts_segment(tmp_path):
+    # Two discharges without a rest between them, told apart by the step
+    first = discharge_rows(0.0, 1.0, 3.0, step=1)
+    second = discharge_rows(first[-1, 0] + 10.0, 0.5, 2.5, step=2)
+    path = tmp_path / 'log.txt'
+    np.savetxt(path, np.vstack((first, second)))
+    SOC, OCV = extract_pseudo_ocv(path, step_column=3)
+    np.testing.assert_allclose(np.interp(0.5, SOC, OCV), 3.5, atol=0.01)
+
+
+def test_file_without_final_newline(tmp_path):
+    path = tmp_path / 'log.csv'
+    path.write_text('Time,Current,Voltage\n0,-1,4.0\n1800,-1,3.5\n'
+                    '3600,-1,3.0')
+    SOC, OCV = extract_pseudo_ocv(path, charge_resolution=0.1)
+    assert OCV[0] == pytest.approx(3.0, abs=0.01)
+    assert OCV[-1] == pytest.approx(4.0, abs=0.01)
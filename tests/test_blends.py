@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+from OCV_GUI_module.blends import (
+    blend_half_cells, blend_optimization, perform_blend_optimization,
+    precompute_blend_tables)
+from OCV_GUI_module.optimization_functions import optimization
+
+
+def half_cell(x_values, y_values):
+    return {'x_values': x_values,
+            'interpolated_function': interp1d(x_values, y_values)}
+
+
+def linear_half_cells():
+    # Two curves falling linearly with the lithiation, over different
+    # potential ranges; the first one sampled unevenly
+    x_uneven = np.linspace(0, 1, 501) ** 2
+    x_even = np.linspace(0, 1, 501)
+    return {'low': half_cell(x_uneven, 4.0 - x_uneven),
+            'high': half_cell(x_even, 4.5 - x_even)}
+
+
+def linear_anodes():
+    x_values = np.linspace(0, 1, 201)
+    return {'graphite': half_cell(x_values, 0.1 + 0.5 * (1 - x_values))}
+
+
+def test_uneven_x_values():
+    tables = precompute_blend_tables(linear_half_cells())
+    potential = tables['potential']
+    inside = (potential >= 3.0) & (potential <= 4.0)
+    np.testing.assert_allclose(tables['lithiation']['low'][inside],
+                               4.0 - potential[inside], atol=1e-3)
+
+
+def test_blend_of_one_component():
+    half_cells = linear_half_cells()
+    blend = blend_half_cells(precompute_blend_tables(half_cells),
+                             'low', 'high', 1.0)
+    np.testing.assert_allclose(
+        blend['interpolated_function'](blend['x_values']),
+        4.0 - blend['x_values'], atol=2e-3)
+    assert blend['components'] == ('low', 'high')
+
+
+def test_blend_lithiation_is_weighted_sum():
+    tables = precompute_blend_tables(linear_half_cells())
+    blend = blend_half_cells(tables, 'low', 'high', 0.25)
+    # At 3.75 V the first curve is 25 % and the second 75 % lithiated
+    lithiation = 0.25 * 0.25 + 0.75 * 0.75
+    assert blend['interpolated_function'](lithiation) \
+        == pytest.approx(3.75, abs=2e-3)
+
+
+def test_blend_objective_matches_blended_spline():
+    cathodes, anodes = linear_half_cells(), linear_anodes()
+    tables = precompute_blend_tables(cathodes)
+    SOC_battery = np.linspace(0, 1, 1001)
+    OCV_battery = 3.9 - 0.6 * SOC_battery
+    params = np.array([0.1, 0.2, 0.3, 0.4, 0.25])
+    blend = blend_half_cells(tables, 'low', 'high', params[4])
+    expected = optimization(
+        params[:4], anodes['graphite']['interpolated_function'],
+        anodes['graphite']['x_values'],
+        blend['interpolated_function'], blend['x_values'], OCV_battery,
+        SOC_battery)
+    assert blend_optimization(
+        params, ('low', 'high'), 'graphite', cathodes, anodes, tables, None,
+        OCV_battery, SOC_battery) == pytest.approx(expected, rel=1e-3)
+
+
+def test_blend_optimization_is_seeded():
+    cathodes, anodes = linear_half_cells(), linear_anodes()
+    tables = precompute_blend_tables(cathodes)
+    SOC_battery = np.linspace(0, 1, 1001)
+    OCV_battery = 3.9 - 0.6 * SOC_battery
+    results = [perform_blend_optimization(
+        ('low', 'high'), 'graphite', cathodes, anodes, tables, None,
+        OCV_battery, SOC_battery, 1, 0, seed=3, solver='cma_es',
+        solver_options={'maxiter': 10}) for _ in range(2)]
+    np.testing.assert_array_equal(results[0]['optimized_params'],
+                                  results[1]['optimized_params'])
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+
+from OCV_GUI_module.constraints import (
+    TRIM_LIMITS, load_search_limits, resolve_search_limits, search_space)
+
+LIMITS = {
+    'default': {'np_ratio': [1.05, 1.2]},
+    'Graphite': {'min_anode_window': 0.8},
+    'NMC': {'h': [0, 0.1], 'min_cathode_window': 0.85},
+    'NMC811': {'g': [0.02, 0.15]}
+}
+ANODE = {'x_values': np.linspace(0, 0.8, 201)}
+CATHODE = {'x_values': np.linspace(0.1, 1.1, 201)}
+
+
+def test_resolve_search_limits_order():
+    merged = resolve_search_limits(
+        dict(LIMITS, NMC811={'min_cathode_window': 0.9}), 'NMC811-test',
+        'Graphite-test')
+    assert merged == {'np_ratio': [1.05, 1.2], 'min_anode_window': 0.8,
+                      'h': [0, 0.1], 'min_cathode_window': 0.9}
+
+
+def test_load_search_limits_rejects_bad_entries(tmp_path):
+    path = tmp_path / 'limits.json'
+    path.write_text(json.dumps({'NMC': {'window': 0.9}}))
+    with pytest.raises(ValueError, match='Unknown search limit'):
+        load_search_limits(path)
+    path.write_text(json.dumps({'NMC': {'g': [0, 0.2]}}))
+    with pytest.raises(ValueError, match="'g' of 'NMC'"):
+        load_search_limits(path)
+
+
+def test_search_space_feasible_points():
+    bounds, (constraint,) = search_space(
+        LIMITS, 'NMC811-test', CATHODE, 'Graphite-test', ANODE)
+    lower, upper = np.transpose(bounds)
+    points = lower + (upper - lower) * np.random.default_rng(0).uniform(
+        size=(20000, 4))
+    values = points @ constraint.A.T
+    feasible = points[np.all((values >= constraint.lb)
+                             & (values <= constraint.ub), axis=1)]
+    assert 100 < len(feasible) < len(points)
+
+    e, f, g, h = (feasible * [TRIM_LIMITS[key] for key in 'efgh']).T
+    anode_window, cathode_window = 1 - e - f, 1 - g - h
+    np_ratio = cathode_window / (0.8 * anode_window)
+    assert np.all(anode_window >= 0.8)
+    assert np.all(cathode_window >= 0.85)
+    assert np.all((np_ratio >= 1.05 - 1e-9) & (np_ratio <= 1.2 + 1e-9))
+    assert np.all((g >= 0.02) & (h <= 0.1))
+
+
+def test_search_space_infeasible_window():
+    limits = {'Graphite': {'e': [0.2, 0.3], 'min_anode_window': 0.9}}
+    with pytest.raises(ValueError, match='min_anode_window = 0.9'):
+        search_space(limits, 'NMC811-test', CATHODE, 'Graphite-test', ANODE)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+import OCV_GUI_module.features as features
+from OCV_GUI_module.features import (
+    estimate_alignment, feature_initial_population,
+    find_differential_capacity_peaks, window_candidates)
+from OCV_GUI_module.optimization_functions import (
+    calculate_alignment_indices, calculate_battery_OCV, optimization,
+    perform_optimization)
+
+X_VALUES = np.linspace(0, 1, 401)
+
+
+def half_cell(y_values):
+    return {'x_values': X_VALUES,
+            'interpolated_function': interp1d(X_VALUES, y_values,
+                                              kind='cubic')}
+
+
+# Plateaus, i.e. dQ/dV peaks, at x = 0.3 and 0.7 (anode) and 0.5 (cathode)
+ANODE = half_cell(0.8 - 0.7 * X_VALUES
+                  + 0.025 * np.tanh((X_VALUES - 0.3) / 0.04)
+                  + 0.025 * np.tanh((X_VALUES - 0.7) / 0.04))
+CATHODE = half_cell(4.2 - 0.8 * X_VALUES
+                    + 0.03 * np.tanh((X_VALUES - 0.5) / 0.04))
+SOC_BATTERY = np.linspace(0, 1, 1001)
+OCV_BATTERY = calculate_battery_OCV(
+    [0.3, 0.4, 0.3, 0.5], ANODE['interpolated_function'], X_VALUES,
+    CATHODE['interpolated_function'], X_VALUES)
+
+
+def test_find_plateau_peaks():
+    positions, prominences = find_differential_capacity_peaks(
+        X_VALUES, ANODE['interpolated_function'](X_VALUES))
+    np.testing.assert_allclose(positions, [0.3, 0.7], atol=0.01)
+    assert np.all(prominences > 0.5)
+
+
+def test_window_from_two_matched_peaks():
+    # Peaks at x = 0.3 and 0.7 seen at SOC 0.25 and 0.75 span x 0.1 to 0.9
+    windows = window_candidates([0.3, 0.7], [0.25, 0.75], (0, 0.3),
+                                (0.7, 1))
+    assert windows[0] == pytest.approx((0.1, 0.9))
+    assert len(windows) == 3
+
+
+def test_estimate_alignment_contract():
+    estimate = estimate_alignment(CATHODE, ANODE, SOC_BATTERY, OCV_BATTERY)
+    assert estimate['indices'] == calculate_alignment_indices(
+        estimate['params'], len(X_VALUES), len(X_VALUES))
+    assert estimate['RMSD'] == optimization(
+        estimate['params'], ANODE['interpolated_function'], X_VALUES,
+        CATHODE['interpolated_function'], X_VALUES, OCV_BATTERY,
+        SOC_BATTERY)
+    assert estimate['evaluations'] >= 1
+
+
+def test_initial_population():
+    population = feature_initial_population(
+        CATHODE, ANODE, SOC_BATTERY, OCV_BATTERY, popsize=40, seed=0)
+    estimate = estimate_alignment(CATHODE, ANODE, SOC_BATTERY, OCV_BATTERY)
+    assert population.shape == (40, 4)
+    np.testing.assert_array_equal(population[0],
+                                  np.clip(estimate['params'], 0, 1))
+    assert np.all((population >= 0) & (population <= 1))
+    np.testing.assert_array_equal(population, feature_initial_population(
+        CATHODE, ANODE, SOC_BATTERY, OCV_BATTERY, popsize=40, seed=0))
+
+
+@pytest.mark.parametrize('solver_options, popsize', [
+    (None, 15 * 4), ({'popsize': 5, 'maxiter': 1}, 5 * 4)])
+def test_population_size_follows_popsize(monkeypatch, solver_options,
+                                         popsize):
+    sizes = []
+
+    def recording_population(*args, **kwargs):
+        sizes.append(kwargs['popsize'])
+        return feature_initial_population(*args, **kwargs)
+
+    monkeypatch.setattr(features, 'feature_initial_population',
+                        recording_population)
+    result = perform_optimization(
+        'NMC', CATHODE, 'Graphite', ANODE, OCV_BATTERY, SOC_BATTERY, 1, 0,
+        seed=0, initializer='features',
+        solver_options=solver_options or {'maxiter': 1})
+    assert sizes == [popsize]
+    assert result['nfev'] >= popsize
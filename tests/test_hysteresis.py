@@ -0,0 +1,33 @@
+import numpy as np
+from scipy.interpolate import interp1d
+
+from OCV_GUI_module.hysteresis import perform_full_hysteresis_optimization
+from OCV_GUI_module.optimization_functions import (
+    calculate_alignment_indices, calculate_battery_OCV)
+
+X_VALUES = np.linspace(0, 1, 201)
+CATHODE = interp1d(X_VALUES, 4.3 - 0.9 * X_VALUES - 0.3 * X_VALUES ** 3,
+                   kind='cubic')
+ANODE = interp1d(X_VALUES, 0.1 + 0.6 * np.exp(-15 * X_VALUES), kind='cubic')
+
+
+def test_tied_fit_recovers_charge_shift():
+    discharge_params = np.array([0.2, 0.3, 0.4, 0.5])
+    charge_params = discharge_params + [0.04, -0.03, 0.02, -0.04]
+    SOC_battery = np.linspace(0, 1, 1001)
+    OCV_charge, OCV_discharge = (
+        calculate_battery_OCV(params, ANODE, X_VALUES, CATHODE, X_VALUES)
+        for params in (charge_params, discharge_params))
+
+    result = perform_full_hysteresis_optimization(
+        SOC_battery, OCV_charge, SOC_battery, OCV_discharge,
+        {'NMC': {'x_values': X_VALUES, 'interpolated_function': CATHODE}},
+        {'Graphite': {'x_values': X_VALUES, 'interpolated_function': ANODE}},
+        iterations=1, coupling='tied', tie=0.05, seed=0,
+        solver_options={'popsize': 5}, parallel='serial')
+
+    for branch, params in (('charge', charge_params),
+                           ('discharge', discharge_params)):
+        assert result['Branches'][branch]['Best Parameters'] \
+            == calculate_alignment_indices(params, 201, 201)
+        assert result['Branches'][branch]['Lowest RMSD'] < 1e-6
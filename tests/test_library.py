@@ -0,0 +1,129 @@
+import json
+
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+from OCV_GUI_module.library import (
+    cluster_half_cells, filter_pairs, full_cell_metadata,
+    index_half_cell_library, parse_full_cell_name, parse_half_cell_name,
+    perform_clustered_optimization)
+from OCV_GUI_module.optimization_functions import calculate_battery_OCV
+
+
+def write_library(folder, names, sidecars=None):
+    folder.mkdir()
+    for name in names:
+        (folder / name).write_text("0 1\n1 0\n")
+    for name, metadata in (sidecars or {}).items():
+        (folder / name).write_text(json.dumps(metadata))
+    return index_half_cell_library(str(folder))
+
+
+def test_parse_half_cell_name():
+    assert parse_half_cell_name('NMC811-10.1016_j.xcrp.2020.100253') == {
+        'chemistry': 'NMC811', 'family': 'NMC',
+        'source': '10.1016_j.xcrp.2020.100253'}
+    assert parse_half_cell_name('LFP') == {
+        'chemistry': 'LFP', 'family': 'LFP', 'source': None}
+
+
+def test_parse_full_cell_name():
+    assert parse_full_cell_name('NMC811vsGraphite_OCV-LICeM') == {
+        'cathode': 'NMC811', 'anode': 'Graphite', 'source': 'LICeM'}
+    with pytest.raises(ValueError, match='naming convention'):
+        parse_full_cell_name('NMC811-Graphite')
+
+
+def test_sidecar_metadata(tmp_path):
+    index = write_library(
+        tmp_path / 'cathodes',
+        ['NMC811-LICeM.txt', 'Unknown-Paper.txt', 'NMC622-fit.ocp.json'],
+        {'Unknown-Paper.json': {'chemistry': 'NCA80', 'note': 'fitted'},
+         'NMC622-fit.json': {'family': 'Layered'}})
+
+    assert index['metadata']['Unknown-Paper'] == {
+        'chemistry': 'NCA80', 'family': 'NCA', 'source': 'Paper',
+        'note': 'fitted'}
+    assert index['metadata']['NMC622-fit']['family'] == 'Layered'
+    assert index['by_family'] == {'NMC': ['NMC811-LICeM'],
+                                  'NCA': ['Unknown-Paper'],
+                                  'Layered': ['NMC622-fit']}
+
+
+def test_full_cell_sidecar(tmp_path):
+    battery_file = tmp_path / 'cell_A.txt'
+    battery_file.write_text("0 3\n1 4\n")
+    with pytest.raises(ValueError, match='naming convention'):
+        full_cell_metadata(str(battery_file))
+    (tmp_path / 'cell_A.json').write_text(
+        json.dumps({'cathode': 'LFP', 'anode': 'Graphite'}))
+    assert full_cell_metadata(str(battery_file)) == {
+        'cathode': 'LFP', 'anode': 'Graphite', 'source': None}
+
+
+@pytest.fixture
+def indexes(tmp_path):
+    return (write_library(tmp_path / 'cathodes',
+                          ['NMC811-A.txt', 'NMC622-B.txt', 'LFP-C.txt']),
+            write_library(tmp_path / 'anodes',
+                          ['Graphite-A.txt', 'Si-B.txt']))
+
+
+def test_filter_pairs_exact_and_family(indexes):
+    assert filter_pairs(*indexes, 'NMC811', 'Graphite') \
+        == [('NMC811-A', 'Graphite-A')]
+    assert filter_pairs(*indexes, 'NMC811', 'Graphite', match='family') \
+        == [('NMC622-B', 'Graphite-A'), ('NMC811-A', 'Graphite-A')]
+
+
+def test_filter_pairs_fallback(indexes):
+    with pytest.raises(ValueError, match="No anode .* matches 'SiC'"):
+        filter_pairs(*indexes, 'LFP', 'SiC')
+    assert filter_pairs(*indexes, 'LFP', 'SiC', fallback=True) \
+        == [('LFP-C', 'Graphite-A'), ('LFP-C', 'Si-B')]
+
+
+X_VALUES = np.linspace(0, 1, 201)
+
+
+def cubic_half_cell(y_values):
+    return {'x_values': X_VALUES,
+            'interpolated_function': interp1d(X_VALUES, y_values,
+                                              kind='cubic')}
+
+
+NMC = 4.3 - 0.9 * X_VALUES - 0.3 * X_VALUES ** 3
+CATHODES = {'NMC811-A': cubic_half_cell(NMC),
+            'NMC811-B': cubic_half_cell(NMC + 0.002),
+            'NMC811-C': cubic_half_cell(NMC - 0.003),
+            'LFP-A': cubic_half_cell(3.45 - 0.05 * X_VALUES
+                                     - 0.4 * X_VALUES ** 8)}
+ANODES = {'Graphite-A': cubic_half_cell(0.1 + 0.6 * np.exp(-15 * X_VALUES))}
+
+
+def test_cluster_near_identical_curves():
+    clusters = cluster_half_cells(CATHODES, threshold=0.05)
+    assert sorted(map(sorted, (cluster['members'] for cluster in clusters))) \
+        == [['LFP-A'], ['NMC811-A', 'NMC811-B', 'NMC811-C']]
+    # The curve between the two others is closest to both
+    assert {cluster['representative'] for cluster in clusters} \
+        == {'NMC811-A', 'LFP-A'}
+
+
+def test_clustered_optimization_searches_best_cluster():
+    SOC_battery = np.linspace(0, 1, 1001)
+    OCV_battery = calculate_battery_OCV(
+        [0.2, 0.3, 0.4, 0.5], ANODES['Graphite-A']['interpolated_function'],
+        X_VALUES, CATHODES['NMC811-B']['interpolated_function'], X_VALUES)
+
+    result = perform_clustered_optimization(
+        SOC_battery, OCV_battery, CATHODES, ANODES, top_clusters=1,
+        iterations=1, parallel='serial', seed=0,
+        solver_options={'popsize': 5})
+
+    assert len(result['Clusters']['cathode']) == 2
+    # The members of the NMC811 cluster
+    assert result['Searched Pairs'] == 3
+    assert result['Best Cathode Data ID'] == 'NMC811-B'
+    assert result['Lowest RMSD'] < 1e-3
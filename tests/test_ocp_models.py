@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pytest
+
+from OCV_GUI_module.ocp_models import (
+    Expression, RedlichKister, TanhSum, load_ocp_model)
+from OCV_GUI_module.optimization_functions import (
+    calculate_battery_OCV, calculate_battery_OCV_derivative)
+
+MODELS = {
+    'redlich_kister': RedlichKister(
+        (0.05, 0.95), 3.9, [-31000.0, 1200.0, -4500.0, 800.0]),
+    'tanh': TanhSum((0.0, 1.0), offset=0.2, slope=-0.1,
+                    terms=[[0.5, 0.02, 0.01], [-0.06, 0.55, 0.03]]),
+    'expression': Expression(
+        (0.1, 0.9), 'a + b * x + c * exp(-x / d) - log(x) / 10',
+        {'a': 3.5, 'b': 0.8, 'c': -0.6, 'd': 0.05})
+}
+
+
+@pytest.mark.parametrize('name', MODELS)
+def test_derivative_matches_finite_differences(name):
+    model = MODELS[name]
+    x = np.linspace(*model.x_range, 201)[1:-1]
+    step = 1e-6
+    finite_differences = (model(x + step) - model(x - step)) / (2 * step)
+    np.testing.assert_allclose(model.derivative(x), finite_differences,
+                               rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize('name', MODELS)
+def test_shape_is_kept(name):
+    model = MODELS[name]
+    x = np.full((2, 3), np.mean(model.x_range))
+    assert model(x).shape == (2, 3)
+    assert model.derivative(x).shape == (2, 3)
+    assert np.ndim(model(0.5)) == 0
+
+
+def test_battery_OCV_derivative():
+    # Steps wide enough for np.gradient on 1001 points
+    cathode = TanhSum((0.0, 1.0), offset=4.2, slope=-0.8,
+                      terms=[[0.05, 0.5, 0.1]])
+    anode = TanhSum((0.0, 1.0), offset=0.2, slope=-0.1,
+                    terms=[[0.1, 0.3, 0.1]])
+    functions = (anode, np.linspace(0, 1, 1001),
+                 cathode, np.linspace(0, 1, 1001))
+    params = (0.05, 0.9, 0.1, 0.95)
+    SOC = np.linspace(0, 1, 1001)
+    finite_differences = np.gradient(
+        calculate_battery_OCV(params, *functions), SOC)
+    np.testing.assert_allclose(
+        calculate_battery_OCV_derivative(params, *functions)[1:-1],
+        finite_differences[1:-1], rtol=1e-4, atol=1e-6)
+
+
+def test_constant_expression():
+    model = Expression((0.0, 1.0), '3.7')
+    np.testing.assert_array_equal(model(np.linspace(0, 1, 5)), 3.7)
+    np.testing.assert_array_equal(model.derivative(np.linspace(0, 1, 5)), 0)
+
+
+@pytest.mark.parametrize('expression, message', [
+    ('x.real', 'not allowed'),
+    ("__import__('os')", 'not an allowed function call'),
+    ('exp(x=x)', 'not an allowed function call'),
+    ('x + y', "Unknown name 'y'"),
+    ("x + 'a'", 'Only numbers'),
+    ('x +', 'Invalid OCP expression'),
+    ('[x][0]', 'not allowed')
+])
+def test_expression_rejects(expression, message):
+    with pytest.raises(ValueError, match=message):
+        Expression((0.0, 1.0), expression)
+
+
+def test_invalid_x_range():
+    with pytest.raises(ValueError, match='increasing'):
+        TanhSum((0.5, 0.5))
+    with pytest.raises(ValueError, match=r'inside \(0, 1\)'):
+        RedlichKister((0.0, 0.9), 3.9, [0.0])
+
+
+def write_model(path, coefficients):
+    path.write_text(json.dumps(coefficients))
+    return str(path)
+
+
+def test_load_ocp_model(tmp_path):
+    model = load_ocp_model(write_model(
+        tmp_path / 'NMC-test.ocp.json',
+        {'model': 'tanh', 'x_range': [0.0, 1.0], 'offset': 4.0}))
+    assert isinstance(model, TanhSum)
+    assert model(0.3) == pytest.approx(4.0)
+
+
+def test_load_unknown_model(tmp_path):
+    with pytest.raises(ValueError, match="Unknown OCP model 'spline'"):
+        load_ocp_model(write_model(tmp_path / 'a.ocp.json',
+                                   {'model': 'spline', 'x_range': [0, 1]}))
+
+
+def test_load_invalid_coefficients(tmp_path):
+    with pytest.raises(ValueError, match='Invalid coefficients'):
+        load_ocp_model(write_model(tmp_path / 'a.ocp.json',
+                                   {'model': 'tanh', 'x_range': [0, 1],
+                                    'height': 1.0}))
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+from OCV_GUI_module.online import BATTERY_SOC, OnlineDecomposition
+from OCV_GUI_module.optimization_functions import calculate_battery_OCV
+
+X_VALUES = np.linspace(0, 1, 201)
+CATHODE = {'x_values': X_VALUES,
+           'interpolated_function': interp1d(
+               X_VALUES, 4.3 - 0.9 * X_VALUES - 0.3 * X_VALUES ** 3,
+               kind='cubic')}
+ANODE = {'x_values': X_VALUES,
+         'interpolated_function': interp1d(
+             X_VALUES, 0.1 + 0.6 * np.exp(-15 * X_VALUES), kind='cubic')}
+PARAMS = np.array([0.05, 0.9, 0.1, 0.95])
+
+
+def battery_points(params, SOC):
+    calculated_battery_OCV = calculate_battery_OCV(
+        params, ANODE['interpolated_function'], X_VALUES,
+        CATHODE['interpolated_function'], X_VALUES)
+    return np.interp(SOC, BATTERY_SOC, calculated_battery_OCV)
+
+
+def feed(online, params, n_batches, rng, batch_size=8):
+    for _ in range(n_batches):
+        SOC = rng.uniform(0, 1, batch_size)
+        state = online.update(SOC, battery_points(params, SOC))
+    return state
+
+
+def test_last_point_of_bin_is_kept():
+    online = OnlineDecomposition(CATHODE, ANODE, PARAMS, n_bins=11)
+    online.add_points([0.5, 0.51, 0.2], [3.0, 3.1, 3.5])
+    online.add_points([0.49], [3.2])
+    assert online.n_points == 2
+    assert online.SOC_points[5] == 0.49
+    assert online.OCV_points[5] == 3.2
+    assert online.batches[5] == 2
+    assert online.OCV_points[2] == 3.5
+
+
+def test_invalid_points():
+    online = OnlineDecomposition(CATHODE, ANODE, PARAMS)
+    with pytest.raises(ValueError, match='same length'):
+        online.add_points([0.1, 0.2], [3.5])
+    with pytest.raises(ValueError, match='between 0 and 1'):
+        online.add_points([1.2], [3.5])
+
+
+def test_no_fit_before_min_points():
+    online = OnlineDecomposition(CATHODE, ANODE, min_points=5)
+    state = online.update([0.1, 0.5], [3.9, 3.6])
+    assert state['Residual'] is None
+    assert state['Best Parameters'] is None
+    assert state['nfev'] == 0
+
+
+def test_exact_points_keep_the_estimate():
+    online = OnlineDecomposition(CATHODE, ANODE, PARAMS, min_points=5)
+    state = feed(online, PARAMS, 3, np.random.default_rng(0))
+    assert state['Residual'] == pytest.approx(0, abs=1e-9)
+    assert online.searches == 0
+    assert state['Best Parameters'] == online.best_parameters
+
+
+def test_small_drift_is_tracked_locally():
+    rng = np.random.default_rng(0)
+    online = OnlineDecomposition(CATHODE, ANODE, PARAMS, min_points=5)
+    feed(online, PARAMS, 3, rng)
+    state = feed(online, [0.05, 0.87, 0.12, 0.95], 3, rng)
+    assert online.searches == 0
+    assert state['nfev'] <= online.local_evaluations
+    assert state['Residual'] < online.drift_threshold
+
+
+def test_large_drift_triggers_full_search():
+    rng = np.random.default_rng(0)
+    online = OnlineDecomposition(
+        CATHODE, ANODE, PARAMS, min_points=5, seed=0,
+        solver_options={'popsize': 5, 'maxiter': 20})
+    feed(online, PARAMS, 3, rng)
+    state = feed(online, [0.3, 0.6, 0.0, 0.7], 1, rng, batch_size=30)
+    assert state['Re-searched']
+    assert online.searches == 1
+    assert state['Baseline'] == state['Residual']
@@ -0,0 +1,240 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+import OCV_GUI_module.optimization_functions as optimization_functions
+from OCV_GUI_module.optimization_functions import (
+    PARALLEL_LAYOUTS, TabulatedObjective, calculate_alignment_indices,
+    calculate_battery_OCV, calculate_RMSD_terms, choose_parallel_layout,
+    estimate_layout_times, optimization, parallel_settings,
+    perform_adaptive_pair_search, search_objective, select_parallel_layout,
+    validate_single_precision)
+
+X_VALUES = np.linspace(0, 1, 201)
+SOC_BATTERY = np.linspace(0, 1, 1001)
+PARAMS = np.array([0.2, 0.3, 0.4, 0.5])
+
+
+def half_cell(y_values):
+    return {'x_values': X_VALUES,
+            'interpolated_function': interp1d(X_VALUES, y_values,
+                                              kind='cubic')}
+
+
+CATHODES = {'NMC': half_cell(4.3 - 0.9 * X_VALUES - 0.3 * X_VALUES ** 3),
+            'LFP': half_cell(3.45 - 0.05 * X_VALUES
+                             - 0.4 * X_VALUES ** 8)}
+ANODES = {'Graphite': half_cell(0.1 + 0.6 * np.exp(-15 * X_VALUES))}
+
+
+def battery_OCV(params, cathode='NMC', anode='Graphite'):
+    return calculate_battery_OCV(
+        params, ANODES[anode]['interpolated_function'], X_VALUES,
+        CATHODES[cathode]['interpolated_function'], X_VALUES)
+
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_tabulated_objective_matches_optimization(dtype):
+    OCV_battery = battery_OCV(PARAMS) + 0.01
+    objective = TabulatedObjective(
+        CATHODES['NMC'], ANODES['Graphite'], SOC_BATTERY, OCV_battery,
+        dtype=dtype)
+    for params in np.random.default_rng(0).uniform(size=(20, 4)):
+        expected = optimization(
+            params, ANODES['Graphite']['interpolated_function'], X_VALUES,
+            CATHODES['NMC']['interpolated_function'], X_VALUES,
+            OCV_battery, SOC_BATTERY)
+        assert objective(params) == pytest.approx(expected, rel=1e-3)
+
+
+def test_tabulated_objective_adds_derivative_term():
+    OCV_battery = battery_OCV(PARAMS) + 0.01
+    objectives = [TabulatedObjective(
+        CATHODES['NMC'], ANODES['Graphite'], SOC_BATTERY, OCV_battery,
+        derivative_inverse=derivative_inverse, dtype=np.float64)
+        for derivative_inverse in (0, 0.1)]
+    params = np.array([0.5, 0.5, 0.5, 0.5])
+    e, f, g, h = calculate_alignment_indices(params, 201, 201)
+    calculated_battery_OCV = (
+        objectives[0]._resample(objectives[0].cathode, g, h)
+        - objectives[0]._resample(objectives[0].anode, e, f))
+    _, derivative_term = calculate_RMSD_terms(
+        calculated_battery_OCV, OCV_battery, SOC_BATTERY)
+    assert objectives[1](params) - objectives[0](params) \
+        == pytest.approx(0.1 * derivative_term)
+
+
+def test_tabulated_objective_stays_in_single_precision():
+    objective = TabulatedObjective(CATHODES['NMC'], ANODES['Graphite'],
+                                   SOC_BATTERY, battery_OCV(PARAMS))
+    assert objective.cathode['OCP'].dtype == np.float32
+    assert objective._resample(objective.cathode, 10, 190).dtype \
+        == np.float32
+
+
+def test_search_objective_dtypes():
+    objective, args = search_objective(
+        CATHODES['NMC'], ANODES['Graphite'], battery_OCV(PARAMS),
+        SOC_BATTERY, dtype=np.float32)
+    assert isinstance(objective, TabulatedObjective) and args == ()
+    objective, _ = search_objective(
+        CATHODES['NMC'], ANODES['Graphite'], battery_OCV(PARAMS),
+        SOC_BATTERY)
+    assert objective is optimization
+    with pytest.raises(ValueError, match='float64 or numpy.float32'):
+        search_objective(CATHODES['NMC'], ANODES['Graphite'],
+                         battery_OCV(PARAMS), SOC_BATTERY, dtype=np.float16)
+
+
+def test_validate_single_precision():
+    validation = validate_single_precision(
+        SOC_BATTERY, battery_OCV(PARAMS), CATHODES, ANODES, seed=0)
+    assert validation['same_pair'] and validation['same_parameters']
+    assert validation['float32']['pair'] == ('NMC', 'Graphite')
+    assert validation['float32']['RMSD'] < 1e-3
+
+
+def test_adaptive_search_restarts_only_unconverged_pairs(monkeypatch):
+    # Scripted RMSDs per restart: NMC agrees at once, LFP keeps improving
+    scripts = {('NMC', 'Graphite'): [0.01, 0.01, 0.01],
+               ('LFP', 'Graphite'): [0.05, 0.005, 0.004]}
+    calls = []
+
+    def scripted_pair_search(*args, pairs, rounds, **kwargs):
+        calls.append((list(pairs), rounds))
+        return [{'cathode_data_ID': pair[0], 'anode_data_ID': pair[1],
+                 'optimized_params': PARAMS, 'interrupted': False,
+                 'RMSD': scripts[pair].pop(0)} for pair in pairs]
+
+    monkeypatch.setattr(optimization_functions, 'perform_pair_search',
+                        scripted_pair_search)
+    best, restarts, completeness = perform_adaptive_pair_search(
+        SOC_BATTERY, battery_OCV(PARAMS), CATHODES, ANODES, max_restarts=4,
+        stable_restarts=2)
+    both = [('NMC', 'Graphite'), ('LFP', 'Graphite')]
+    # NMC converged after two agreeing runs; LFP then stayed the best
+    # combination with the same indices for two rounds
+    assert calls == [(both, 4), (both, 3), ([('LFP', 'Graphite')], 2)]
+    assert restarts == {('NMC', 'Graphite'): 2, ('LFP', 'Graphite'): 3}
+    assert best[('LFP', 'Graphite')]['RMSD'] == 0.004
+    assert completeness == {'rounds': 3, 'interrupted': 0, 'skipped': 0,
+                            'converged': True}
+
+
+@pytest.mark.parametrize('NMC_shift, NMC_restarts', [(0, 2), (0.1, 4)])
+def test_adaptive_search_same_RMSD_other_indices_disagrees(
+        monkeypatch, NMC_shift, NMC_restarts):
+    # LFP improves with new indices every round, so the search goes on
+    # until NMC converges or runs out of restarts
+    LFP_runs = iter(range(4))
+    NMC_runs = iter([0, 1, 1, 1])
+
+    def scripted_pair_search(*args, pairs, **kwargs):
+        results = []
+        for cathode in dict(pairs):
+            run = next(NMC_runs if cathode == 'NMC' else LFP_runs)
+            shift = NMC_shift * run if cathode == 'NMC' else 0.05 * run
+            RMSD = 0.01 if cathode == 'NMC' else 0.005 - 0.001 * run
+            results.append({'cathode_data_ID': cathode,
+                            'anode_data_ID': 'Graphite',
+                            'optimized_params': PARAMS + shift,
+                            'interrupted': False, 'RMSD': RMSD})
+        return results
+
+    monkeypatch.setattr(optimization_functions, 'perform_pair_search',
+                        scripted_pair_search)
+    _, restarts, _ = perform_adaptive_pair_search(
+        SOC_BATTERY, battery_OCV(PARAMS), CATHODES, ANODES, max_restarts=4,
+        stable_restarts=2)
+    assert restarts == {('NMC', 'Graphite'): NMC_restarts,
+                        ('LFP', 'Graphite'): 4}
+
+
+def test_seeded_adaptive_search_agrees_with_itself():
+    # Every restart uses the same seed, so the second one agrees
+    history = []
+    best, restarts, completeness = perform_adaptive_pair_search(
+        SOC_BATTERY, battery_OCV(PARAMS), CATHODES, ANODES,
+        pairs=[('NMC', 'Graphite')], parallel='serial', seed=0,
+        history=history)
+    assert restarts == {('NMC', 'Graphite'): 2}
+    assert completeness['rounds'] == 2 and completeness['converged']
+    assert [round_ for round_, _ in history] == [0, 1]
+    assert history[0][1]['RMSD'] == history[1][1]['RMSD']
+    assert best[('NMC', 'Graphite')]['RMSD'] < 1e-3
+
+
+@pytest.mark.parametrize('n_tasks, evaluation_cost, n_cores, layout', [
+    # A single core leaves nothing to parallelize
+    (16, 1e-2, 1, 'serial'),
+    # Cheap searches do not pay for starting processes
+    (2, 1e-6, 8, 'threads'),
+    # Threads gain nothing on one task, and serial wins the tie
+    (1, 1e-6, 8, 'serial'),
+    # Many expensive searches run side by side in processes
+    (16, 1e-2, 8, 'processes'),
+    # One expensive search uses all cores for its population
+    (1, 1e-2, 8, 'workers')])
+def test_choose_parallel_layout(n_tasks, evaluation_cost, n_cores, layout):
+    assert choose_parallel_layout(n_tasks, evaluation_cost,
+                                  n_cores) == layout
+
+
+def test_estimate_layout_times():
+    times = estimate_layout_times(16, 1e-2, 8)
+    assert set(times) == set(PARALLEL_LAYOUTS)
+    assert times['serial'] == pytest.approx(16 * 15)
+    # Two rounds of eight searches and the start of the pool
+    assert times['processes'] == pytest.approx(2 * 15 + 1.5)
+
+
+def test_select_parallel_layout_override():
+    assert select_parallel_layout(
+        SOC_BATTERY, battery_OCV(PARAMS), CATHODES, ANODES, 2,
+        parallel='threads') == 'threads'
+    with pytest.raises(ValueError, match='parallel must be'):
+        select_parallel_layout(SOC_BATTERY, battery_OCV(PARAMS), CATHODES,
+                               ANODES, 2, parallel='gpu')
+
+
+def test_select_parallel_layout_measures_first_pair(monkeypatch, caplog):
+    measured = []
+
+    def measure_evaluation_cost(cathode_info, anode_info, *args, **kwargs):
+        measured.append((cathode_info, anode_info))
+        return 1e-2
+
+    monkeypatch.setattr(optimization_functions, 'measure_evaluation_cost',
+                        measure_evaluation_cost)
+    monkeypatch.setattr(optimization_functions, 'cpu_count', lambda: 8)
+    with caplog.at_level('INFO', logger=optimization_functions.__name__):
+        layout = select_parallel_layout(
+            SOC_BATTERY, battery_OCV(PARAMS), CATHODES, ANODES, 16)
+    assert layout == 'processes'
+    assert measured == [(CATHODES['NMC'], ANODES['Graphite'])]
+    assert "Parallel layout 'processes' for 16 combinations on 8 cores" \
+        in caplog.text
+
+
+@pytest.mark.parametrize('layout, settings', [
+    ('processes', {'n_jobs': -1, 'prefer': None, 'workers': 1}),
+    ('threads', {'n_jobs': -1, 'prefer': 'threads', 'workers': 1}),
+    ('workers', {'n_jobs': 1, 'prefer': None, 'workers': -1}),
+    ('serial', {'n_jobs': 1, 'prefer': None, 'workers': 1})])
+def test_parallel_settings(layout, settings):
+    assert parallel_settings(layout) == settings
+
+
+def test_modules_import_as_top_level_modules():
+    # GUI.py runs from the package directory and imports its siblings as
+    # top-level modules
+    module_directory = os.path.dirname(optimization_functions.__file__)
+    subprocess.run(
+        [sys.executable, '-c',
+         'import broadcast, constraints, features, library, '
+         'optimization_functions, results_table, solvers'],
+        cwd=module_directory, check=True)
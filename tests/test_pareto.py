@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+from scipy.optimize import differential_evolution
+
+from OCV_GUI_module.optimization_functions import calculate_battery_OCV
+from OCV_GUI_module.pareto import (
+    SEARCH_WEIGHTS, TermRecorder, best_on_fronts, nondominated_terms,
+    perform_full_pareto_optimization, perform_pareto_optimization)
+
+X_VALUES = np.linspace(0, 1, 201)
+SOC_BATTERY = np.linspace(0, 1, 1001)
+SOLVER_OPTIONS = {'popsize': 5, 'maxiter': 30}
+
+
+def half_cell(y_values):
+    return {'x_values': X_VALUES,
+            'interpolated_function': interp1d(X_VALUES, y_values,
+                                              kind='cubic')}
+
+
+CATHODES = {'NMC': half_cell(4.3 - 0.9 * X_VALUES - 0.3 * X_VALUES ** 3),
+            'LFP': half_cell(3.45 - 0.05 * X_VALUES
+                             - 0.4 * X_VALUES ** 8)}
+ANODES = {'Graphite': half_cell(0.1 + 0.6 * np.exp(-15 * X_VALUES))}
+# Measured curve with noise, so the two terms pull apart
+OCV_BATTERY = calculate_battery_OCV(
+    [0.2, 0.3, 0.4, 0.5], ANODES['Graphite']['interpolated_function'],
+    X_VALUES, CATHODES['NMC']['interpolated_function'], X_VALUES) \
+    + 0.002 * np.random.default_rng(0).standard_normal(len(SOC_BATTERY))
+
+
+def test_nondominated_terms():
+    terms = np.array([[0.3, 0.1], [0.1, 0.4], [0.2, 0.2], [0.25, 0.3],
+                      [0.1, 0.5], [0.4, 0.1]])
+    np.testing.assert_array_equal(nondominated_terms(terms), [1, 2, 0])
+
+
+def test_single_point_is_its_front():
+    np.testing.assert_array_equal(nondominated_terms([[0.1, 0.2]]), [0])
+
+
+def pareto_front(seed=0):
+    return perform_pareto_optimization(
+        'NMC', CATHODES['NMC'], 'Graphite', ANODES['Graphite'], OCV_BATTERY,
+        SOC_BATTERY, seed=seed, solver_options=SOLVER_OPTIONS)
+
+
+def test_pareto_front_is_nondominated():
+    terms = pareto_front()['terms']
+    assert len(terms) > 1
+    for point in terms:
+        dominated = np.all(terms <= point, axis=1) \
+            & np.any(terms < point, axis=1)
+        assert not dominated.any()
+    # Sorted by increasing OCV term, so decreasing dQ/dV term
+    assert np.all(np.diff(terms[:, 0]) > 0)
+    assert np.all(np.diff(terms[:, 1]) < 0)
+
+
+@pytest.mark.parametrize('weights', SEARCH_WEIGHTS)
+def test_pareto_front_includes_lowest_RMSD(weights):
+    front = pareto_front()
+    # The search of these weights, run alone with the same seed, evaluates
+    # the same points as within the Pareto search
+    recorder = TermRecorder(CATHODES['NMC'], ANODES['Graphite'],
+                            SOC_BATTERY, OCV_BATTERY)
+    differential_evolution(recorder, [(0, 1)] * 4, args=weights, seed=0,
+                           **SOLVER_OPTIONS)
+    lowest = min(np.array(recorder.terms) @ weights)
+    assert min(front['terms'] @ weights) <= lowest
+
+
+def test_seeded_pareto_front_is_reproducible():
+    first, second = pareto_front(), pareto_front()
+    np.testing.assert_array_equal(first['params'], second['params'])
+    np.testing.assert_array_equal(first['terms'], second['terms'])
+
+
+def test_best_on_fronts():
+    fronts = perform_full_pareto_optimization(
+        SOC_BATTERY, OCV_BATTERY, CATHODES, ANODES, seed=0,
+        solver_options=SOLVER_OPTIONS, parallel='serial')
+    assert set(fronts) == {('NMC', 'Graphite'), ('LFP', 'Graphite')}
+    front, point, RMSD = best_on_fronts(fronts)
+    assert front['cathode_data_ID'] == 'NMC'
+    assert point == 0
+    assert RMSD == min(front['terms'][0, 0]
+                       for front in fronts.values())
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+from OCV_GUI_module.optimization_functions import (
+    GUI_JSON_KEYS, RESULT_SUMMARY_KEYS, calculate_battery_OCV,
+    list_result_files, load_result, perform_full_optimization_parallel,
+    save_result_to_json, save_result_to_npz)
+
+X_VALUES = np.linspace(0, 1, 201)
+SOC_BATTERY = np.linspace(0, 1, 1001)
+
+
+def half_cell(y_values):
+    return {'x_values': X_VALUES,
+            'interpolated_function': interp1d(X_VALUES, y_values,
+                                              kind='cubic')}
+
+
+@pytest.fixture(scope='module')
+def result():
+    cathodes = {'NMC': half_cell(4.3 - 0.9 * X_VALUES - 0.3 * X_VALUES ** 3)}
+    anodes = {'Graphite': half_cell(0.1 + 0.6 * np.exp(-15 * X_VALUES))}
+    OCV_battery = calculate_battery_OCV(
+        [0.2, 0.3, 0.4, 0.5], anodes['Graphite']['interpolated_function'],
+        X_VALUES, cathodes['NMC']['interpolated_function'], X_VALUES)
+    return perform_full_optimization_parallel(
+        SOC_BATTERY, OCV_battery, cathodes, anodes, iterations=1,
+        parallel='serial', seed=0)
+
+
+def assert_same_result(loaded, result):
+    assert set(loaded) == set(RESULT_SUMMARY_KEYS) | set(GUI_JSON_KEYS)
+    assert loaded['Best Cathode Data ID'] == 'NMC'
+    assert loaded['Best Anode Data ID'] == 'Graphite'
+    assert loaded['Best Parameters'] == tuple(result['Best Parameters'])
+    assert loaded['Lowest RMSD'] == result['Lowest RMSD']
+    for key in GUI_JSON_KEYS:
+        assert loaded[key].dtype == np.float64
+        np.testing.assert_array_equal(loaded[key], result[key])
+
+
+@pytest.mark.parametrize('keys', [None, GUI_JSON_KEYS])
+def test_json_round_trip(tmp_path, result, keys):
+    filename = str(tmp_path / 'result.json')
+    save_result_to_json(result, filename, keys=keys)
+    assert_same_result(load_result(filename), result)
+
+
+def test_npz_round_trip(tmp_path, result):
+    filename = str(tmp_path / 'result.npz')
+    save_result_to_npz(result, filename)
+    assert_same_result(load_result(filename), result)
+
+
+def test_load_result_rejects_other_files(tmp_path, result):
+    with pytest.raises(ValueError, match='.json or .npz'):
+        load_result(str(tmp_path / 'result.csv'))
+
+    filename = str(tmp_path / 'incomplete.json')
+    with open(filename, 'w') as f:
+        json.dump({'Lowest RMSD': 0.01}, f)
+    with pytest.raises(ValueError, match="'Best Cathode Data ID' is missing"):
+        load_result(filename)
+
+
+def test_list_result_files(tmp_path):
+    for name in ('b.npz', 'a.json', 'notes.txt'):
+        (tmp_path / name).touch()
+    (tmp_path / 'c.json').mkdir()
+    assert list_result_files(str(tmp_path)) == [
+        str(tmp_path / 'a.json'), str(tmp_path / 'b.npz')]
@@ -0,0 +1,95 @@
+import csv
+
+import numpy as np
+import pytest
+
+from OCV_GUI_module.optimization_functions import calculate_alignment_indices
+from OCV_GUI_module.results_table import ResultsTable
+
+HALF_CELLS = {ID: {'x_values': np.linspace(0, 1, 1001)}
+              for ID in ('C1', 'C2', 'A1')}
+
+
+def run(cathode_ID, RMSD, params=(0.0, 0.75, 0.0, 1.0), **kwargs):
+    result = {'cathode_data_ID': cathode_ID, 'anode_data_ID': 'A1',
+              'optimized_params': np.array(params), 'RMSD': RMSD,
+              'RMSD_terms': (RMSD, 0.5), 'nfev': 100, 'seconds': 0.5,
+              'interrupted': False}
+    result.update(kwargs)
+    return result
+
+
+@pytest.fixture
+def table():
+    runs = [(0, run('C1', 0.02)), (0, run('C2', 0.01)),
+            (1, run('C1', 0.015, params=(0.0, 0.8, 0.0, 1.0))),
+            (1, run('C2', 0.03, interrupted=True))]
+    return ResultsTable.from_runs(runs, HALF_CELLS, HALF_CELLS)
+
+
+def test_from_runs(table):
+    assert len(table) == 4
+    assert table.cathode_IDs == ['C1', 'C2']
+    assert table.anode_IDs == ['A1']
+    record = table.records[2]
+    assert record['iteration'] == 1
+    assert (record['e'], record['f'], record['g'], record['h']) \
+        == calculate_alignment_indices((0.0, 0.8, 0.0, 1.0), 1001, 1001)
+    assert record['OCV_RMSD'] == 0.015
+    assert table.records['interrupted'].tolist() \
+        == [False, False, False, True]
+
+
+def test_runs_without_optional_keys():
+    result = {'cathode_data_ID': 'C1', 'anode_data_ID': 'A1',
+              'optimized_params': np.array([0.0, 0.5, 0.0, 1.0]),
+              'RMSD': 0.1}
+    table = ResultsTable.from_runs([(0, result)], HALF_CELLS, HALF_CELLS)
+    assert np.isnan(table.records['OCV_RMSD'][0])
+    assert table.records['nfev'][0] == 0
+
+
+def test_top_k_per_pair(table):
+    top = table.top_k(5)
+    assert table.pair_IDs(top) == [('C2', 'A1'), ('C1', 'A1')]
+    np.testing.assert_array_equal(top['RMSD'], [0.01, 0.015])
+
+
+def test_top_k_of_all_runs(table):
+    top = table.top_k(3, per_pair=False)
+    np.testing.assert_array_equal(top['RMSD'], [0.01, 0.015, 0.02])
+
+
+def test_pair_statistics(table):
+    statistics = table.pair_statistics()
+    assert table.pair_IDs(statistics) == [('C2', 'A1'), ('C1', 'A1')]
+    assert statistics['runs'].tolist() == [2, 2]
+    assert statistics['spread_RMSD'][0] == pytest.approx(0.02)
+    # Both runs of C2 find the same alignment, the runs of C1 two
+    assert statistics['distinct_indices'].tolist() == [1, 2]
+    assert statistics['nfev'].tolist() == [200, 200]
+
+
+def test_save_and_load_npz(table, tmp_path):
+    path = str(tmp_path / 'runs.npz')
+    table.save(path)
+    loaded = ResultsTable.load_npz(path)
+    np.testing.assert_array_equal(loaded.records, table.records)
+    assert loaded.cathode_IDs == table.cathode_IDs
+    assert loaded.anode_IDs == table.anode_IDs
+
+
+def test_save_csv(table, tmp_path):
+    path = str(tmp_path / 'runs.csv')
+    table.save(path)
+    with open(path, newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 4
+    assert rows[1]['cathode'] == 'C2'
+    assert float(rows[1]['RMSD']) == 0.01
+    assert float(rows[2]['f_percentage']) == 0.8
+
+
+def test_save_unknown_extension(table, tmp_path):
+    with pytest.raises(ValueError, match='.csv or .npz'):
+        table.save(str(tmp_path / 'runs.json'))
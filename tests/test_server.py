@@ -0,0 +1,119 @@
+import asyncio
+import json
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from OCV_GUI_module.optimization_functions import (
+    TimeBudgetExceeded, calculate_battery_OCV)
+from OCV_GUI_module.server import DecompositionServer
+
+X_VALUES = np.linspace(0, 1, 201)
+
+
+def write_curve(path, y_values):
+    path.parent.mkdir(exist_ok=True)
+    np.savetxt(path, np.column_stack((X_VALUES, y_values)))
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('library')
+    write_curve(folder / 'cathodes' / 'NMC811-test.txt',
+                4.3 - 0.9 * X_VALUES - 0.3 * X_VALUES ** 3)
+    write_curve(folder / 'cathodes' / 'LFP-test.txt',
+                3.45 - 0.05 * X_VALUES - 0.4 * X_VALUES ** 8)
+    write_curve(folder / 'anodes' / 'Graphite-test.txt',
+                0.1 + 0.6 * np.exp(-15 * X_VALUES))
+    server = DecompositionServer(str(folder / 'cathodes'),
+                                 str(folder / 'anodes'), queue_size=1,
+                                 workers=1)
+    yield server
+    server.process_pool.shutdown()
+
+
+def battery_request(server, **options):
+    cathode = server.interpolated_cathodes['NMC811-test']
+    anode = next(iter(server.interpolated_anodes.values()))
+    OCV_battery = calculate_battery_OCV(
+        [0.2, 0.3, 0.4, 0.5], anode['interpolated_function'],
+        anode['x_values'], cathode['interpolated_function'],
+        cathode['x_values'])
+    return {'SOC': np.linspace(0, 1, 1001).tolist(),
+            'OCV': OCV_battery.tolist(), **options}
+
+
+def test_decompose_with_time_budget(server):
+    data = server.decompose(battery_request(server, iterations=1,
+                                            time_budget=30))
+    assert data['Lowest RMSD'] < 1e-3
+    completeness = data['Search Completeness']
+    assert completeness['Pairs'] == completeness['Pairs Searched'] == 2
+    assert completeness['Skipped Runs'] == 0
+
+
+def test_decompose_time_budget_ran_out(server):
+    with pytest.raises(TimeBudgetExceeded):
+        server.decompose(battery_request(server, time_budget=1e-9))
+
+
+class FailingPool:
+    # Process pool whose last share fails with the given error
+    def __init__(self, pool, error, n_shares):
+        self.pool, self.error, self.n_shares = pool, error, n_shares
+
+    def submit(self, function, *args):
+        self.n_shares -= 1
+        if self.n_shares:
+            return self.pool.submit(function, *args)
+        future = Future()
+        future.set_exception(self.error)
+        return future
+
+
+def test_decompose_reports_other_errors(server, monkeypatch):
+    # Only a share skipped by the deadline may be left out of the result
+    monkeypatch.setattr(server, 'workers', 2)
+    monkeypatch.setattr(server, 'process_pool', FailingPool(
+        server.process_pool, ValueError("Invalid curve."), 2))
+    with pytest.raises(ValueError, match='Invalid curve'):
+        server.decompose(battery_request(server, iterations=1,
+                                         time_budget=30))
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.data = b''
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_full_queue_answers_503(server):
+    async def post_to_full_queue():
+        server.queue = asyncio.Queue(maxsize=server.queue_size)
+        server.queue.put_nowait(('queued request', None))
+        body = json.dumps(battery_request(server)).encode()
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'POST /decompose HTTP/1.1\r\n'
+                         + f'Content-Length: {len(body)}\r\n\r\n'.encode()
+                         + body)
+        reader.feed_eof()
+        writer = RecordingWriter()
+        await server.handle_connection(reader, writer)
+        return writer
+
+    writer = asyncio.run(post_to_full_queue())
+    head, _, body = writer.data.partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 503 Service Unavailable')
+    assert b'Retry-After: 5' in head
+    assert json.loads(body)['queued'] == 1
+    assert writer.closed
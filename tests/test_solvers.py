@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+from scipy.optimize import LinearConstraint, OptimizeResult
+
+from OCV_GUI_module.optimization_functions import calculate_battery_OCV
+from OCV_GUI_module.solvers import (
+    SOLVERS, cma_es, compare_solvers, format_solver_comparison, get_solver,
+    register_solver, surrogate_rbf)
+
+
+def sphere(params):
+    return float(np.sum((np.asarray(params) - 0.5) ** 2))
+
+
+def test_get_solver_unknown():
+    with pytest.raises(ValueError, match="Unknown solver 'simplex'"):
+        get_solver('simplex')
+
+
+def test_register_solver():
+    @register_solver('centre')
+    def centre(objective, bounds, args=(), seed=None, **options):
+        x = np.mean(bounds, axis=1)
+        return OptimizeResult(x=x, fun=objective(x, *args), nfev=1)
+
+    try:
+        assert get_solver('centre') is centre
+        assert get_solver('centre')(sphere, [(0, 1)] * 4).fun == 0
+    finally:
+        del SOLVERS['centre']
+
+
+def test_cma_es_sphere():
+    result = cma_es(sphere, [(0, 1)] * 4, seed=0)
+    assert result.fun < 1e-4
+    np.testing.assert_allclose(result.x, 0.5, atol=0.02)
+
+
+def test_cma_es_infeasible_constraints():
+    impossible = LinearConstraint(np.array([[1, 1, 0, 0]]), 2.5, 3.0)
+    with pytest.raises(ValueError, match='no point with a finite'):
+        cma_es(sphere, [(0, 1)] * 4, seed=0, maxiter=5,
+               constraints=(impossible,))
+
+
+def test_compare_solvers():
+    x_values = np.linspace(0, 1, 201)
+    cathode = {'x_values': x_values, 'interpolated_function': interp1d(
+        x_values, 4.3 - 0.9 * x_values - 0.3 * x_values ** 3, kind='cubic')}
+    anode = {'x_values': x_values, 'interpolated_function': interp1d(
+        x_values, 0.1 + 0.6 * np.exp(-15 * x_values), kind='cubic')}
+    SOC_battery = np.linspace(0, 1, 1001)
+    OCV_battery = calculate_battery_OCV(
+        [0.2, 0.3, 0.4, 0.5], anode['interpolated_function'], x_values,
+        cathode['interpolated_function'], x_values)
+
+    comparison = compare_solvers(
+        cathode, anode, SOC_battery, OCV_battery,
+        solvers=['cma_es', 'nelder_mead'], repeats=2,
+        solver_options={'cma_es': {'maxiter': 10},
+                        'nelder_mead': {'popsize': 2, 'maxiter': 20}})
+
+    report = {entry['solver']: entry for entry in comparison['solvers']}
+    assert list(report) == ['cma_es', 'nelder_mead']
+    best_RMSD = min(entry['best_RMSD'] for entry in report.values())
+    assert comparison['target_RMSD'] == pytest.approx(best_RMSD + 1e-5)
+    # The solver finding the lowest RMSD reaches the default target
+    assert max(entry['success_rate'] for entry in report.values()) > 0
+    assert report['cma_es']['nfev'] <= 10 * 8
+    assert 'cma_es' in format_solver_comparison(comparison)
+
+
+def test_surrogate_narrow_constraints():
+    # Hardly any point of the initial Latin hypercube is feasible
+    band = LinearConstraint(np.array([[1, 1, 0, 0]]), 0.99, 1.0)
+    result = surrogate_rbf(sphere, [(0, 1)] * 4, seed=0, maxiter=60,
+                           constraints=(band,))
+    assert result.nfev == 60
+    assert 0.99 <= result.x[0] + result.x[1] <= 1.0
+    assert result.fun < 1e-3
+
+
+def test_surrogate_infeasible_constraints():
+    impossible = LinearConstraint(np.array([[1, 1, 0, 0]]), 2.5, 3.0)
+    with pytest.raises(ValueError, match='too few points'):
+        surrogate_rbf(sphere, [(0, 1)] * 4, seed=0, maxiter=60,
+                      constraints=(impossible,))
@@ -0,0 +1,149 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+import OCV_GUI_module.optimization_functions as optimization_functions
+from OCV_GUI_module.optimization_functions import (
+    TimeBudgetExceeded, calculate_battery_OCV,
+    perform_full_optimization_parallel, perform_optimization,
+    run_search_iterations, search_completeness, search_time_limit,
+    stop_callback)
+
+X_VALUES = np.linspace(0, 1, 201)
+SOC_BATTERY = np.linspace(0, 1, 1001)
+PARAMS = np.array([0.2, 0.3, 0.4, 0.5])
+
+
+def half_cell(y_values):
+    return {'x_values': X_VALUES,
+            'interpolated_function': interp1d(X_VALUES, y_values,
+                                              kind='cubic')}
+
+
+CATHODES = {'NMC': half_cell(4.3 - 0.9 * X_VALUES - 0.3 * X_VALUES ** 3)}
+ANODES = {'Graphite': half_cell(0.1 + 0.6 * np.exp(-15 * X_VALUES))}
+OCV_BATTERY = calculate_battery_OCV(
+    PARAMS, ANODES['Graphite']['interpolated_function'], X_VALUES,
+    CATHODES['NMC']['interpolated_function'], X_VALUES)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time.time(), advanced by hand."""
+    now = SimpleNamespace(time=100.0)
+    monkeypatch.setattr(optimization_functions.time, 'time',
+                        lambda: now.time)
+    return now
+
+
+def result(cathode='NMC', RMSD=0.01, interrupted=False):
+    return {'cathode_data_ID': cathode, 'anode_data_ID': 'Graphite',
+            'RMSD': RMSD, 'interrupted': interrupted}
+
+
+def test_stop_callback(clock):
+    interrupted = []
+    callback = stop_callback(110.0, interrupted)
+    assert not callback(SimpleNamespace(nit=3))
+    assert interrupted == []
+    clock.time = 110.0
+    assert callback(SimpleNamespace(nit=4))
+    assert interrupted == [4]
+
+
+@pytest.mark.parametrize('n_jobs, rounds, expected', [
+    # Four searches in two batches of two share 60 s
+    (2, 1, 30), (2, 3, 10),
+    # All cores run the four searches at once
+    (-1, 1, 60)])
+def test_search_time_limit(clock, monkeypatch, n_jobs, rounds, expected):
+    monkeypatch.setattr(optimization_functions, 'cpu_count', lambda: 8)
+    assert search_time_limit(160.0, 4, n_jobs, rounds) \
+        == pytest.approx(expected)
+
+
+def test_search_time_limit_without_time_left(clock):
+    assert search_time_limit(None, 4, 1) is None
+    assert search_time_limit(90.0, 4, 1) == 0
+
+
+def test_optimization_after_deadline_is_skipped():
+    assert perform_optimization(
+        'NMC', CATHODES['NMC'], 'Graphite', ANODES['Graphite'], OCV_BATTERY,
+        SOC_BATTERY, 1, 0, seed=0, deadline=time.time() - 1) is None
+
+
+def test_optimization_stops_at_time_limit():
+    optimization_result = perform_optimization(
+        'NMC', CATHODES['NMC'], 'Graphite', ANODES['Graphite'], OCV_BATTERY,
+        SOC_BATTERY, 1, 0, seed=0, deadline=time.time() + 60,
+        time_limit=1e-6)
+    assert optimization_result['interrupted']
+    assert np.isfinite(optimization_result['RMSD'])
+
+
+def test_run_search_iterations_complete():
+    runs = []
+    best, completeness = run_search_iterations(
+        lambda iteration: [result(RMSD=0.1 / (iteration + 1)),
+                           result('LFP', 0.05)], 3, 2, runs=runs)
+    assert [optimization_result['RMSD'] for optimization_result in best] \
+        == [0.05, 0.05, 0.1 / 3]
+    assert len(runs) == 6
+    assert completeness == {'complete': True, 'iterations': 3,
+                            'interrupted': 0, 'skipped': 0,
+                            'searched': {('NMC', 'Graphite'),
+                                         ('LFP', 'Graphite')}}
+
+
+def test_run_search_iterations_stops_at_deadline(clock):
+    def search(iteration):
+        # The first iteration runs past the deadline, interrupted, and the
+        # LFP search never starts
+        clock.time += 20
+        return [result(interrupted=True)]
+
+    best, completeness = run_search_iterations(search, 3, 2, deadline=110.0)
+    assert len(best) == 1
+    assert completeness == {'complete': False, 'iterations': 1,
+                            'interrupted': 1, 'skipped': 1,
+                            'searched': {('NMC', 'Graphite')}}
+
+
+def test_run_search_iterations_after_deadline(clock):
+    best, completeness = run_search_iterations(
+        lambda iteration: pytest.fail("searched after the deadline"), 3, 1,
+        deadline=100.0)
+    assert best == []
+    assert not completeness['complete']
+    assert completeness['iterations'] == 0
+
+
+def test_search_completeness(clock):
+    completeness = {'complete': False, 'iterations': 2, 'interrupted': 1,
+                    'skipped': 3, 'searched': {('NMC', 'Graphite')}}
+    assert search_completeness(completeness, 2, 95.0) == {
+        'Complete': False, 'Pairs': 2, 'Pairs Searched': 1,
+        'Iterations': 2, 'Interrupted Runs': 1, 'Skipped Runs': 3,
+        'Seconds': 5.0}
+
+
+def test_full_optimization_time_budget():
+    with pytest.raises(ValueError, match='time_budget must be positive'):
+        perform_full_optimization_parallel(
+            SOC_BATTERY, OCV_BATTERY, CATHODES, ANODES, time_budget=0)
+    with pytest.raises(TimeBudgetExceeded):
+        perform_full_optimization_parallel(
+            SOC_BATTERY, OCV_BATTERY, CATHODES, ANODES, parallel='serial',
+            deadline=time.time() - 1)
+
+    full_result = perform_full_optimization_parallel(
+        SOC_BATTERY, OCV_BATTERY, CATHODES, ANODES, iterations=1,
+        parallel='serial', seed=0, time_budget=600)
+    completeness = full_result['Search Completeness']
+    assert completeness['Complete']
+    assert completeness['Pairs'] == completeness['Pairs Searched'] == 1
+    assert 0 < completeness['Seconds'] < 600